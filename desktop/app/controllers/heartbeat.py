@@ -3,11 +3,12 @@ import json
 
 
 from app.logger import logger
-from app.consts import COMPSTAT_FILE, MANAGER_HOST, CREDENTIALS
+from app.consts import COMPSTAT_FILE, LOCAL_CREDS_JSON, MANAGER_HOST, CREDENTIALS
 from app.utils import (
     get_credentials,
     printer_info_check,
     send_activity,
+    sync_agent,
 )
 
 
@@ -16,6 +17,9 @@ def heartbeat():
     if not os.path.isfile(COMPSTAT_FILE):
         with open(COMPSTAT_FILE, "w") as f:
             json.dump({}, f)
+    # Registered computer syncs in one request, older servers get separate ones
+    if LOCAL_CREDS_JSON.exists() and sync_agent():
+        return
     credentials, _ = get_credentials()
     if not credentials:
         raise ValueError("Credentials not supplied. Can't continue.")
@@ -6,6 +6,7 @@ from .get_creds_data import GetCredentialsData, GetPccDownloadData
 from .printer_info import PrinterInfo, PrinterInfoData
 from .activity import ActivityData
 from .last_time_response import LastTimeResponse
+from .agent_sync import AgentSyncData, AgentSyncResponse
 from .download_status_data import DownloadStatusData
 from .msi_download_data import MsiDownloadData
 from .registration_with_lid import RegistrationDataWithLid, RegistrationDataWithOutLid
@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+
+from .config_response import ConfigResponse
+from .last_time_response import LastTimeResponse
+from .printer_info import PrinterInfo
+
+
+class AgentSyncData(BaseModel):
+    computer_name: str
+    identifier_key: str
+    last_time_online: str
+    config_etag: str | None = None
+    printer_info: PrinterInfo | None = None
+
+
+class AgentSyncResponse(LastTimeResponse):
+    config_etag: str | None = None
+    config: ConfigResponse | None = None
+    send_printer_info: bool = True
@@ -29,3 +29,4 @@ class ConfigFile(BaseModel):
     additional_sftp_folder_paths: list[str] | None = None
     pcc_fac_id: int | None = None
     device_location: str | None = None
+    config_etag: str | None = None
@@ -68,6 +68,35 @@ def register_computer():
     return response
 
 
+def remove_emar_vault():
+    # invoke powershell script to remove eMARVault
+    PS_COMMAND = "(Get-WmiObject -Class Win32_Product | Where-Object {$_.Name -eq 'eMARVault'}).Uninstall()"
+    shell = Popen(
+        [
+            "powershell.exe",
+            "-command",
+            PS_COMMAND,
+        ],
+        stdout=PIPE,
+        stderr=PIPE,
+    )
+    stdout, stderr = shell.communicate()
+    logger.info("stdout: {}", stdout.decode("utf-8"))
+    if stderr:
+        logger.error("delete_computer: stderr: {}", stderr.decode("utf-8"))
+
+
+def save_credentials(config_data: s.ConfigResponse, config_etag: str | None) -> s.ConfigFile:
+    config = CONFIG.model_dump()
+    config.update(config_data.model_dump(exclude_none=True))
+    config["config_etag"] = config_etag
+    with open(LOCAL_CREDS_JSON, "w") as f:
+        json.dump(config, f, indent=2)
+        logger.info(f"Full credentials received from server and {LOCAL_CREDS_JSON} updated.")
+
+    return s.ConfigFile.model_validate(config)
+
+
 def get_credentials() -> tuple[s.ConfigFile | None, s.ConfigFile | None]:  # return new and old values
     logger.info("Receiving credentials.")
     creds_json = CONFIG
@@ -79,30 +108,25 @@ def get_credentials() -> tuple[s.ConfigFile | None, s.ConfigFile | None]:  # ret
             computer_name=COMPUTER_NAME,
             identifier_key=IDENTIFIER_KEY,
         )
+        # Server answers 304 if the configuration was not changed since the last call
+        with open(LOCAL_CREDS_JSON, "r") as f:
+            local_creds = json.load(f)
+        config_etag = local_creds.get("config_etag")
         response = requests.post(
             URL,
             json=data.model_dump(),
+            headers={"If-None-Match": config_etag} if config_etag else None,
         )
 
+        if response.status_code == 304:
+            logger.info(f"Credentials are not changed, {LOCAL_CREDS_JSON} is used.")
+            return s.ConfigFile.model_validate(local_creds), creds_json
+
         if response.status_code >= 500:
             raise ConnectionAbortedError(f"status-code: {response.status_code}: {response.text}")
 
         if "rmcreds" in response.json():
-            # invoke powershell script to remove eMARVault
-            PS_COMMAND = "(Get-WmiObject -Class Win32_Product | Where-Object {$_.Name -eq 'eMARVault'}).Uninstall()"
-            shell = Popen(
-                [
-                    "powershell.exe",
-                    "-command",
-                    PS_COMMAND,
-                ],
-                stdout=PIPE,
-                stderr=PIPE,
-            )
-            stdout, stderr = shell.communicate()
-            logger.info("stdout: {}", stdout.decode("utf-8"))
-            if stderr:
-                logger.error("delete_computer: stderr: {}", stderr.decode("utf-8"))
+            remove_emar_vault()
             return None, None
         if "message" in response.json() and response.json()["message"] == "Computer is not activated.":
             logger.warning("Computer is not activated. Server-connect script ended.")
@@ -116,12 +140,6 @@ def get_credentials() -> tuple[s.ConfigFile | None, s.ConfigFile | None]:  # ret
         config_data = s.ConfigResponse.model_validate(response.json())
 
     if config_data.message == "Supplying credentials" or config_data.message == "Computer registered":
-        config = CONFIG.model_dump()
-        config.update(config_data.model_dump(exclude_none=True))
-        with open(LOCAL_CREDS_JSON, "w") as f:
-            json.dump(config, f, indent=2)
-            logger.info(f"Full credentials received from server and {LOCAL_CREDS_JSON} updated.")
-
-        return s.ConfigFile.model_validate(config), creds_json
+        return save_credentials(config_data, response.headers.get("ETag")), creds_json
 
     raise ValueError("Wrong response data. Can't proceed without correct credentials.")
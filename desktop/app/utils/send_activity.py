@@ -21,6 +21,22 @@ def offset_to_est(dt_now: datetime.datetime) -> str:
     return est_norm_datetime.strftime("%Y-%m-%d %H:%M:%S")
 
 
+def write_compstat(res: s.LastTimeResponse, **extra):
+    with open(COMPSTAT_FILE, "w") as f:
+        json.dump(
+            {
+                "sftp_host": res.sftp_host,
+                "sftp_username": res.sftp_username,
+                "sftp_folder_path": res.sftp_folder_path,
+                "manager_host": res.manager_host,
+                "msi_version": res.msi_version or "stable",
+                **extra,
+            },
+            f,
+        )
+        logger.info("Updated computer data was written to compstat.json")
+
+
 @logger.catch
 def send_activity(manager_host: str, creds_json: s.ConfigFile | None = None) -> s.LastTimeResponse:
     if creds_json:
@@ -40,18 +56,6 @@ def send_activity(manager_host: str, creds_json: s.ConfigFile | None = None) ->
         if response.status_code != 200:
             logger.error("Failed to send last time online. Response: {}", response.json())
             return
-        res = s.LastTimeResponse.model_validate(response.json())
-        with open(COMPSTAT_FILE, "w") as f:
-            json.dump(
-                {
-                    "sftp_host": res.sftp_host,
-                    "sftp_username": res.sftp_username,
-                    "sftp_folder_path": res.sftp_folder_path,
-                    "manager_host": res.manager_host,
-                    "msi_version": res.msi_version or "stable",
-                },
-                f,
-            )
-            logger.info("Updated computer data was written to compstat.json")
+        write_compstat(s.LastTimeResponse.model_validate(response.json()))
     else:
         logger.error("Heartbeat app can not find creds.json file.")
@@ -0,0 +1,62 @@
+import datetime
+import json
+import requests
+
+from urllib.parse import urljoin
+
+from app.logger import logger
+from app import schemas as s
+from app.consts import COMPSTAT_FILE, LOCAL_CREDS_JSON, MANAGER_HOST
+from app.utils.get_credentials import remove_emar_vault, save_credentials
+from app.utils.get_printer_info_by_posh import get_printer_info_by_posh
+from app.utils.send_activity import offset_to_est, write_compstat
+
+
+def sync_agent() -> bool:
+    """Send heartbeat, printer info and configuration etag in one request.
+
+    Returns False if the server does not have /agent/sync yet (the agent should use
+    get_credentials, last_time, get_telemetry_info and printer_info instead).
+    """
+    with open(LOCAL_CREDS_JSON, "r") as f:
+        credentials = s.ConfigFile.model_validate(json.load(f))
+    with open(COMPSTAT_FILE, "r") as f:
+        compstat = json.load(f)
+
+    # Printer info is not collected if the previous sync disabled it
+    printer_info = get_printer_info_by_posh() if compstat.get("send_printer_info", True) else None
+
+    URL = urljoin(MANAGER_HOST, "agent/sync")
+    data = s.AgentSyncData(
+        computer_name=credentials.computer_name,
+        identifier_key=credentials.identifier_key,
+        last_time_online=offset_to_est(datetime.datetime.utcnow()),
+        config_etag=credentials.config_etag,
+        printer_info=printer_info,
+    )
+    response = requests.post(
+        URL,
+        json=data.model_dump(by_alias=True),
+    )
+
+    if response.status_code == 404:
+        logger.info("Server does not support agent sync, separate requests are used.")
+        return False
+
+    if response.status_code >= 500:
+        raise ConnectionAbortedError(f"status-code: {response.status_code}: {response.text}")
+
+    if "rmcreds" in response.json():
+        remove_emar_vault()
+        return True
+
+    if response.status_code != 200:
+        raise ValueError(f"Agent sync failed. Response: {response.json()}")
+
+    res = s.AgentSyncResponse.model_validate(response.json())
+    if res.config:
+        save_credentials(res.config, res.config_etag)
+    write_compstat(res, send_printer_info=res.send_printer_info)
+    logger.info("Agent synced. Last time online {} sent.", data.last_time_online)
+
+    return True
@@ -63,6 +63,7 @@ def create_app(environment="development"):
         download_msi_fblueprint,
         pcc_api_blueprint,
         companies_blueprint,
+        agent_blueprint,
     )
     from app.models import (
         User,
@@ -81,6 +82,12 @@ def create_app(environment="development"):
         ClientVersion,
         ClientVersionView,
     )
+    from app.controllers import (
+        client_version_registry,
+        heartbeat_buffer,
+        pcc_client,
+        pcc_token_manager,
+    )
 
     # Instantiate app.
     app = OpenAPI(__name__)
@@ -102,6 +109,10 @@ def create_app(environment="development"):
     migration.init_app(app, db)
     login_manager.init_app(app)
     jwt.init_app(app)
+    heartbeat_buffer.init_app(app)
+    pcc_client.init_app(app)
+    pcc_token_manager.init_app(app)
+    client_version_registry.init_app(app)
 
     # Pass functions to jinja2 templates
     app.jinja_env.globals.update(offset_to_east=CFG.offset_to_est)
@@ -131,6 +142,7 @@ def create_app(environment="development"):
     app.register_api(download_msi_blueprint)
     app.register_api(pcc_api_blueprint)
     app.register_api(companies_blueprint)
+    app.register_api(agent_blueprint)
 
     # Set up flask login.
     @login_manager.user_loader
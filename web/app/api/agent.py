@@ -0,0 +1,94 @@
+import json
+
+from flask import jsonify
+from werkzeug.http import quote_etag, unquote_etag
+
+from app.api.downloads_info import update_last_time, update_printer_info
+from app.controllers import (
+    client_version_registry,
+    get_computer_config,
+    get_effective_telemetry_settings,
+)
+from app.logger import logger
+from app.models import Computer
+from app.schema import AgentSync
+from app.views.blueprint import BlueprintApi
+
+agent_blueprint = BlueprintApi("/agent", __name__)
+
+
+@agent_blueprint.post("/agent/sync")
+@logger.catch
+def agent_sync(body: AgentSync):
+    """Heartbeat cycle of the agent in one request.
+
+    Replaces get_credentials, last_time, get_telemetry_info and printer_info calls:
+    the computer is found once, the configuration document is sent only if its etag
+    differs from the agent one.
+    """
+    computer: Computer = Computer.query.filter_by(
+        identifier_key=body.identifier_key,
+        computer_name=body.computer_name,
+    ).first()
+
+    if not computer:
+        computer_name: Computer = Computer.query.filter_by(
+            computer_name=body.computer_name
+        ).first()
+        if computer_name:
+            message = "Wrong id."
+            logger.info(
+                "Agent sync failed. computer: {}, id {}. Reason: {}",
+                body.computer_name,
+                body.identifier_key,
+                message,
+            )
+            return jsonify(status="fail", message=message), 400
+
+        message = "Wrong request data. Computer not found."
+        logger.info(
+            "Agent sync failed. computer: {}, id {}. Reason: {}. \
+            Removing local credentials.",
+            body.computer_name,
+            body.identifier_key,
+            message,
+        )
+        return jsonify(status="fail", message=message, rmcreds="rmcreds"), 400
+
+    # If computer is not activated - prevent it from getting creds
+    if not computer.activated:
+        message = "Computer is not activated."
+        logger.info(
+            "Agent sync failed. computer: {}, id {}. Reason: {}",
+            body.computer_name,
+            body.identifier_key,
+            message,
+        )
+        return jsonify(status="fail", message=message), 400
+
+    update_last_time(computer, bool(body.last_download_time))
+    if body.printer_info:
+        update_printer_info(computer, body.printer_info)
+
+    document, etag = get_computer_config(computer)
+    agent_etag, _ = (
+        unquote_etag(body.config_etag) if body.config_etag else (None, False)
+    )
+    telemetry_settings = get_effective_telemetry_settings(computer)
+    msi = client_version_registry.resolve(computer.msi_version)
+
+    return (
+        jsonify(
+            status="success",
+            message="Agent synced",
+            sftp_host=computer.sftp_host,
+            sftp_username=computer.sftp_username,
+            sftp_folder_path=computer.sftp_folder_path,
+            manager_host=computer.manager_host,
+            msi_version=msi.version if msi else "undefined",
+            config_etag=quote_etag(etag),
+            config=json.loads(document) if agent_etag != etag else None,
+            send_printer_info=telemetry_settings.send_printer_info,
+        ),
+        200,
+    )
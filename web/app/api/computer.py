@@ -3,14 +3,18 @@ from datetime import datetime
 
 from flask import jsonify, request
 
-from app.controllers import create_log_event, create_system_log
+from app.controllers import (
+    create_log_event,
+    create_system_log,
+    get_effective_telemetry_settings,
+)
 from app.logger import logger
 from app.models import (
     Computer,
     Location,
     LogType,
     SystemLogType,
-    TelemetrySettings,
+    ComputerTelemetrySettings,
     Company,
 )
 from app.schema import (
@@ -20,7 +24,6 @@ from app.schema import (
     TelemetryRequestId,
 )
 from app.views.blueprint import BlueprintApi
-from app.views.utils import get_telemetry_settings_for_computer
 from config import BaseConfig as CFG
 
 computer_blueprint = BlueprintApi("/computer", __name__)
@@ -196,7 +199,7 @@ def get_telemetry_info(body: TelemetryRequestId):
         )
         logger.info("Computer telemetry info failed. Reason: {}", message)
         return jsonify(status="fail", message=message), 404
-    telemetry_settings: TelemetrySettings = get_telemetry_settings_for_computer(
+    telemetry_settings: ComputerTelemetrySettings = get_effective_telemetry_settings(
         computer
     )
     return (
@@ -2,25 +2,28 @@ import datetime
 import json
 
 import zoneinfo
-from flask import jsonify, request
+from flask import Response, jsonify, request
 
 from app.controllers import (
     backup_log_on_download_error,
     backup_log_on_download_success,
+    client_version_registry,
     create_log_event,
+    get_computer_config,
+    heartbeat_buffer,
 )
 from app.controllers.backup_log import backup_log_on_download_error_with_message
+from app.controllers.client_version_registry import ClientRelease
 from app.logger import logger
-from app.models import Computer, DesktopClient, LogType
+from app.models import Computer, LogType
 from app.models.computer import PrinterStatus
 from app.schema import (
-    ComputerCredentialsInfo,
     DownloadStatus,
     FilesChecksum,
     GetCredentials,
     LastTime,
 )
-from app.schema.printer_info import PrinterInfo
+from app.schema.printer_info import PrinterInfo, PrinterInfoDict
 from app.views.blueprint import BlueprintApi
 from config import BaseConfig as CFG
 
@@ -53,54 +56,40 @@ def check_msi_version(computer: Computer, body, time_type: str):
         computer.msi_version if computer.msi_version else "stable"
     )
 
-    msi_version: DesktopClient = (
-        DesktopClient.query.filter(DesktopClient.flag_name == current_comp_msi_version)
-        .with_entities(DesktopClient.version)
-        .first()
-        if current_comp_msi_version == "stable" or current_comp_msi_version == "latest"
-        else DesktopClient.query.filter(
-            DesktopClient.version == current_comp_msi_version
-        )
-        .with_entities(DesktopClient.version)
-        .first()
-    )
-
-    msi_version: DesktopClient = (
-        msi_version
-        if msi_version
-        else DesktopClient.query.filter(DesktopClient.flag_name == "stable")
-        .with_entities(DesktopClient.version)
-        .first()
-    )
+    msi_version: ClientRelease = client_version_registry.resolve(
+        current_comp_msi_version
+    ) or client_version_registry.by_flag("stable")
 
     if int(msi_version.version.replace(".", "")) < int("1.0.9.100769".replace(".", "")):
         return lst_times[time_type] + datetime.timedelta(hours=1)
     return lst_times[time_type]
 
 
-@downloads_info_blueprint.post("/last_time")
-@logger.catch
-def last_time(body: LastTime):
-    # TODO use some token to secure api routes
+def update_last_time(computer: Computer, downloaded: bool):
+    """Write heartbeat of the computer (online / download time, ip, log events)
 
-    computer: Computer = (
-        Computer.query.filter_by(identifier_key=body.identifier_key).first()
-        if body.identifier_key
-        else None
-    )
-
-    computer_name: Computer = Computer.query.filter_by(
-        computer_name=body.computer_name
-    ).first()
+    Args:
+        computer (Computer): sqla Computer obj
+        downloaded (bool): backup was downloaded since the last heartbeat
+    """
+    if heartbeat_buffer.enabled:
+        # Write-behind mode: computer times and log events are written in batches
+        current_east_time = CFG.offset_to_est(datetime.datetime.utcnow(), True)
+        heartbeat_buffer.add(
+            computer,
+            request.headers.get("X-Forwarded-For", request.remote_addr),
+            last_time_online=current_east_time,
+            last_download_time=current_east_time if downloaded else None,
+        )
 
-    if computer:
+    else:
         computer.computer_ip = request.headers.get(
             "X-Forwarded-For", request.remote_addr
         )
 
         computer.last_time_online = CFG.offset_to_est(datetime.datetime.utcnow(), True)
         # field = "online"
-        if body.last_download_time:
+        if downloaded:
             computer.last_download_time = CFG.offset_to_est(
                 datetime.datetime.utcnow(), True
             )
@@ -123,7 +112,7 @@ def last_time(body: LastTime):
             )
 
         # Add or update backup period log and create BACKUP_DOWNLOAD log event
-        if computer.logs_enabled and body.last_download_time:
+        if computer.logs_enabled and downloaded:
             create_log_event(
                 computer,
                 LogType.BACKUP_DOWNLOAD,
@@ -137,11 +126,21 @@ def last_time(body: LastTime):
                 computer, utc_download_time.replace(tzinfo=None)
             )
 
-        msi: DesktopClient = (
-            DesktopClient.query.filter_by(flag_name=computer.msi_version).first()
-            if computer.msi_version == "stable" or computer.msi_version == "latest"
-            else DesktopClient.query.filter_by(version=computer.msi_version).first()
-        )
+
+@downloads_info_blueprint.post("/last_time")
+@logger.catch
+def last_time(body: LastTime):
+    # TODO use some token to secure api routes
+
+    computer: Computer = (
+        Computer.query.filter_by(identifier_key=body.identifier_key).first()
+        if body.identifier_key
+        else None
+    )
+
+    if computer:
+        update_last_time(computer, bool(body.last_download_time))
+        msi = client_version_registry.resolve(computer.msi_version)
 
         return (
             jsonify(
@@ -156,7 +155,11 @@ def last_time(body: LastTime):
             200,
         )
 
-    elif computer_name:
+    computer_name: Computer = Computer.query.filter_by(
+        computer_name=body.computer_name
+    ).first()
+
+    if computer_name:
         message = "Wrong id."
         logger.info(
             "Last download/online time update failed. computer: {}, \
@@ -226,46 +229,16 @@ def get_credentials(body: GetCredentials):
         computer.update()
         logger.info("Supplying credentials for computer {}.", computer.computer_name)
 
-        remote_files_checksum = (
-            computer.files_checksum if computer.files_checksum else {}
-        )
-
-        msi: DesktopClient = (
-            DesktopClient.query.filter_by(flag_name=computer.msi_version).first()
-            if computer.msi_version == "stable" or computer.msi_version == "latest"
-            else DesktopClient.query.filter_by(version=computer.msi_version).first()
-        )
-        cred_info = ComputerCredentialsInfo(
-            status="success",
-            message="Supplying credentials",
-            host=computer.sftp_host,
-            company_name=computer.company_name,
-            location_name=computer.location_name if computer.location_name else "",
-            additional_locations=computer.get_additional_locations,
-            sftp_username=computer.sftp_username,
-            sftp_password=computer.sftp_password,
-            sftp_folder_path=computer.sftp_folder_path,
-            additional_folder_paths=[],
-            identifier_key=computer.identifier_key,
-            computer_name=computer.computer_name,
-            folder_password=computer.folder_password,
-            manager_host=computer.manager_host,
-            device_location=computer.device_location,
-            files_checksum=json.loads(str(remote_files_checksum)),
-            msi_version=msi.version if msi else "undefined",
-            version=msi.version if msi else "undefined",
-            use_pcc_backup=computer.location.use_pcc_backup
-            if computer.location
-            else False,
-            pcc_fac_id=computer.location.pcc_fac_id if computer.location else None,
-        )
+        # Configuration document is rebuilt only when its data is changed, agents
+        # with the same document get 304 (the endpoint is POST, so it's checked here)
+        document, etag = get_computer_config(computer)
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = Response(document, mimetype="application/json")
+        response.set_etag(etag)
 
-        return (
-            jsonify(
-                cred_info.dict(),
-            ),
-            200,
-        )
+        return response
 
     if computer_name:
         message = "Wrong id."
@@ -368,6 +341,28 @@ def files_checksum(body: FilesChecksum):
     return jsonify(status="fail", message=message), 400
 
 
+def update_printer_info(computer: Computer, printer_info: PrinterInfoDict):
+    """Write printer name and status of the computer"""
+    print_status = PrinterStatus.UNKNOWN
+
+    # TODO: fill this match with gathered data from customers pc
+    match printer_info.PrinterStatus:
+        case 0:
+            print_status = PrinterStatus.NORMAL
+        case 128:
+            print_status = PrinterStatus.OFFLINE
+        case _:
+            print_status = PrinterStatus.UNKNOWN
+
+    computer.printer_name = printer_info.Name
+    computer.printer_status = print_status
+    computer.printer_status_timestamp = CFG.offset_to_est(
+        datetime.datetime.utcnow(), True
+    )
+
+    computer.update()
+
+
 @downloads_info_blueprint.post("/printer_info")
 @logger.catch
 def printer_info(body: PrinterInfo):
@@ -378,24 +373,7 @@ def printer_info(body: PrinterInfo):
     )
 
     if computer:
-        print_status = PrinterStatus.UNKNOWN
-
-        # TODO: fill this match with gathered data from customers pc
-        match body.printer_info.PrinterStatus:
-            case 0:
-                print_status = PrinterStatus.NORMAL
-            case 128:
-                print_status = PrinterStatus.OFFLINE
-            case _:
-                print_status = PrinterStatus.UNKNOWN
-
-        computer.printer_name = body.printer_info.Name
-        computer.printer_status = print_status
-        computer.printer_status_timestamp = CFG.offset_to_est(
-            datetime.datetime.utcnow(), True
-        )
-
-        computer.update()
+        update_printer_info(computer, body.printer_info)
 
         return (
             jsonify(
@@ -1,11 +1,11 @@
-import io
 import os
 from flask import send_file, jsonify, Response, Blueprint
 
 from app.views.blueprint import BlueprintApi
-from app.models import DesktopClient, Computer, LogType, Location
+from app.models import Computer, LogType, Location
 from app.schema import LoadMSI, UpdateMSIVersion
-from app.controllers import create_log_event
+from app.controllers import client_version_registry, create_log_event
+from app.controllers.client_version_registry import ClientRelease
 
 from app.logger import logger
 
@@ -14,17 +14,56 @@ download_msi_blueprint = BlueprintApi("/download_msi", __name__)
 download_msi_fblueprint = Blueprint("download_msi", __name__)
 # TODO split blueprints
 
+# Files of the blob store never change (the name is the sha256 of the content)
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def send_msi(msi: ClientRelease, download_name: str | None = None) -> Response:
+    """Send MSI file from the blob store.
+
+    Conditional (If-None-Match with the strong ETag - sha256 of the file) and Range
+    requests are handled by send_file. The flag / version of the URL can point to
+    the other file later, so the response must be revalidated.
+    """
+    response = send_file(
+        msi.blob_path,
+        mimetype=msi.mimetype,
+        as_attachment=True,
+        download_name=download_name or msi.filename,
+        etag=msi.sha256,
+    )
+    response.cache_control.no_cache = True
+    return response
+
+
+@download_msi_fblueprint.route("/download/msi/<string:sha256>", methods=["GET"])
+@logger.catch
+def download_msi_blob(sha256: str):
+    msi = client_version_registry.by_sha256(sha256)
+    if not msi:
+        return jsonify(status="fail", message="MSI not found."), 404
+
+    response = send_file(
+        msi.blob_path,
+        mimetype=msi.mimetype,
+        as_attachment=True,
+        download_name=msi.filename,
+        etag=msi.sha256,
+        max_age=IMMUTABLE_MAX_AGE,
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
 
 @download_msi_fblueprint.route("/download/<int:id>", methods=["GET"])
 @logger.catch
 def download_msi(id):
     # TODO add guid, register to db, add to /download/23dc4cccccqd4443c
-    msi = DesktopClient.query.filter_by(id=id).first()
+    msi = client_version_registry.by_id(id)
 
     if msi:
-        return send_file(
-            io.BytesIO(msi.blob), download_name=msi.filename, mimetype=msi.mimetype
-        )
+        return send_msi(msi)
     else:
         return jsonify(status="fail", message="Wrong request data."), 400
 
@@ -39,21 +78,17 @@ def msi_download_to_local(body: LoadMSI):
     )
 
     if computer:
-        msi: DesktopClient = (
-            DesktopClient.query.filter_by(flag_name=body.flag).first()
+        msi = (
+            client_version_registry.by_flag(body.flag)
             if body.flag == "stable" or body.flag == "latest"
-            else DesktopClient.query.filter_by(version=body.version).first()
+            else client_version_registry.by_version(body.version)
         )
 
         if msi:
             logger.info(
                 "Giving file {} to computer {}.", msi.name, computer.computer_name
             )
-            return Response(
-                msi.blob,
-                mimetype=msi.mimetype,
-                headers={"Content-disposition": f"attachment; filename={msi.filename}"},
-            )
+            return send_msi(msi)
         else:
             message = "Wrong request data. Wrong or empty version."
             logger.info(
@@ -78,12 +113,7 @@ def update_current_msi_version(body: UpdateMSIVersion):
     )
 
     if computer:
-        msi: DesktopClient = (
-            DesktopClient.query.filter_by(flag_name=body.current_msi_version).first()
-            if body.current_msi_version == "stable"
-            or body.current_msi_version == "latest"
-            else DesktopClient.query.filter_by(version=body.current_msi_version).first()
-        )
+        msi = client_version_registry.resolve(body.current_msi_version)
 
         current_msi_version = msi.version if msi else "undefined"
 
@@ -113,20 +143,18 @@ def update_current_msi_version(body: UpdateMSIVersion):
 @download_msi_fblueprint.route("/download_lid/<int:lid>", methods=["GET"])
 @logger.catch
 def download_lid_msi(lid: int):
-    msi = DesktopClient.query.filter_by(flag_name="stable").first()
+    msi = client_version_registry.by_flag("stable")
     if not msi:
-        msi = DesktopClient.query.filter_by(flag_name="latest").first()
+        msi = client_version_registry.by_flag("latest")
         if not msi:
-            msi = DesktopClient.query.first()
+            msi = client_version_registry.first()
             if not msi:
                 return jsonify(status="fail", message="No MSI found."), 400
     location = Location.query.filter_by(id=lid).first()
     base_filename, extension = os.path.splitext(msi.filename)
     filename = f"{base_filename}_lid_{location.id}{extension}"
     if msi and location:
-        return send_file(
-            io.BytesIO(msi.blob), download_name=filename, mimetype=msi.mimetype
-        )
+        return send_msi(msi, download_name=filename)
     else:
         return jsonify(status="fail", message="Wrong request data."), 400
 
@@ -134,9 +162,7 @@ def download_lid_msi(lid: int):
 @download_msi_fblueprint.route("/download_unprompt_msi", methods=["GET"])
 @logger.catch
 def download_unprompt_msi():
-    msi = DesktopClient.query.filter_by(flag_name="unprompt").first()
+    msi = client_version_registry.by_flag("unprompt")
     if not msi:
         return jsonify(status="fail", message="No unprompt MSI found."), 400
-    return send_file(
-        io.BytesIO(msi.blob), download_name=msi.filename, mimetype=msi.mimetype
-    )
+    return send_msi(msi)
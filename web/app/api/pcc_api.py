@@ -1,10 +1,13 @@
+import math
 import os
 from urllib.parse import urljoin
 from flask import Response, abort
+from werkzeug.exceptions import TooManyRequests
 
 from app import schema as s, models as m
 from app.views.blueprint import BlueprintApi
 from app.controllers import get_pcc_2_legged_token, execute_pcc_request
+from app.controllers.pcc_client import PCCRateLimitedError
 from app.logger import logger
 from config import BaseConfig as CFG
 
@@ -54,6 +57,17 @@ def download_backup_from_pcc(body: s.GetPccDownloadData) -> Response:
         )
         abort(409, "PCC_ORG_ID or PCC_FAC_ID is not set")
 
+    try:
+        return download_pcc_backup(computer, body.pcc_fac_id)
+    except PCCRateLimitedError as e:
+        logger.warning("Backup download of computer {} is delayed: {}", computer, e)
+        raise TooManyRequests(
+            "PCC API is rate limited, retry later",
+            retry_after=math.ceil(e.retry_after),
+        )
+
+
+def download_pcc_backup(computer: m.Computer, pcc_fac_id: str) -> Response:
     # Get 2-legged access token
     token = get_pcc_2_legged_token()
 
@@ -65,7 +79,7 @@ def download_backup_from_pcc(body: s.GetPccDownloadData) -> Response:
         "orgs",
         computer.company.pcc_org_id,
         "facs",
-        body.pcc_fac_id,
+        pcc_fac_id,
         "backup-files",
     )
     url = urljoin(CFG.PCC_BASE_URL, backup_route)
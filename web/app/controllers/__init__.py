@@ -12,6 +12,8 @@ from .database import (
     empty_to_stable,
 )
 from .stat_company_location import update_companies_locations_statistic
+from .computer_status import update_computers_status
+from .dashboard import get_dashboard_stats
 from .pcc_api import (
     get_pcc_2_legged_token,
     get_activations,
@@ -22,6 +24,11 @@ from .pcc_api import (
     check_daily_requests_count,
     execute_pcc_request,
 )
+from .pcc_client import pcc_client
+from .pcc_token import pcc_token_manager
+from .client_version_registry import client_version_registry
+from .computer_config import get_computer_config, build_computer_config
+from .telemetry_settings import get_effective_telemetry_settings
 from .log_event import create_log_event, gen_fake_backup_download_logs
 from .backup_log import (
     gen_fake_backup_periods_logs,
@@ -30,7 +37,16 @@ from .backup_log import (
     backup_log_on_download_error,
     backup_log_on_download_error_with_message,
 )
+from .heartbeat_buffer import heartbeat_buffer
 from .pagination import create_pagination
 from .system_log import create_system_log
 from .clean_log import clean_old_logs
+from .log_partitions import create_log_partitions
 from .billing_report import create_company_billing_report, create_general_billing_report
+from .billing_rollup import rollup_billing_events
+from .billing_report_job import (
+    get_or_create_billing_report_job,
+    run_billing_report_job,
+    clean_billing_report_jobs,
+    billing_report_path,
+)
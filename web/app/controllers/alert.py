@@ -1,170 +1,310 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 
-from sqlalchemy import or_, and_
-from sqlalchemy.orm import Query
+from sqlalchemy import or_, and_, event, func
+from sqlalchemy.orm import Query, joinedload, selectinload
 from flask import render_template
 
-from app import models as m, schema as s
+from app import db, models as m, schema as s
 from app.logger import logger
+from app.models.computer_uptime import last_week_uptime
+from app.models.location_group import locations_to_group
+from app.models.user import users_to_group, users_to_location
 
-from app.utils.send_email import send_email
+from app.utils.send_email import EmailQueue, EmailStatus
 from config import BaseConfig as CFG
 
 
-def send_critical_alert():
-    """
-    CLI command for celery worker.
-    Sends critical alerts to users when location is offline (all the computers in the location are offline).
+@contextmanager
+def count_queries(stats: dict):
+    """Count SQL statements executed inside the block into stats["queries"]"""
+
+    def on_execute(*args):
+        stats["queries"] += 1
+
+    event.listen(db.engine, "before_cursor_execute", on_execute)
+    try:
+        yield stats
+    finally:
+        event.remove(db.engine, "before_cursor_execute", on_execute)
+
+
+def alert_users_index(company_ids: list[int]) -> dict[tuple[str, int], list[m.User]]:
     """
-    current_east_time: datetime = CFG.offset_to_est(datetime.utcnow(), True)
+    Returns active users of the companies indexed by their permission scope.
+    Every user is indexed once per group or location, deleted ones are skipped.
 
-    logger.info(
-        "<---Start sending critical alerts. Time: {}--->",
-        datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
-    )
+    Args:
+        company_ids (list[int]): ids of the companies
 
-    # Select all the active locations (except connected to trial and deactivated companies)
-    locations: list[m.Location] = (
-        m.Location.query.join(m.Company)
+    Returns:
+        dict[tuple[str, int], list[m.User]]: users by keys
+            ("company", company_id), ("location_group", location_group_id) and ("location", location_id)
+    """
+    users_index: dict[tuple[str, int], list[m.User]] = defaultdict(list)
+    if not company_ids:
+        return users_index
+
+    rows = (
+        m.User.query.join(m.Company, m.Company.id == m.User.company_id)
+        .outerjoin(users_to_group, users_to_group.c.user_id == m.User.id)
+        .outerjoin(
+            m.LocationGroup,
+            and_(
+                m.LocationGroup.id == users_to_group.c.location_group_id,
+                m.LocationGroup.is_deleted.is_(False),
+            ),
+        )
+        .outerjoin(users_to_location, users_to_location.c.user_id == m.User.id)
+        .outerjoin(
+            m.Location,
+            and_(
+                m.Location.id == users_to_location.c.location_id,
+                m.Location.is_deleted.is_(False),
+            ),
+        )
         .filter(
-            m.Location.activated.is_(True),
-            m.Company.is_trial.is_(False),
-            m.Company.activated.is_(True),
+            m.User.activated.is_(True),
+            m.User.company_id.in_(company_ids),
+            m.Company.is_global.is_(False),
+        )
+        .add_columns(
+            users_to_group.c.location_group_id,
+            m.LocationGroup.id,
+            users_to_location.c.location_id,
+            m.Location.id,
         )
+        .order_by(m.User.id)
         .all()
     )
 
-    for location in locations:
-        location_computers_query: Query = m.Computer.query.filter(
-            m.Computer.location_id == location.id,
-            m.Computer.activated.is_(True),
+    # Rows are the product of the user links, ids of deleted groups and locations
+    # are NULL: a user connected only to them gets no alerts (not company ones)
+    user_scopes: dict[int, tuple[m.User, set[int], set[int], bool]] = {}
+    for user, linked_group_id, group_id, linked_location_id, location_id in rows:
+        _, location_group_ids, location_ids, linked = user_scopes.get(
+            user.id, (user, set(), set(), False)
         )
-        with_prev_backups_comps = (
-            location_computers_query.filter(m.Computer.last_download_time.is_not(None))
-            .order_by(m.Computer.last_download_time.desc())
-            .all()
+        if group_id:
+            location_group_ids.add(group_id)
+        if location_id:
+            location_ids.add(location_id)
+        user_scopes[user.id] = (
+            user,
+            location_group_ids,
+            location_ids,
+            linked or bool(linked_group_id or linked_location_id),
         )
 
-        # Check that there are no computers connected to the location
-        # Or it has at least one computer that downloaded backup in last 2 hours
-        if not location_computers_query.all() or (
-            with_prev_backups_comps
-            and current_east_time - with_prev_backups_comps[0].last_download_time
-            < timedelta(hours=2)
-        ):
-            continue
+    # The same order of checks as in User.permission, once per user
+    for user, location_group_ids, location_ids, linked in user_scopes.values():
+        if location_group_ids:
+            for location_group_id in location_group_ids:
+                users_index[("location_group", location_group_id)].append(user)
+        elif location_ids:
+            for location_id in location_ids:
+                users_index[("location", location_id)].append(user)
+        elif not linked:
+            users_index[("company", user.company_id)].append(user)
 
-        # Alert only every 2 hours
-        if (
-            with_prev_backups_comps
-            and (
-                current_east_time - with_prev_backups_comps[0].last_download_time
-            ).seconds
-            // 3600
-            % 2
-            != 0
-        ):
-            continue
+    return users_index
 
-        # Select all the company active users
-        connected_users: list[m.User] = []
-        all_company_users: list[m.User] = m.User.query.filter(
-            m.User.activated.is_(True),
-            m.User.company_id == location.company_id,
-        ).all()
 
-        for user in all_company_users:
-            # If user has company level permission
-            if user.permission == m.UserPermissionLevel.COMPANY:
-                # Send to company level user only if location is offline more than 4 hours
-                if (
-                    with_prev_backups_comps
-                    and current_east_time
-                    - with_prev_backups_comps[0].last_download_time
-                    < timedelta(hours=4)
-                ):
-                    continue
-                else:
-                    connected_users.append(user)
-            # If user has location group level permission
-            elif (
-                location.group
-                and user.permission == m.UserPermissionLevel.LOCATION_GROUP
-                and user.location_group[0].id == location.group[0].id
-            ):
-                connected_users.append(user)
-            # If user has location level permission
-            elif (
-                user.permission == m.UserPermissionLevel.LOCATION
-                and user.location[0].id == location.id
-            ):
-                connected_users.append(user)
-            else:
-                continue
+def send_critical_alert() -> dict:
+    """
+    CLI command for celery worker.
+    Sends critical alerts to users when location is offline (all the computers in the location are offline).
 
-        if not connected_users:
-            continue
+    Locations, their newest download times and the users are fetched with a constant
+    number of queries, alert decisions are made in memory.
 
-        recipients = [
-            user.email for user in connected_users if user.receive_alert_emails
-        ]
-        if not recipients:
-            logger.debug(
-                "Critical alert email was not sent for location users of {}. Reason: no users for receive emails was found",
-                location.name,
+    Returns:
+        dict: stats of the run (locations scanned, alerts sent, queries issued, elapsed time)
+    """
+    current_east_time: datetime = CFG.offset_to_est(datetime.utcnow(), True)
+    start_time = time.perf_counter()
+    stats = dict(locations=0, alerts=0, failed=0, queries=0)
+    email_queue = EmailQueue()
+
+    logger.info(
+        "<---Start sending critical alerts. Time: {}--->",
+        datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+    )
+
+    with count_queries(stats):
+        # Select all the active locations (except connected to trial and deactivated companies)
+        locations: list[tuple[m.Location, int | None]] = (
+            m.Location.query.join(m.Company, m.Company.id == m.Location.company_id)
+            .outerjoin(
+                locations_to_group,
+                locations_to_group.c.location_id == m.Location.id,
             )
-            continue
-        primary_computers = (
-            location_computers_query.filter(
-                m.Computer.device_role == m.DeviceRole.PRIMARY
+            .outerjoin(
+                m.LocationGroup,
+                and_(
+                    m.LocationGroup.id == locations_to_group.c.location_group_id,
+                    m.LocationGroup.is_deleted.is_(False),
+                ),
             )
-            .order_by(m.Computer.computer_name)
-            .all()
-        )
-        alternate_computers = (
-            location_computers_query.filter(
-                m.Computer.device_role == m.DeviceRole.ALTERNATE
+            .filter(
+                m.Location.activated.is_(True),
+                m.Company.is_trial.is_(False),
+                m.Company.activated.is_(True),
             )
-            .order_by(m.Computer.computer_name)
+            .add_columns(m.LocationGroup.id)
             .all()
         )
-        last_backup_time = (
-            with_prev_backups_comps[0].last_download_time
-            if with_prev_backups_comps
-            else None
-        )
+        stats["locations"] = len(locations)
+
+        # Newest download time and number of active computers for every location
+        location_downloads: dict[int, tuple[datetime | None, int]] = {
+            location_id: (last_download_time, computers)
+            for location_id, last_download_time, computers in db.session.query(
+                m.Computer.location_id,
+                func.max(m.Computer.last_download_time),
+                func.count(m.Computer.id),
+            )
+            .filter(
+                m.Computer.is_deleted.is_(False),
+                m.Computer.activated.is_(True),
+                m.Computer.location_id.in_([location.id for location, _ in locations]),
+            )
+            .group_by(m.Computer.location_id)
+        }
+
+        # Locations to alert: (location, location_group_id, last_backup_time, alert_company_users)
+        offline_locations: list[
+            tuple[m.Location, int | None, datetime | None, bool]
+        ] = []
+        for location, location_group_id in locations:
+            last_backup_time, computers = location_downloads.get(location.id, (None, 0))
+
+            # Check that there are no computers connected to the location
+            # Or it has at least one computer that downloaded backup in last 2 hours
+            if not computers or (
+                last_backup_time
+                and current_east_time - last_backup_time < timedelta(hours=2)
+            ):
+                continue
+
+            # Alert only every 2 hours
+            if (
+                last_backup_time
+                and (current_east_time - last_backup_time).seconds // 3600 % 2 != 0
+            ):
+                continue
 
-        alert_html = render_template(
-            "email/critical-alert-email.html",
-            location=location,
-            primary_computers=primary_computers,
-            alternate_computers=alternate_computers,
-            last_backup_time=last_backup_time,
+            # Send to company level users only if location is offline more than 4 hours
+            alert_company_users = (
+                not last_backup_time
+                or current_east_time - last_backup_time >= timedelta(hours=4)
+            )
+            offline_locations.append(
+                (location, location_group_id, last_backup_time, alert_company_users)
+            )
+
+        users_index = alert_users_index(
+            list({location.company_id for location, *_ in offline_locations})
         )
 
-        try:
-            send_email(
+        location_computers: dict[int, list[m.Computer]] = defaultdict(list)
+        if offline_locations:
+            for computer in m.Computer.query.filter(
+                m.Computer.activated.is_(True),
+                m.Computer.location_id.in_(
+                    [location.id for location, *_ in offline_locations]
+                ),
+            ).order_by(m.Computer.computer_name):
+                location_computers[computer.location_id].append(computer)
+
+        for (
+            location,
+            location_group_id,
+            last_backup_time,
+            alert_company_users,
+        ) in offline_locations:
+            connected_users: list[m.User] = users_index.get(
+                ("location", location.id), []
+            ) + users_index.get(("location_group", location_group_id), [])
+            if alert_company_users:
+                connected_users += users_index.get(("company", location.company_id), [])
+
+            if not connected_users:
+                continue
+
+            recipients = list(
+                dict.fromkeys(
+                    user.email
+                    for user in connected_users
+                    if user.receive_alert_emails
+                )
+            )
+            if not recipients:
+                logger.debug(
+                    "Critical alert email was not sent for location users of {}. Reason: no users for receive emails was found",
+                    location.name,
+                )
+                continue
+
+            computers = location_computers[location.id]
+            alert_html = render_template(
+                "email/critical-alert-email.html",
+                location=location,
+                primary_computers=[
+                    computer
+                    for computer in computers
+                    if computer.device_role == m.DeviceRole.PRIMARY
+                ],
+                alternate_computers=[
+                    computer
+                    for computer in computers
+                    if computer.device_role == m.DeviceRole.ALTERNATE
+                ],
+                last_backup_time=last_backup_time,
+            )
+
+            email_queue.add(
                 subject=f"ALERT! Location {location.name} is offline",
-                sender=CFG.MAIL_DEFAULT_SENDER,
                 recipients=recipients,
                 html=alert_html,
+                context=location,
             )
 
+        email_queue.send_all()
+
+        for email in email_queue.emails:
+            location: m.Location = email.context
+            if email.status != EmailStatus.SENT:
+                stats["failed"] += 1
+                logger.error(
+                    "Critical alert email was not sent for location {}. Error: {}",
+                    location.name,
+                    email.error,
+                )
+                continue
+
             # Create record about new alert event
-            new_alert_event = m.AlertEvent(
-                location_id=location.id, alert_type=m.AlertEventType.CRITICAL_ALERT
+            db.session.add(
+                m.AlertEvent(
+                    location_id=location.id,
+                    alert_type=m.AlertEventType.CRITICAL_ALERT,
+                )
             )
-            new_alert_event.save()
-
+            stats["alerts"] += 1
             logger.info("Critical alert email sent for location {}", location.name)
-        except Exception as err:
-            logger.error(
-                "Critical alert email was not sent for location {}. Error: {}",
-                location.name,
-                err,
-            )
 
-    logger.info("<---Finish sending critical alerts--->")
+        db.session.commit()
+
+    stats["elapsed"] = round(time.perf_counter() - start_time, 3)
+    logger.info(
+        "<---Finish sending critical alerts--->: locations {locations}, "
+        "alerts sent {alerts} (failed {failed}), queries {queries}, {elapsed} sec",
+        **stats,
+    )
+
+    return stats
 
 
 def send_primary_computer_alert():
@@ -190,6 +330,7 @@ def send_primary_computer_alert():
         ),
     ).all()
 
+    email_queue = EmailQueue()
     for computer in all_primary_computers:
         if not computer.location or not computer.company or computer.company.is_trial:
             continue
@@ -229,35 +370,42 @@ def send_primary_computer_alert():
                 computer.computer_name,
             )
             continue
-        try:
-            send_email(
-                subject=f"ALERT! Primary computer {computer.computer_name} is down",
-                sender=CFG.MAIL_DEFAULT_SENDER,
-                recipients=recipients,
-                html=render_template(
-                    "email/primary-computer-alert-email.html",
-                    location=computer.location,
-                    computer=computer,
-                ),
-            )
+        email_queue.add(
+            subject=f"ALERT! Primary computer {computer.computer_name} is down",
+            recipients=recipients,
+            html=render_template(
+                "email/primary-computer-alert-email.html",
+                location=computer.location,
+                computer=computer,
+            ),
+            context=computer,
+        )
 
-            # Create record about new alert event
-            new_alert_event = m.AlertEvent(
-                location_id=computer.location.id,
-                alert_type=m.AlertEventType.PRIMARY_COMPUTER_DOWN,
-            )
-            new_alert_event.save()
+    email_queue.send_all()
 
-            logger.info(
-                "Primary computer down alert email sent for computer {}",
-                computer.computer_name,
-            )
-        except Exception as err:
+    for email in email_queue.emails:
+        computer: m.Computer = email.context
+        if email.status != EmailStatus.SENT:
             logger.error(
                 "Primary computer down alert email was not sent for computer {}. Error: {}",
                 computer.computer_name,
-                err,
+                email.error,
+            )
+            continue
+
+        # Create record about new alert event
+        db.session.add(
+            m.AlertEvent(
+                location_id=computer.location_id,
+                alert_type=m.AlertEventType.PRIMARY_COMPUTER_DOWN,
             )
+        )
+        logger.info(
+            "Primary computer down alert email sent for computer {}",
+            computer.computer_name,
+        )
+
+    db.session.commit()
 
     logger.info("<---Finish sending primary computer down alerts--->")
 
@@ -338,6 +486,7 @@ def divide_computers_by_location(
 
 
 def send_company_daily_summary(
+    email_queue: EmailQueue,
     company: m.Company,
     target_users: list[m.User],
     computers_by_location: dict[str, m.Computer],
@@ -346,6 +495,7 @@ def send_company_daily_summary(
     Sends daily summary to company users with company level permission.
 
     Args:
+        email_queue (EmailQueue): queue to add email to
         company (m.Company): company object
         target_users (list[m.User]): list of users
         computers_by_location (dict[str, m.Computer]): dictionary with locations as keys
@@ -361,16 +511,15 @@ def send_company_daily_summary(
         )
         return
     try:
-        send_email(
+        email_queue.add(
             subject="eMAR Vault Daily Summary",
-            sender=CFG.MAIL_DEFAULT_SENDER,
             recipients=recipients,
             html=render_template(
                 "email/daily-summary-email.html",
                 computers_by_location=computers_by_location,
             ),
         )
-        logger.info("Daily summary email sent for company users of {}", company.name)
+        logger.info("Daily summary email queued for company users of {}", company.name)
     except Exception as err:
         logger.error(
             "Daily summary email was not sent for company users of {}. Error: {}",
@@ -380,6 +529,7 @@ def send_company_daily_summary(
 
 
 def send_location_group_daily_summary(
+    email_queue: EmailQueue,
     company: m.Company,
     location_group_level_users: dict[str, list[m.User]],
     computers_by_location: dict[str, m.Computer],
@@ -388,6 +538,7 @@ def send_location_group_daily_summary(
     Sends daily summary to company users with location group level permission.
 
     Args:
+        email_queue (EmailQueue): queue to add emails to
         company (m.Company): company object
         location_group_level_users (dict[str, list[m.User]]): dictionary with location group names as keys
             and list of users as values
@@ -423,9 +574,8 @@ def send_location_group_daily_summary(
             continue
 
         try:
-            send_email(
+            email_queue.add(
                 subject="eMAR Vault Daily Summary",
-                sender=CFG.MAIL_DEFAULT_SENDER,
                 recipients=recipients,
                 html=render_template(
                     "email/daily-summary-email.html",
@@ -433,7 +583,7 @@ def send_location_group_daily_summary(
                 ),
             )
             logger.info(
-                "Daily summary email sent for location group users of {}",
+                "Daily summary email queued for location group users of {}",
                 location_group,
             )
         except Exception as err:
@@ -445,6 +595,7 @@ def send_location_group_daily_summary(
 
 
 def send_location_daily_summary(
+    email_queue: EmailQueue,
     location_level_users: dict[str, list[m.User]],
     computers_by_location: dict[str, m.Computer],
 ):
@@ -452,6 +603,7 @@ def send_location_daily_summary(
     Sends daily summary to company users with location level permission.
 
     Args:
+        email_queue (EmailQueue): queue to add emails to
         location_level_users (dict[str, list[m.User]]): dictionary with location names as keys
             and list of users as values
         computers_by_location (dict[str, m.Computer]): dictionary with locations as keys
@@ -472,16 +624,15 @@ def send_location_daily_summary(
             continue
 
         try:
-            send_email(
+            email_queue.add(
                 subject="eMAR Vault Daily Summary",
-                sender=CFG.MAIL_DEFAULT_SENDER,
                 recipients=recipients,
                 html=render_template(
                     "email/daily-summary-email.html",
                     computers_by_location={location: computers_by_location[location]},
                 ),
             )
-            logger.info("Daily summary email sent for location users of {}", location)
+            logger.info("Daily summary email queued for location users of {}", location)
         except Exception as err:
             logger.error(
                 "Daily summary email was not sent for location users of {}. Error: {}",
@@ -508,6 +659,7 @@ def send_daily_summary():
         m.Company.activated.is_(True),
     ).all()
 
+    email_queue = EmailQueue()
     for company in companies:
         current_east_time: datetime = CFG.offset_to_est(datetime.utcnow(), True)
 
@@ -546,6 +698,7 @@ def send_daily_summary():
         # Send company level summary
         if company_level_users:
             send_company_daily_summary(
+                email_queue=email_queue,
                 company=company,
                 target_users=company_level_users,
                 computers_by_location=computers_by_location,
@@ -554,6 +707,7 @@ def send_daily_summary():
         # Send location group level summary
         if location_group_level_users:
             send_location_group_daily_summary(
+                email_queue=email_queue,
                 company=company,
                 location_group_level_users=location_group_level_users,
                 computers_by_location=computers_by_location,
@@ -562,225 +716,327 @@ def send_daily_summary():
         # Send location level summary
         if location_level_users:
             send_location_daily_summary(
+                email_queue=email_queue,
                 location_level_users=location_level_users,
                 computers_by_location=computers_by_location,
             )
 
+    email_queue.send_all()
+
     logger.info("<---Finish sending daily summaries--->")
 
 
-def send_weekly_summary():
+def is_computer_offline(computer: m.Computer, current_east_time: datetime) -> bool:
+    """Computer didn't download backup during the last 1.5 hours"""
+    return (
+        not computer.last_download_time
+        or computer.last_download_time
+        < current_east_time - timedelta(hours=1, minutes=30)
+    )
+
+
+def summary_counters(
+    computers: list[m.Computer], current_east_time: datetime
+) -> dict[str, int]:
+    """
+    Counters of the summary email calculated from the activated computers
+    (the same as Company, LocationGroup and Location counters).
+
+    Args:
+        computers (list[m.Computer]): activated computers of the summary
+        current_east_time (datetime): current EST time
+
+    Returns:
+        dict[str, int]: total_computers, primary_computers_offline,
+            total_offline_computers and total_offline_locations
+    """
+    offline_computers = [
+        computer
+        for computer in computers
+        if is_computer_offline(computer, current_east_time)
+    ]
+    locations = {computer.location_id for computer in computers if computer.location_id}
+    online_locations = {
+        computer.location_id
+        for computer in computers
+        if not is_computer_offline(computer, current_east_time)
+    }
+
+    return dict(
+        total_computers=len(computers),
+        primary_computers_offline=len(
+            [
+                computer
+                for computer in offline_computers
+                if computer.device_role == m.DeviceRole.PRIMARY
+            ]
+        ),
+        total_offline_computers=len(offline_computers),
+        total_offline_locations=len(locations - online_locations),
+    )
+
+
+def weekly_computers_by_location(
+    computers: list[m.Computer], current_east_time: datetime
+) -> dict[int, s.ComputersByLocation]:
+    """
+    Weekly stats of the activated computers grouped by location.
+
+    Offline occurrences and offline time of all the computers are calculated from
+    their uptime bitmaps loaded with one query.
+
+    Args:
+        computers (list[m.Computer]): activated computers (location is loaded)
+        current_east_time (datetime): current EST time
+
+    Returns:
+        dict[int, s.ComputersByLocation]: computers by location id
+    """
+    uptime = last_week_uptime([computer.id for computer in computers])
+
+    location_computers: dict[int, list[m.Computer]] = defaultdict(list)
+    for computer in computers:
+        if computer.location_id:
+            location_computers[computer.location_id].append(computer)
+
+    computers_by_location: dict[int, s.ComputersByLocation] = {}
+    for location_id, computers in location_computers.items():
+        location: m.Location = computers[0].location
+        company: m.Company = computers[0].company
+        counters = summary_counters(computers, current_east_time)
+
+        computer_infos: list[s.ComputerInfo] = []
+        for computer in computers:
+            occurrences, offline_time = uptime[computer.id].offline_stats()
+            computer_infos.append(
+                s.ComputerInfo(
+                    computer_name=computer.computer_name,
+                    location_name=location.name,
+                    company_name=company.name,
+                    download_status=computer.download_status,
+                    last_download_time=computer.last_download_time,
+                    offline_period=computer.offline_period,
+                    device_role=computer.device_role,
+                    status=computer.status,
+                    last_week_offline_occurrences=(
+                        occurrences if computer.logs_enabled else None
+                    ),
+                    last_week_offline_time=(
+                        offline_time if computer.logs_enabled else None
+                    ),
+                )
+            )
+
+        computers_by_location[location_id] = s.ComputersByLocation(
+            location=s.LocationInfo(
+                name=location.name,
+                company_name=company.name,
+                total_computers=counters["total_computers"],
+                total_computers_offline=counters["total_offline_computers"],
+                primary_computers_offline=counters["primary_computers_offline"],
+                default_sftp_path=location.default_sftp_path,
+                pcc_fac_id=location.pcc_fac_id,
+            ),
+            computers=computer_infos,
+        )
+
+    return computers_by_location
+
+
+def send_weekly_summary() -> dict:
     """
     CLI command for celery worker.
     Sends weekly summary about computers to users.
+
+    Weekly stats of all the activated computers, the counters of the companies,
+    location groups and locations and the users are calculated once for the run
+    with a constant number of queries and are shared by all the emails.
+
+    Returns:
+        dict: stats of the run (companies, computers, emails, queries, elapsed time)
     """
+    current_east_time: datetime = CFG.offset_to_est(datetime.utcnow(), True)
+    start_time = time.perf_counter()
+    stats = dict(companies=0, computers=0, emails=0, queries=0)
+    email_queue = EmailQueue()
 
     logger.info(
         "<---Start sending weekly summaries. Time: {}--->",
         datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
     )
 
-    # Select all the companies except global and deactivated
-    companies: list[m.Company] = m.Company.query.filter(
-        m.Company.is_global.is_(False),
-        m.Company.activated.is_(True),
-    ).all()
+    with count_queries(stats):
+        # Select all the companies except global and deactivated
+        companies: list[m.Company] = m.Company.query.filter(
+            m.Company.is_global.is_(False),
+            m.Company.activated.is_(True),
+        ).all()
+        company_ids = [company.id for company in companies]
+        stats["companies"] = len(companies)
 
-    for company in companies:
-        company_computers_query: Query = m.Computer.query.filter(
-            m.Computer.company_id == company.id,
-            m.Computer.activated.is_(True),
-        ).order_by(
-            m.Computer.location_name,
-            m.Computer.device_role,
-            m.Computer.computer_name,
-        )
+        users_index = alert_users_index(company_ids)
 
-        # If there are no users connected to the company or computers - skip it
-        if not company.users or not company_computers_query.all():
-            continue
+        location_groups: dict[int, list[m.LocationGroup]] = defaultdict(list)
+        for location_group in m.LocationGroup.query.options(
+            selectinload(m.LocationGroup.locations)
+        ).filter(m.LocationGroup.company_id.in_(company_ids)):
+            location_groups[location_group.company_id].append(location_group)
 
-        (
-            company_level_users,
-            location_group_level_users,
-            location_level_users,
-        ) = company_users_by_permission(company)
+        company_computers: dict[int, list[m.Computer]] = defaultdict(list)
+        computers: list[m.Computer] = (
+            m.Computer.query.options(
+                joinedload(m.Computer.location), joinedload(m.Computer.company)
+            )
+            .filter(
+                m.Computer.company_id.in_(company_ids),
+                m.Computer.activated.is_(True),
+            )
+            .order_by(
+                m.Computer.location_name,
+                m.Computer.device_role,
+                m.Computer.computer_name,
+            )
+            .all()
+        )
+        for computer in computers:
+            company_computers[computer.company_id].append(computer)
+        stats["computers"] = len(computers)
 
-        # Create dictionary with locations as keys and list of computers as values
-        company_computers_by_location: dict[
-            str, s.ComputersByLocation
-        ] = divide_computers_by_location(company_computers_query.all())
+        # Weekly stats of every computer are calculated once for all the emails
+        computers_by_location = weekly_computers_by_location(
+            computers, current_east_time
+        )
 
-        # Send company level summary
-        if company_level_users:
-            recipients: list[str] = [
-                user.email
-                for user in company_level_users
-                if user.receive_summaries_emails
-            ]
+        def add_summary_email(
+            users: list[m.User],
+            target: str,
+            location_ids: list[int],
+            counters: dict[str, int],
+            **context,
+        ):
+            recipients: list[str] = list(
+                dict.fromkeys(
+                    user.email for user in users if user.receive_summaries_emails
+                )
+            )
             if not recipients:
                 logger.debug(
-                    "Weekly summary email for company {} was not sent. Reason: no users for receive emails was found",
-                    company.name,
+                    "Weekly summary email for {} was not sent. Reason: no users for receive emails was found",
+                    target,
                 )
-                continue
+                return
 
-            try:
-                send_email(
-                    subject="eMAR Vault Weekly Summary",
-                    sender=CFG.MAIL_DEFAULT_SENDER,
-                    recipients=recipients,
-                    html=render_template(
-                        "email/weekly-summary-email.html",
-                        total_computers=company.total_computers_counter,
-                        primary_computers_offline=company.primary_computers_offline,
-                        total_offline_computers=company.total_offline_computers,
-                        total_offline_locations=company.total_offline_locations,
-                        total_locations=company.locations_per_company,
-                        computers_by_location=company_computers_by_location,
-                        is_company_trial=company.is_trial,
-                    ),
-                )
-                logger.info(
-                    "Weekly summary email sent for company users of {}", company.name
-                )
-            except Exception as err:
-                logger.error(
-                    "Weekly summary email was not sent for company users of {}. Error: {}",
-                    company.name,
-                    err,
+            target_computers_by_location: dict[str, s.ComputersByLocation] = {
+                computers_by_location[location_id].location.name: (
+                    computers_by_location[location_id]
                 )
+                for location_id in location_ids
+            }
+            email_queue.add(
+                subject="eMAR Vault Weekly Summary",
+                recipients=recipients,
+                html=render_template(
+                    "email/weekly-summary-email.html",
+                    computers_by_location=target_computers_by_location,
+                    **counters,
+                    **context,
+                ),
+                context=target,
+            )
+            logger.info("Weekly summary email queued for users of {}", target)
 
-        # Send location group level summary
-        if location_group_level_users:
-            for location_group_name, users in location_group_level_users.items():
-                recipients: list[str] = [
-                    user.email for user in users if user.receive_summaries_emails
-                ]
-                if not recipients:
-                    logger.debug(
-                        "Weekly summary email for location_group {} was not sent. Reason: no users for receive emails was found",
-                        location_group_name,
-                    )
-                    continue
+        for company in companies:
+            computers = company_computers[company.id]
 
-                location_group: m.LocationGroup = m.LocationGroup.query.filter(
-                    m.LocationGroup.company_id == company.id,
-                    m.LocationGroup.name == location_group_name,
-                ).first()
+            # If there are no activated computers in the company - skip it
+            if not computers:
+                continue
 
-                location_ids: list[int] = [
+            # Locations of the company computers in the order of the computers
+            location_ids: list[int] = list(
+                dict.fromkeys(
+                    computer.location_id
+                    for computer in computers
+                    if computer.location_id
+                )
+            )
+
+            # Send company level summary
+            add_summary_email(
+                users_index.get(("company", company.id), []),
+                f"company {company.name}",
+                location_ids,
+                summary_counters(computers, current_east_time),
+                total_locations=company.locations_per_company,
+                is_company_trial=company.is_trial,
+            )
+
+            # Send location group level summary
+            for location_group in location_groups[company.id]:
+                users = users_index.get(("location_group", location_group.id), [])
+                group_location_ids = {
                     location.id for location in location_group.locations
+                }
+                group_computers = [
+                    computer
+                    for computer in computers
+                    if computer.location_id in group_location_ids
                 ]
+                if not users or not group_computers:
+                    continue
 
-                group_computers_query = m.Computer.query.filter(
-                    m.Computer.location_id.in_(location_ids),
-                    m.Computer.activated.is_(True),
-                ).order_by(
-                    m.Computer.location_name,
-                    m.Computer.device_role,
-                    m.Computer.computer_name,
+                add_summary_email(
+                    users,
+                    f"location group {location_group.name}",
+                    [
+                        location_id
+                        for location_id in location_ids
+                        if location_id in group_location_ids
+                    ],
+                    summary_counters(group_computers, current_east_time),
+                    is_company_trial=company.is_trial,
                 )
 
-                if not users or not group_computers_query.all():
+            # Send location level summary
+            for location_id in location_ids:
+                users = users_index.get(("location", location_id), [])
+                if not users:
                     continue
 
-                # Create dictionary with locations as keys and list of computers as values
-                group_computers_by_location: dict[
-                    str, s.ComputersByLocation
-                ] = divide_computers_by_location(group_computers_query.all())
-
-                try:
-                    send_email(
-                        subject="eMAR Vault Weekly Summary",
-                        sender=CFG.MAIL_DEFAULT_SENDER,
-                        recipients=recipients,
-                        html=render_template(
-                            "email/weekly-summary-email.html",
-                            total_computers=location_group.total_computers,
-                            primary_computers_offline=location_group.primary_computers_offline,
-                            total_offline_computers=location_group.total_offline_computers,
-                            total_offline_locations=location_group.total_offline_locations,
-                            computers_by_location=group_computers_by_location,
-                            is_company_trial=company.is_trial,
-                        ),
-                    )
-                    logger.info(
-                        "Weekly summary email sent for location group users of {}",
-                        location_group,
-                    )
-                except Exception as err:
-                    logger.error(
-                        "Weekly summary email was not sent for location group users of {}. Error: {}",
-                        location_group,
-                        err,
-                    )
-
-        # Send location level summary
-        if location_level_users:
-            for location_name, users in location_level_users.items():
-                recipients: list[str] = [
-                    user.email for user in users if user.receive_summaries_emails
+                location_computers = [
+                    computer
+                    for computer in computers
+                    if computer.location_id == location_id
                 ]
-                if not recipients:
-                    logger.debug(
-                        "Weekly summary email for location {} was not sent. Reason: no users for receive emails was found",
-                        location_name,
-                    )
-                    continue
-
-                location: m.Location = m.Location.query.filter(
-                    m.Location.company_id == company.id,
-                    m.Location.name == location_name,
-                ).first()
-
-                activated_computers_query = m.Computer.query.filter(
-                    m.Computer.location_id == location.id,
-                    m.Computer.activated.is_(True),
+                add_summary_email(
+                    users,
+                    f"location {computers_by_location[location_id].location.name}",
+                    [location_id],
+                    summary_counters(location_computers, current_east_time),
+                    is_company_trial=company.is_trial,
                 )
 
-                online_computers = activated_computers_query.filter(
-                    m.Computer.last_download_time.is_not(None),
-                    m.Computer.last_download_time
-                    >= CFG.offset_to_est(datetime.utcnow(), True)
-                    - timedelta(hours=1, minutes=30),
-                ).count()
+        email_queue.send_all()
 
-                # Check that location has activated computers and users otherwise skip it
-                if not users or not activated_computers_query.all():
-                    continue
+    for email in email_queue.emails:
+        if email.status != EmailStatus.SENT:
+            logger.error(
+                "Weekly summary email was not sent for users of {}. Error: {}",
+                email.context,
+                email.error,
+            )
+            continue
+        stats["emails"] += 1
 
-                try:
-                    send_email(
-                        subject="eMAR Vault Weekly Summary",
-                        sender=CFG.MAIL_DEFAULT_SENDER,
-                        recipients=recipients,
-                        html=render_template(
-                            "email/weekly-summary-email.html",
-                            total_computers=location.total_computers,
-                            primary_computers_offline=location.primary_computers_offline,
-                            total_offline_computers=location.total_computers_offline,
-                            total_offline_locations=(0 if online_computers else 1),
-                            computers_by_location={
-                                location_name: company_computers_by_location[
-                                    location_name
-                                ]
-                            },
-                            is_company_trial=company.is_trial,
-                        ),
-                    )
-                    logger.info(
-                        "Weekly summary email sent for location users of {}",
-                        location_name,
-                    )
-                except Exception as err:
-                    logger.error(
-                        "Weekly summary email was not sent for location users of {}. Error: {}",
-                        location_name,
-                        err,
-                    )
+    stats["elapsed"] = round(time.perf_counter() - start_time, 3)
+    logger.info(
+        "<---Finish sending weekly summaries--->: companies {companies}, "
+        "computers {computers}, emails sent {emails}, queries {queries}, "
+        "{elapsed} sec",
+        **stats,
+    )
 
-    logger.info("<---Finish sending weekly summaries--->")
+    return stats
 
 
 def send_monthly_email():
@@ -801,6 +1057,7 @@ def send_monthly_email():
         m.Company.is_trial.is_(False),
     ).all()
 
+    email_queue = EmailQueue()
     for company in companies:
         company_computers_query = m.Computer.query.filter(
             m.Computer.company_id == company.id,
@@ -855,9 +1112,8 @@ def send_monthly_email():
                     continue
 
                 try:
-                    send_email(
+                    email_queue.add(
                         subject="eMAR Vault - Access to Backup Files Test",
-                        sender=CFG.MAIL_DEFAULT_SENDER,
                         recipients=recipients,
                         html=render_template(
                             "email/monthly-email.html",
@@ -869,7 +1125,7 @@ def send_monthly_email():
                         ),
                     )
                     logger.info(
-                        "Monthly email sent for location users of {}",
+                        "Monthly email queued for location users of {}",
                         location_name,
                     )
                 except Exception as err:
@@ -879,4 +1135,6 @@ def send_monthly_email():
                         err,
                     )
 
+    email_queue.send_all()
+
     logger.info("<---Finish sending Monthly emails--->")
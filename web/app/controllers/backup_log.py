@@ -1,7 +1,11 @@
 import enum
 import random
 from datetime import datetime, timedelta
+from functools import wraps
 
+from sqlalchemy import select
+
+from app import db
 from app import models as m
 from app.logger import logger
 
@@ -11,9 +15,44 @@ class BackupLogError(enum.Enum):
     TWO_HOURS = "Longer than 2 hours without a backup"
 
 
+def backup_period_transition(func):
+    """Run the backup periods state machine of the computer in a single transaction.
+
+    The computer row is locked (SELECT ... FOR UPDATE) before the last period is read,
+    so concurrent heartbeats and requests to view of the same computer are applied
+    one after another and can't duplicate the periods. All the created and updated
+    periods are committed at once.
+    """
+
+    @wraps(func)
+    def wrapper(computer: m.Computer, *args, **kwargs):
+        try:
+            db.session.execute(
+                select(m.Computer.id)
+                .where(m.Computer.id == computer.id)
+                .with_for_update()
+            )
+            result = func(computer, *args, **kwargs)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        return result
+
+    return wrapper
+
+
+def add_backup_log(backup_log: m.BackupLog):
+    """Add backup period to the current transaction (flushed to get its id)"""
+    db.session.add(backup_log)
+    db.session.flush()
+
+
+@backup_period_transition
 def backup_log_on_download_success(
     computer: m.Computer,
-    current_time: datetime = datetime.utcnow(),
+    current_time: datetime | None = None,
 ):
     """Create or update backup log for computer
 
@@ -22,6 +61,7 @@ def backup_log_on_download_success(
         current_time (datetime, optional): time when log should be updated or created.Should be in UTC not EST.
         Defaults to datetime.utcnow().
     """
+    current_time = current_time or datetime.utcnow()
     last_computer_log = (
         m.BackupLog.query.filter_by(computer_id=computer.id)
         .order_by(m.BackupLog.start_time.desc(), m.BackupLog.end_time.desc())
@@ -39,7 +79,7 @@ def backup_log_on_download_success(
             end_time=rounded_current_time + timedelta(hours=1) - timedelta(seconds=1),
             computer_id=computer.id,
         )
-        new_with_downloads_log.save()
+        add_backup_log(new_with_downloads_log)
         logger.debug(
             "Log on_download 1: Created first backup log (successful) for computer {}",
             computer.computer_name,
@@ -52,7 +92,6 @@ def backup_log_on_download_success(
                 last_computer_log.end_time = (
                     rounded_current_time + timedelta(hours=1) - timedelta(seconds=1)
                 )
-                last_computer_log.update()
 
                 logger.debug(
                     "Log on_download 2: Updated WITH_DOWNLOADS_LOG log for computer {}. Log ID: {}",
@@ -81,7 +120,7 @@ def backup_log_on_download_success(
                         > timedelta(minutes=59, seconds=59)
                         else BackupLogError.ONE_HOUR.value
                     )
-                    new_no_downloads_log.save()
+                    add_backup_log(new_no_downloads_log)
 
                     logger.debug(
                         "Log on_download 3: Created new NO_DOWNLOADS_PERIOD log for computer {}. Log ID: {}",
@@ -116,7 +155,7 @@ def backup_log_on_download_success(
                             > timedelta(minutes=59, seconds=59)
                             else BackupLogError.ONE_HOUR.value
                         )
-                        new_no_downloads_log.save()
+                        add_backup_log(new_no_downloads_log)
 
                         logger.debug(
                             "Log on_download 4: Created new NO_DOWNLOADS_PERIOD log for computer {}. Log ID: {}",
@@ -141,7 +180,7 @@ def backup_log_on_download_success(
                             > timedelta(minutes=59, seconds=59)
                             else BackupLogError.ONE_HOUR.value
                         )
-                        first_no_downloads_log.save()
+                        add_backup_log(first_no_downloads_log)
 
                         second_no_downloads_log = m.BackupLog(
                             backup_log_type=m.BackupLogType.NO_DOWNLOADS_PERIOD,
@@ -158,7 +197,7 @@ def backup_log_on_download_success(
                             > timedelta(minutes=59, seconds=59)
                             else BackupLogError.ONE_HOUR.value
                         )
-                        second_no_downloads_log.save()
+                        add_backup_log(second_no_downloads_log)
                         logger.debug(
                             "Log on_download 5: Created two new NO_DOWNLOADS_PERIOD \
                                 log for computer {}. Logs IDs: {} and {}",
@@ -176,7 +215,7 @@ def backup_log_on_download_success(
                     end_time=rounded_current_time + timedelta(minutes=59, seconds=59),
                     computer_id=computer.id,
                 )
-                new_with_downloads_log.save()
+                add_backup_log(new_with_downloads_log)
 
                 logger.debug(
                     "Log on_download 6: Created new WITH_DOWNLOADS_PERIOD log for computer {}. Log ID: {}",
@@ -215,8 +254,6 @@ def backup_log_on_download_success(
                     last_computer_log.error = ""
                     last_computer_log.notes = ""
 
-                last_computer_log.update()
-
                 logger.debug(
                     "Log on_download 7: Updated NO_DOWNLOADS_PERIOD log for computer {}. Log ID: {}",
                     computer.computer_name,
@@ -237,7 +274,6 @@ def backup_log_on_download_success(
                     if last_computer_log.duration > timedelta(minutes=59, seconds=59)
                     else BackupLogError.ONE_HOUR.value
                 )
-                last_computer_log.update()
 
                 new_no_downloads_log = m.BackupLog(
                     backup_log_type=m.BackupLogType.NO_DOWNLOADS_PERIOD,
@@ -253,7 +289,7 @@ def backup_log_on_download_success(
                     if new_no_downloads_log.duration > timedelta(minutes=59, seconds=59)
                     else BackupLogError.ONE_HOUR.value
                 )
-                new_no_downloads_log.save()
+                add_backup_log(new_no_downloads_log)
 
                 logger.debug(
                     "Log on_download 8: Updated NO_DOWNLOADS_PERIOD and created \
@@ -274,7 +310,6 @@ def backup_log_on_download_success(
                     if last_computer_log.duration > timedelta(minutes=59, seconds=59)
                     else BackupLogError.ONE_HOUR.value
                 )
-                last_computer_log.update()
                 logger.debug(
                     "Log on_download 9: Updated NO_DOWNLOADS_PERIOD log for computer {}. Log ID: {}",
                     computer.computer_name,
@@ -287,7 +322,7 @@ def backup_log_on_download_success(
                 end_time=rounded_current_time + timedelta(minutes=59, seconds=59),
                 computer_id=computer.id,
             )
-            new_with_downloads_log.save()
+            add_backup_log(new_with_downloads_log)
 
             logger.debug(
                 "Log on_download 10: Created new WITH_DOWNLOADS_PERIOD log for computer {}. Log ID: {}",
@@ -330,6 +365,7 @@ def gen_fake_backup_periods_logs(computer: m.Computer, time_period: timedelta):
     )
 
 
+@backup_period_transition
 def backup_log_on_request_to_view(computer: m.Computer):
     """Create or update the last computer backup log on request to view.
 
@@ -372,7 +408,7 @@ def backup_log_on_request_to_view(computer: m.Computer):
             if new_no_downloads_log.duration > timedelta(minutes=59, seconds=59)
             else BackupLogError.ONE_HOUR.value
         )
-        new_no_downloads_log.save()
+        add_backup_log(new_no_downloads_log)
         logger.debug(
             "Log on_request 2: Created first backup log (unsuccessful) for computer {}",
             computer.computer_name,
@@ -404,7 +440,7 @@ def backup_log_on_request_to_view(computer: m.Computer):
                     if new_no_downloads_log.duration > timedelta(minutes=59, seconds=59)
                     else BackupLogError.ONE_HOUR.value
                 )
-                new_no_downloads_log.save()
+                add_backup_log(new_no_downloads_log)
 
                 logger.debug(
                     "Log on_request 3: Created new NO_DOWNLOADS_PERIOD log for computer {}. Log ID: {}",
@@ -434,7 +470,7 @@ def backup_log_on_request_to_view(computer: m.Computer):
                         > timedelta(minutes=59, seconds=59)
                         else BackupLogError.ONE_HOUR.value
                     )
-                    new_no_downloads_log.save()
+                    add_backup_log(new_no_downloads_log)
                     logger.debug(
                         "Log on_request 4: Created new NO_DOWNLOADS_PERIOD log for computer {}. Log ID: {}",
                         computer.computer_name,
@@ -459,7 +495,7 @@ def backup_log_on_request_to_view(computer: m.Computer):
                         > timedelta(minutes=59, seconds=59)
                         else BackupLogError.ONE_HOUR.value
                     )
-                    first_no_downloads_log.save()
+                    add_backup_log(first_no_downloads_log)
 
                     second_no_downloads_log = m.BackupLog(
                         backup_log_type=m.BackupLogType.NO_DOWNLOADS_PERIOD,
@@ -478,7 +514,7 @@ def backup_log_on_request_to_view(computer: m.Computer):
                         > timedelta(minutes=59, seconds=59)
                         else BackupLogError.ONE_HOUR.value
                     )
-                    second_no_downloads_log.save()
+                    add_backup_log(second_no_downloads_log)
 
                     logger.debug(
                         "Log on_request 5: Created two new \
@@ -503,8 +539,6 @@ def backup_log_on_request_to_view(computer: m.Computer):
                 else BackupLogError.ONE_HOUR.value
             )
 
-            last_computer_log.update()
-
             logger.debug(
                 "Log on_request 6: Updated NO_DOWNLOADS_PERIOD log for computer {}. Log IDs: {}",
                 computer.computer_name,
@@ -523,7 +557,6 @@ def backup_log_on_request_to_view(computer: m.Computer):
                 if last_computer_log.duration > timedelta(minutes=59, seconds=59)
                 else BackupLogError.ONE_HOUR.value
             )
-            last_computer_log.update()
 
             new_no_downloads_log = m.BackupLog(
                 backup_log_type=m.BackupLogType.NO_DOWNLOADS_PERIOD,
@@ -540,7 +573,7 @@ def backup_log_on_request_to_view(computer: m.Computer):
                 if new_no_downloads_log.duration > timedelta(minutes=59, seconds=59)
                 else BackupLogError.ONE_HOUR.value
             )
-            new_no_downloads_log.save()
+            add_backup_log(new_no_downloads_log)
 
             logger.debug(
                 "Log on_request 7: updated and created NO_DOWNLOADS_PERIOD logs for computer {}. Logs IDss: {} and {}",
@@ -550,11 +583,16 @@ def backup_log_on_request_to_view(computer: m.Computer):
             )
 
 
-def backup_log_on_download_error(computer: m.Computer):
+@backup_period_transition
+def backup_log_on_download_error(
+    computer: m.Computer, notes: str = "Unsuccessful backup"
+):
     """Create or update the last computer backup log on downloading error.
 
     Args:
         computer (m.Computer): Computer object
+        notes (str, optional): notes of the unsuccessful period.
+            Defaults to "Unsuccessful backup".
     """
     last_computer_log = (
         m.BackupLog.query.filter_by(computer_id=computer.id)
@@ -573,9 +611,9 @@ def backup_log_on_download_error(computer: m.Computer):
             end_time=rounded_current_time + timedelta(minutes=59, seconds=59),
             computer_id=computer.id,
             error=BackupLogError.ONE_HOUR.value,
-            notes="Unsuccessful backup",
+            notes=notes,
         )
-        new_no_downloads_log.save()
+        add_backup_log(new_no_downloads_log)
         logger.debug(
             "Log on_download_error 1: Created first backup log (unsuccessful) for computer {}",
             computer.computer_name,
@@ -593,14 +631,14 @@ def backup_log_on_download_error(computer: m.Computer):
                     start_time=last_computer_log.end_time + timedelta(seconds=1),
                     end_time=rounded_current_time + timedelta(minutes=59, seconds=59),
                     computer_id=computer.id,
-                    notes="Unsuccessful backup",
+                    notes=notes,
                 )
                 new_no_downloads_log.error = (
                     BackupLogError.TWO_HOURS.value
                     if new_no_downloads_log.duration > timedelta(minutes=59, seconds=59)
                     else BackupLogError.ONE_HOUR.value
                 )
-                new_no_downloads_log.save()
+                add_backup_log(new_no_downloads_log)
                 logger.debug(
                     "Log on_download_error 2: Created new NO_DOWNLOADS_PERIOD log for computer {}. Log ID: {}",
                     computer.computer_name,
@@ -620,7 +658,7 @@ def backup_log_on_download_error(computer: m.Computer):
                         end_time=rounded_current_time
                         + timedelta(minutes=59, seconds=59),
                         computer_id=computer.id,
-                        notes="Unsuccessful backup",
+                        notes=notes,
                     )
                     new_no_downloads_log.error = (
                         BackupLogError.TWO_HOURS.value
@@ -628,7 +666,7 @@ def backup_log_on_download_error(computer: m.Computer):
                         > timedelta(minutes=59, seconds=59)
                         else BackupLogError.ONE_HOUR.value
                     )
-                    new_no_downloads_log.save()
+                    add_backup_log(new_no_downloads_log)
                     logger.debug(
                         "Log on_download_error 3: Created new NO_DOWNLOADS_PERIOD log for computer {}. Log ID: {}",
                         computer.computer_name,
@@ -652,7 +690,7 @@ def backup_log_on_download_error(computer: m.Computer):
                         > timedelta(minutes=59, seconds=59)
                         else BackupLogError.ONE_HOUR.value
                     )
-                    first_no_downloads_log.save()
+                    add_backup_log(first_no_downloads_log)
 
                     second_no_downloads_log = m.BackupLog(
                         backup_log_type=m.BackupLogType.NO_DOWNLOADS_PERIOD,
@@ -662,7 +700,7 @@ def backup_log_on_download_error(computer: m.Computer):
                         end_time=rounded_current_time
                         + timedelta(minutes=59, seconds=59),
                         computer_id=computer.id,
-                        notes="Unsuccessful backup",
+                        notes=notes,
                     )
                     second_no_downloads_log.error = (
                         BackupLogError.TWO_HOURS.value
@@ -670,7 +708,7 @@ def backup_log_on_download_error(computer: m.Computer):
                         > timedelta(minutes=59, seconds=59)
                         else BackupLogError.ONE_HOUR.value
                     )
-                    second_no_downloads_log.save()
+                    add_backup_log(second_no_downloads_log)
                     logger.debug(
                         "Log on_download_error 4: Created 2 new \
                             NO_DOWNLOADS_PERIOD logs for computer {}. Logs IDs: {} and {}",
@@ -690,8 +728,7 @@ def backup_log_on_download_error(computer: m.Computer):
                     if last_computer_log.duration > timedelta(minutes=59, seconds=59)
                     else BackupLogError.ONE_HOUR.value
                 )
-                last_computer_log.notes = "Unsuccessful backup"
-                last_computer_log.update()
+                last_computer_log.notes = notes
                 logger.debug(
                     "Log on_download_error 5: updated NO_DOWNLOADS_PERIOD log for computer {}. Log ID: {}",
                     computer.computer_name,
@@ -706,7 +743,6 @@ def backup_log_on_download_error(computer: m.Computer):
                     if last_computer_log.duration > timedelta(minutes=59, seconds=59)
                     else BackupLogError.ONE_HOUR.value
                 )
-                last_computer_log.update()
 
                 new_no_downloads_log = m.BackupLog(
                     backup_log_type=m.BackupLogType.NO_DOWNLOADS_PERIOD,
@@ -715,14 +751,14 @@ def backup_log_on_download_error(computer: m.Computer):
                     ),
                     end_time=rounded_current_time + timedelta(minutes=59, seconds=59),
                     computer_id=computer.id,
-                    notes="Unsuccessful backup",
+                    notes=notes,
                 )
                 new_no_downloads_log.error = (
                     BackupLogError.TWO_HOURS.value
                     if new_no_downloads_log.duration > timedelta(minutes=59, seconds=59)
                     else BackupLogError.ONE_HOUR.value
                 )
-                new_no_downloads_log.save()
+                add_backup_log(new_no_downloads_log)
                 logger.debug(
                     "Log on_download_error 6: updated and created new \
                         NO_DOWNLOADS_PERIOD logs for computer {}. Logs IDs: {} and {}",
@@ -733,18 +769,11 @@ def backup_log_on_download_error(computer: m.Computer):
 
 
 def backup_log_on_download_error_with_message(computer: m.Computer, message: str):
-    # Current time in UTC rounded to hours
-    rounded_current_time = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
-    new_no_downloads_log = m.BackupLog(
-        backup_log_type=m.BackupLogType.NO_DOWNLOADS_PERIOD,
-        start_time=rounded_current_time,
-        end_time=rounded_current_time + timedelta(minutes=59, seconds=59),
-        computer_id=computer.id,
-        error=BackupLogError.ONE_HOUR.value,
-        notes=message,
-    )
-    new_no_downloads_log.save()
-    logger.debug(
-        "Log on_download_error 1: Created first backup log (unsuccessful) for computer {}",
-        computer.computer_name,
-    )
+    """Same as backup_log_on_download_error, the error message of the agent is saved
+    as notes of the period.
+
+    Args:
+        computer (m.Computer): Computer object
+        message (str): error message
+    """
+    backup_log_on_download_error(computer, notes=message)
@@ -1,11 +1,20 @@
-import io
 import enum
-import xlsxwriter
-from zoneinfo import ZoneInfo
+import tempfile
+from collections import defaultdict
 from datetime import datetime
+from typing import IO
+
+import xlsxwriter
+from sqlalchemy import or_, select
 
+from app import db
 from app import models as m
 from app.logger import logger
+from app.models.billing_rollup import (
+    ALERT_EVENTS_ROLLUP,
+    PCC_API_CALLS_ROLLUP,
+    count_events,
+)
 
 
 class ItemStatus(enum.Enum):
@@ -15,6 +24,7 @@ class ItemStatus(enum.Enum):
     DEACTIVATED = "DEACTIVATED"
     DELETED = "DELETED"
 
+
 def truncate_string(input_string, max_length=20):
     if len(input_string) > max_length:
         truncated_string = input_string[:max_length]
@@ -22,20 +32,170 @@ def truncate_string(input_string, max_length=20):
     else:
         return input_string
 
+
+def item_status(is_deleted: bool, activated: bool) -> str:
+    """Status of the company/location/computer as it is shown in the report"""
+    if is_deleted:
+        return ItemStatus.DELETED.value.capitalize()
+    if activated:
+        return ItemStatus.ACTIVE.value.capitalize()
+    return ItemStatus.DEACTIVATED.value.capitalize()
+
+
+def company_computers_filter(company_id: int):
+    """Computers of the company and computers placed in the company locations"""
+    return or_(
+        m.Computer.company_id == company_id,
+        m.Computer.location_id.in_(
+            select(m.Location.id).where(m.Location.company_id == company_id)
+        ),
+    )
+
+
+def count_pcc_api_calls(
+    from_date: datetime, to_date: datetime, company_id: int | None = None
+) -> dict[int, int]:
+    """
+    Number of PCC API calls made during the period, grouped by computer id
+
+    Args:
+        from_date (datetime): the start of the period
+        to_date (datetime): the end of the period
+        company_id (int | None, optional): count calls of the company computers only.
+
+    Returns:
+        dict[int, int]: number of calls by computer id
+    """
+    computers_ids = None
+    if company_id is not None:
+        computers_ids = select(m.Computer.id).where(
+            company_computers_filter(company_id)
+        )
+
+    return count_events(PCC_API_CALLS_ROLLUP, from_date, to_date, computers_ids)
+
+
+def count_alert_events(
+    from_date: datetime, to_date: datetime, company_id: int | None = None
+) -> dict[int, int]:
+    """
+    Number of alert events sent during the period, grouped by location id
+
+    Args:
+        from_date (datetime): the start of the period
+        to_date (datetime): the end of the period
+        company_id (int | None, optional): count alerts of this company locations only.
+
+    Returns:
+        dict[int, int]: number of alert events by location id
+    """
+    location_ids = None
+    if company_id is not None:
+        location_ids = select(m.Location.id).where(m.Location.company_id == company_id)
+
+    return count_events(ALERT_EVENTS_ROLLUP, from_date, to_date, location_ids)
+
+
+class BillingData:
+    """
+    Locations and computers (including deleted ones) of the reported companies
+    with the API calls and alerts counters of the period.
+
+    Everything is loaded with a few grouped queries, so the report costs the same
+    number of queries regardless of the number of companies, locations and computers.
+    """
+
+    def __init__(
+        self, from_date: datetime, to_date: datetime, company_id: int | None = None
+    ):
+        self.calls_per_computer = count_pcc_api_calls(from_date, to_date, company_id)
+        self.alerts_per_location = count_alert_events(from_date, to_date, company_id)
+
+        locations_query = select(
+            m.Location.id,
+            m.Location.company_id,
+            m.Location.name,
+            m.Location.is_deleted,
+            m.Location.activated,
+        ).order_by(m.Location.name)
+        computers_query = select(
+            m.Computer.id,
+            m.Computer.company_id,
+            m.Computer.location_id,
+            m.Computer.computer_name,
+            m.Computer.is_deleted,
+            m.Computer.activated,
+        ).order_by(m.Computer.computer_name)
+        if company_id is not None:
+            locations_query = locations_query.where(
+                m.Location.company_id == company_id
+            )
+            computers_query = computers_query.where(
+                company_computers_filter(company_id)
+            )
+
+        self.company_locations = defaultdict(list)
+        for location in db.session.execute(locations_query):
+            self.company_locations[location.company_id].append(location)
+
+        self.location_computers = defaultdict(list)
+        self.company_computers = defaultdict(int)
+        self.company_calls = defaultdict(int)
+        for computer in db.session.execute(computers_query):
+            if computer.location_id is not None:
+                self.location_computers[computer.location_id].append(computer)
+            if computer.company_id is not None:
+                # Computers are counted in their own company
+                self.company_computers[computer.company_id] += 1
+                self.company_calls[computer.company_id] += self.computer_calls(
+                    computer
+                )
+
+    def computer_calls(self, computer) -> int:
+        return self.calls_per_computer.get(computer.id, 0)
+
+    def location_calls(self, location) -> int:
+        return sum(
+            self.computer_calls(computer)
+            for computer in self.location_computers[location.id]
+        )
+
+    def location_alerts(self, location) -> int:
+        return self.alerts_per_location.get(location.id, 0)
+
+    def company_alerts(self, company_id: int) -> int:
+        return sum(
+            self.location_alerts(location)
+            for location in self.company_locations[company_id]
+        )
+
+
+def create_workbook() -> tuple[xlsxwriter.Workbook, IO[bytes]]:
+    """
+    Create workbook written to a temporary file.
+
+    The workbook is in constant memory mode: every row is flushed to disk as soon as
+    the next row is started, so rows must be written strictly in order.
+    """
+    output = tempfile.TemporaryFile()
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    return workbook, output
+
+
 def create_company_billing_report(
     company: m.Company, from_date: datetime, to_date: datetime
-) -> io.BytesIO:
+) -> IO[bytes]:
     """
-    Generate a billing report for a company in .xlsx format and return it as BytesIO object
+    Generate a billing report for a company in .xlsx format and return it as file object
 
     Args:
         company (m.Company): company to generate the report for
         from_date (datetime): the start date of the report (EST)
         to_date (datetime): the end date of the report (EST)
     """
-    output = io.BytesIO()
+    data = BillingData(from_date, to_date, company.id)
 
-    workbook = xlsxwriter.Workbook(output, {"in_memory": True})
+    workbook, output = create_workbook()
     name = truncate_string(company.name)
     worksheet = workbook.add_worksheet(f"Report_{name}")
 
@@ -64,25 +224,25 @@ def create_company_billing_report(
 
     # Write summarized information on the top(total locations, computers, users, alerts)
     # Included deleted locations and computers
-    total_locations = (
-        m.Location.query.with_deleted().filter_by(company_id=company.id).count()
-    )
-    total_computers = (
-        m.Computer.query.with_deleted().filter_by(company_id=company.id).count()
+    locations = data.company_locations[company.id]
+    worksheet.write(1, 0, f"Total locations: {len(locations)}", centered_format)
+    worksheet.write(
+        1,
+        1,
+        f"Total computers: {data.company_computers[company.id]}",
+        centered_format,
     )
-    worksheet.write(1, 0, f"Total locations: {total_locations}", centered_format)
-    worksheet.write(1, 1, f"Total computers: {total_computers}", centered_format)
     worksheet.write(1, 2, f"Total users: {len(company.users)}", centered_format)
     worksheet.write(
         1,
         3,
-        f"Total alerts: {company.total_alert_events(from_date, to_date)}",
+        f"Total alerts: {data.company_alerts(company.id)}",
         centered_format,
     )
     worksheet.write(
         1,
         4,
-        f"Total API Calls: {company.total_pcc_api_calls(from_date, to_date)}",
+        f"Total API Calls: {data.company_calls[company.id]}",
         centered_format,
     )
 
@@ -95,77 +255,38 @@ def create_company_billing_report(
 
     # Write main table data
     start_row = 4
-    ordered_locations = (
-        m.Location.query.with_deleted()
-        .filter_by(company_id=company.id)
-        .order_by(m.Location.name)
-        .all()
-    )
-    for location in ordered_locations:
-        ordered_computers_query = (
-            m.Computer.query.with_deleted()
-            .filter_by(location_id=location.id)
-            .order_by(m.Computer.computer_name)
-        )
-
-        if location.is_deleted:
-            location_status = ItemStatus.DELETED.value.capitalize()
-        else:
-            if location.activated:
-                location_status = ItemStatus.ACTIVE.value.capitalize()
-            else:
-                location_status = ItemStatus.DEACTIVATED.value.capitalize()
+    for location in locations:
+        computers = data.location_computers[location.id]
 
         worksheet.write(start_row, 0, location.name, centered_format)
         worksheet.write(
             start_row,
             1,
-            f"Total_computers: {ordered_computers_query.count()}",
-            centered_format,
-        )
-        worksheet.write(
-            start_row,
-            2,
-            location.total_pcc_api_calls(from_date, to_date),
-            centered_format,
-        )
-        worksheet.write(
-            start_row,
-            3,
-            location.total_alert_events(from_date, to_date),
+            f"Total_computers: {len(computers)}",
             centered_format,
         )
+        worksheet.write(start_row, 2, data.location_calls(location), centered_format)
+        worksheet.write(start_row, 3, data.location_alerts(location), centered_format)
         worksheet.write(
             start_row,
             4,
-            location_status,
+            item_status(location.is_deleted, location.activated),
             centered_format,
         )
 
         start_row += 1
 
-        for computer in ordered_computers_query.all():
-            if computer.is_deleted:
-                computer_status = ItemStatus.DELETED.value.capitalize()
-            else:
-                if computer.activated:
-                    computer_status = ItemStatus.ACTIVE.value.capitalize()
-                else:
-                    computer_status = ItemStatus.DEACTIVATED.value.capitalize()
-
+        for computer in computers:
             worksheet.write(start_row, 0, "", centered_format)
             worksheet.write(start_row, 1, computer.computer_name, centered_format)
             worksheet.write(
-                start_row,
-                2,
-                computer.total_pcc_api_calls(from_date, to_date),
-                centered_format,
+                start_row, 2, data.computer_calls(computer), centered_format
             )
             worksheet.write(start_row, 3, "", centered_format)
             worksheet.write(
                 start_row,
                 4,
-                computer_status,
+                item_status(computer.is_deleted, computer.activated),
                 centered_format,
             )
 
@@ -180,17 +301,17 @@ def create_company_billing_report(
     return output
 
 
-def create_general_billing_report(from_date: datetime, to_date: datetime) -> io.BytesIO:
+def create_general_billing_report(from_date: datetime, to_date: datetime) -> IO[bytes]:
     """
-    Generate a general billing report for all the companies in .xlsx format and return it as BytesIO object
+    Generate a general billing report for all the companies in .xlsx format and return it as file object
 
     Args:
         from_date (datetime): the start date of the report (EST)
         to_date (datetime): the end date of the report (EST)
     """
-    output = io.BytesIO()
+    data = BillingData(from_date, to_date)
 
-    workbook = xlsxwriter.Workbook(output, {"in_memory": True})
+    workbook, output = create_workbook()
     worksheet = workbook.add_worksheet("General_Report")
 
     # Cells styles
@@ -213,12 +334,13 @@ def create_general_billing_report(from_date: datetime, to_date: datetime) -> io.
     )
 
     # Write summarized information on the top(total locations, computers, users, alerts)
-    companies = (
-        m.Company.query.with_deleted()
-        .filter(m.Company.is_global.is_(False))
+    companies = db.session.execute(
+        select(
+            m.Company.id, m.Company.name, m.Company.is_deleted, m.Company.activated
+        )
+        .where(m.Company.is_global.is_(False))
         .order_by(m.Company.name)
-        .all()
-    )
+    ).all()
     # Include deleted locations and computers
     locations_number = (
         m.Location.query.with_deleted()
@@ -240,10 +362,7 @@ def create_general_billing_report(from_date: datetime, to_date: datetime) -> io.
         m.User.query.with_deleted().filter(m.User.username != "emarsuperuser").count()
     )
 
-    alert_events_number = m.AlertEvent.query.filter(
-        m.AlertEvent.created_at >= from_date.astimezone(ZoneInfo("UTC")),
-        m.AlertEvent.created_at <= to_date.astimezone(ZoneInfo("UTC")),
-    ).count()
+    alert_events_number = sum(data.alerts_per_location.values())
 
     worksheet.write(1, 0, f"Total companies: {len(companies)}", centered_format)
     worksheet.write(1, 1, f"Total locations: {locations_number}", centered_format)
@@ -262,121 +381,70 @@ def create_general_billing_report(from_date: datetime, to_date: datetime) -> io.
     # Write main table data
     start_row = 4
     for company in companies:
-        ordered_locations_query = (
-            m.Location.query.with_deleted()
-            .filter_by(company_id=company.id)
-            .order_by(m.Location.name)
-        )
+        locations = data.company_locations[company.id]
 
-        if company.is_deleted:
-            company_status = ItemStatus.DELETED.value.capitalize()
-        else:
-            if company.activated:
-                company_status = ItemStatus.ACTIVE.value.capitalize()
-            else:
-                company_status = ItemStatus.DEACTIVATED.value.capitalize()
-
-        total_company_computers = (
-            m.Computer.query.with_deleted().filter_by(company_id=company.id).count()
-        )
         worksheet.write(start_row, 0, company.name, centered_format)
         worksheet.write(
             start_row,
             1,
-            f"Total_locations: {ordered_locations_query.count()}",
-            centered_format,
-        )
-        worksheet.write(
-            start_row, 2, f"Total_computers: {total_company_computers}", centered_format
-        )
-        worksheet.write(
-            start_row,
-            3,
-            company.total_pcc_api_calls(from_date, to_date),
+            f"Total_locations: {len(locations)}",
             centered_format,
         )
         worksheet.write(
             start_row,
-            4,
-            company.total_alert_events(from_date, to_date),
+            2,
+            f"Total_computers: {data.company_computers[company.id]}",
             centered_format,
         )
+        worksheet.write(start_row, 3, data.company_calls[company.id], centered_format)
+        worksheet.write(start_row, 4, data.company_alerts(company.id), centered_format)
         worksheet.write(
             start_row,
             5,
-            company_status,
+            item_status(company.is_deleted, company.activated),
             centered_format,
         )
 
         start_row += 1
 
-        for location in ordered_locations_query.all():
-            ordered_computers_query = (
-                m.Computer.query.with_deleted()
-                .filter_by(location_id=location.id)
-                .order_by(m.Computer.computer_name)
-            )
-
-            if location.is_deleted:
-                location_status = ItemStatus.DELETED.value.capitalize()
-            else:
-                if location.activated:
-                    location_status = ItemStatus.ACTIVE.value.capitalize()
-                else:
-                    location_status = ItemStatus.DEACTIVATED.value.capitalize()
+        for location in locations:
+            computers = data.location_computers[location.id]
 
             worksheet.write(start_row, 0, "", centered_format)
             worksheet.write(start_row, 1, location.name, centered_format)
             worksheet.write(
                 start_row,
                 2,
-                f"Total_computers: {ordered_computers_query.count()}",
+                f"Total_computers: {len(computers)}",
                 centered_format,
             )
             worksheet.write(
-                start_row,
-                3,
-                location.total_pcc_api_calls(from_date, to_date),
-                centered_format,
+                start_row, 3, data.location_calls(location), centered_format
             )
             worksheet.write(
-                start_row,
-                4,
-                location.total_alert_events(from_date, to_date),
-                centered_format,
+                start_row, 4, data.location_alerts(location), centered_format
             )
             worksheet.write(
                 start_row,
                 5,
-                location_status,
+                item_status(location.is_deleted, location.activated),
                 centered_format,
             )
 
             start_row += 1
 
-            for computer in ordered_computers_query.all():
-                if computer.is_deleted:
-                    computer_status = ItemStatus.DELETED.value.capitalize()
-                else:
-                    if computer.activated:
-                        computer_status = ItemStatus.ACTIVE.value.capitalize()
-                    else:
-                        computer_status = ItemStatus.DEACTIVATED.value.capitalize()
-
+            for computer in computers:
                 worksheet.write(start_row, 0, "", centered_format)
                 worksheet.write(start_row, 1, "", centered_format)
                 worksheet.write(start_row, 2, computer.computer_name, centered_format)
                 worksheet.write(
-                    start_row,
-                    3,
-                    computer.total_pcc_api_calls(from_date, to_date),
-                    centered_format,
+                    start_row, 3, data.computer_calls(computer), centered_format
                 )
                 worksheet.write(start_row, 4, "", centered_format)
                 worksheet.write(
                     start_row,
                     5,
-                    computer_status,
+                    item_status(computer.is_deleted, computer.activated),
                     centered_format,
                 )
 
@@ -0,0 +1,153 @@
+import os
+import shutil
+from datetime import datetime, timedelta
+
+from zoneinfo import ZoneInfo
+
+from app import db
+from app import models as m
+from app.controllers.billing_report import (
+    create_company_billing_report,
+    create_general_billing_report,
+)
+from app.logger import logger
+from config import BaseConfig as CFG
+
+
+def billing_report_path(job: m.BillingReportJob) -> str:
+    """Path of the job report file in the artifacts store"""
+    return os.path.join(CFG.BILLING_REPORTS_DIR, job.file_name)
+
+
+def get_or_create_billing_report_job(
+    company_id: int | None, from_date: datetime, to_date: datetime
+) -> tuple[m.BillingReportJob, bool]:
+    """
+    Find the job which already has (or is generating) the requested report
+    or create the new one.
+
+    Jobs in progress are shared by identical requests. Report of the finished job is
+    reused only if the period was closed when the job was created (the data of an
+    open period still changes).
+
+    Args:
+        company_id (int | None): company id (None for the general billing report)
+        from_date (datetime): the start date of the report (EST)
+        to_date (datetime): the end date of the report (EST)
+
+    Returns:
+        tuple[m.BillingReportJob, bool]: job and True if it is new and must be started
+    """
+    from_date = from_date.replace(tzinfo=None)
+    to_date = to_date.replace(tzinfo=None)
+
+    jobs = (
+        m.BillingReportJob.query.filter(
+            m.BillingReportJob.company_id == company_id,
+            m.BillingReportJob.from_date == from_date,
+            m.BillingReportJob.to_date == to_date,
+            m.BillingReportJob.status != m.ReportJobStatus.FAILED,
+        )
+        .order_by(m.BillingReportJob.created_at.desc())
+        .all()
+    )
+
+    # Job in progress for too long was lost by the worker
+    lost_before = datetime.utcnow() - timedelta(seconds=CFG.BILLING_REPORT_JOB_TIMEOUT)
+    for job in jobs:
+        if job.status == m.ReportJobStatus.IN_PROGRESS and job.created_at > lost_before:
+            return job, False
+
+        if (
+            job.status == m.ReportJobStatus.SUCCEED
+            and job.period_closed
+            and os.path.exists(billing_report_path(job))
+        ):
+            logger.debug("Billing report {} is served from the cache", job.id)
+            return job, False
+
+    job = m.BillingReportJob(
+        company_id=company_id,
+        from_date=from_date,
+        to_date=to_date,
+        period_closed=to_date <= CFG.offset_to_est(datetime.utcnow(), True),
+        status=m.ReportJobStatus.IN_PROGRESS,
+    )
+    job.save()
+
+    return job, True
+
+
+def run_billing_report_job(job_id: int):
+    """
+    Generate the billing report of the job and put it to the artifacts store
+    """
+    job: m.BillingReportJob = m.BillingReportJob.query.get(job_id)
+    from_date = job.from_date.replace(tzinfo=ZoneInfo("America/New_York"))
+    to_date = job.to_date.replace(tzinfo=ZoneInfo("America/New_York"))
+
+    try:
+        if job.company_id is None:
+            report = create_general_billing_report(from_date, to_date)
+        else:
+            company = (
+                m.Company.query.with_deleted().filter_by(id=job.company_id).first()
+            )
+            report = create_company_billing_report(company, from_date, to_date)
+
+        os.makedirs(CFG.BILLING_REPORTS_DIR, exist_ok=True)
+        job.file_name = f"billing_report_{job.id}.xlsx"
+        path = billing_report_path(job)
+
+        # Report appears in the store only when it is completely written
+        with report, open(f"{path}.tmp", "wb") as report_file:
+            shutil.copyfileobj(report, report_file)
+        os.replace(f"{path}.tmp", path)
+    except Exception as e:
+        logger.error("Can't generate billing report {}. Reason: {}", job.id, e)
+        db.session.rollback()
+        job.status = m.ReportJobStatus.FAILED
+        job.finished_at = datetime.utcnow()
+        job.error = str(e)
+        job.save()
+        raise e
+
+    job.status = m.ReportJobStatus.SUCCEED
+    job.finished_at = datetime.utcnow()
+    job.save()
+    logger.info("Billing report {} created successfully", job.id)
+
+
+def clean_billing_report_jobs() -> int:
+    """
+    Delete old billing report jobs and their files.
+
+    Reports of open periods and failed jobs are needed only until they are
+    downloaded, the reports of closed periods are kept in the cache for
+    BILLING_REPORTS_CACHE_DAYS.
+
+    Returns:
+        int: number of deleted jobs
+    """
+    now = datetime.utcnow()
+    expired_jobs = m.BillingReportJob.query.filter(
+        db.or_(
+            m.BillingReportJob.created_at
+            < now - timedelta(days=CFG.BILLING_REPORTS_CACHE_DAYS),
+            db.and_(
+                m.BillingReportJob.period_closed.is_(False)
+                | (m.BillingReportJob.status == m.ReportJobStatus.FAILED),
+                m.BillingReportJob.created_at < now - timedelta(days=1),
+            ),
+        )
+    ).all()
+
+    for job in expired_jobs:
+        if job.file_name and os.path.exists(billing_report_path(job)):
+            os.remove(billing_report_path(job))
+        db.session.delete(job)
+    db.session.commit()
+
+    logger.info("<Old billing report jobs [{}] were deleted>", len(expired_jobs))
+
+    return len(expired_jobs)
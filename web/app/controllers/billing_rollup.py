@@ -0,0 +1,48 @@
+import time
+from datetime import datetime, timedelta
+
+from app import db
+from app.logger import logger
+from app.models.billing_rollup import (
+    ALERT_EVENTS_ROLLUP,
+    PCC_API_CALLS_ROLLUP,
+    rebuild_rollups,
+)
+from config import BaseConfig as CFG
+
+
+def rollup_billing_events(days: int = CFG.BILLING_ROLLUP_REBUILD_DAYS) -> dict:
+    """
+    Recalculate daily rollups of PCC API calls and alert events for the last closed
+    days (UTC) from the raw events.
+
+    The current day rollups are maintained on every new event, this rebuild fixes
+    the closed days if some increments were lost (or the rollups are backfilled).
+
+    Args:
+        days (int, optional): number of closed days to rebuild.
+            Defaults to CFG.BILLING_ROLLUP_REBUILD_DAYS.
+
+    Returns:
+        dict: rollup rows written per table and elapsed time
+    """
+    start_time = time.perf_counter()
+    last_day = datetime.utcnow().date() - timedelta(days=1)
+    first_day = last_day - timedelta(days=days - 1)
+
+    report = dict(
+        first_day=first_day,
+        last_day=last_day,
+        pcc_api_calls=rebuild_rollups(PCC_API_CALLS_ROLLUP, first_day, last_day),
+        alert_events=rebuild_rollups(ALERT_EVENTS_ROLLUP, first_day, last_day),
+    )
+    db.session.commit()
+    report["elapsed"] = round(time.perf_counter() - start_time, 3)
+
+    logger.info(
+        "<Billing rollups {first_day} - {last_day} rebuilt: PCC API calls "
+        "[{pcc_api_calls}], alert events [{alert_events}] in {elapsed} sec>",
+        **report,
+    )
+
+    return report
@@ -1,43 +1,112 @@
+import time
 from datetime import datetime, timedelta
 
+from sqlalchemy import Column, Table, delete, select
+
 from app import models as m, db
+from app.controllers.log_partitions import drop_expired_partitions
 from config import BaseConfig as CFG
 from app.logger import logger
 
 
-def clean_old_logs():
+def delete_in_batches(
+    table: Table,
+    time_column: Column,
+    expired_before: datetime,
+    batch_size: int = CFG.CLEAN_LOGS_BATCH_SIZE,
+) -> int:
+    """Delete expired rows of the table by batches of primary keys
+
+    Every batch is committed separately, so locks are held only for a short time
+    and the deletion can be continued by the next run if it was interrupted.
+
+    Args:
+        table (Table): table to clean
+        time_column (Column): column with the time of the row
+        expired_before (datetime): rows older than this time are deleted
+        batch_size (int, optional): max rows in one batch. Defaults to CFG.CLEAN_LOGS_BATCH_SIZE.
+
+    Returns:
+        int: number of deleted rows
+    """
+    deleted = 0
+    while True:
+        batch_ids = (
+            select(table.c.id)
+            .where(time_column < expired_before)
+            .order_by(table.c.id)
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        batch_deleted = db.session.execute(
+            delete(table).where(table.c.id.in_(batch_ids))
+        ).rowcount
+        db.session.commit()
+
+        deleted += batch_deleted
+        if batch_deleted:
+            logger.debug("Table {}: {} old rows deleted", table.name, deleted)
+        if batch_deleted < batch_size:
+            return deleted
+
+
+def clean_old_logs() -> dict:
     """
     Clean old computer logs, system logs and log_events from database
+
+    Returns:
+        dict: number of deleted rows per table, dropped partitions and elapsed time
     """
-    # Clean old system logs
-    old_system_logs_query = db.session.query(m.SystemLog).filter(
-        m.SystemLog.created_at
-        < datetime.utcnow() - timedelta(days=CFG.SYSTEM_LOGS_DELETION_PERIOD)
-    )
-    old_system_logs_amount = len(old_system_logs_query.all())
-    old_system_logs_query.delete()
+    start_time = time.perf_counter()
+    now = datetime.utcnow()
 
-    # Clean old computer logs
-    old_computer_logs_query = db.session.query(m.BackupLog).filter(
-        m.BackupLog.end_time
-        < datetime.utcnow() - timedelta(days=CFG.COMPUTER_LOGS_DELETION_PERIOD)
+    log_events_expired_before = now - timedelta(days=CFG.LOG_EVENT_DELETION_PERIOD)
+    backup_logs_expired_before = now - timedelta(
+        days=CFG.COMPUTER_LOGS_DELETION_PERIOD
     )
-    old_computer_logs_amount = len(old_computer_logs_query.all())
-    old_computer_logs_query.delete()
 
-    # Clean old log events
-    old_log_events_query = db.session.query(m.LogEvent).filter(
-        m.LogEvent.created_at
-        < datetime.utcnow() - timedelta(days=CFG.LOG_EVENT_DELETION_PERIOD)
-    )
-    old_log_events_amount = len(old_log_events_query.all())
-    old_log_events_query.delete()
+    # Whole expired partitions of the partitioned tables (PostgreSQL) are dropped,
+    # the rest of expired rows is deleted by batches
+    dropped_partitions = drop_expired_partitions(
+        "log_events", log_events_expired_before
+    ) + drop_expired_partitions("backup_logs", backup_logs_expired_before)
 
+    report = dict(
+        # Clean old system logs
+        system_logs=delete_in_batches(
+            m.SystemLog.__table__,
+            m.SystemLog.__table__.c.created_at,
+            now - timedelta(days=CFG.SYSTEM_LOGS_DELETION_PERIOD),
+        ),
+        # Clean old computer logs
+        backup_logs=delete_in_batches(
+            m.BackupLog.__table__,
+            m.BackupLog.__table__.c.end_time,
+            backup_logs_expired_before,
+        ),
+        # Clean old log events
+        log_events=delete_in_batches(
+            m.LogEvent.__table__,
+            m.LogEvent.__table__.c.created_at,
+            log_events_expired_before,
+        ),
+        # Clean old uptime bitmaps of the computers
+        computer_uptime=db.session.execute(
+            delete(m.ComputerUptime.__table__).where(
+                m.ComputerUptime.__table__.c.day < backup_logs_expired_before.date()
+            )
+        ).rowcount,
+        dropped_partitions=len(dropped_partitions),
+    )
     db.session.commit()
+    report["elapsed"] = round(time.perf_counter() - start_time, 3)
 
     logger.info(
-        "<Old system logs [{}]; old computer logs [{}] old log events [{}] were deleted>",
-        old_system_logs_amount,
-        old_computer_logs_amount,
-        old_log_events_amount,
+        "<Old system logs [{system_logs}]; old computer logs [{backup_logs}] "
+        "old log events [{log_events}]; old uptime days [{computer_uptime}] "
+        "were deleted, "
+        "expired partitions [{dropped_partitions}] were dropped in {elapsed} sec>",
+        **report,
     )
+
+    return report
@@ -0,0 +1,230 @@
+import threading
+import time
+
+import redis
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+
+from app import db
+from app.logger import logger
+from app.models import ClientVersion, DesktopClient
+from app.utils.blob_store import blob_path
+
+# Flags which are resolved by the flag name (the rest of the values are versions)
+RESOLVED_FLAGS = ("stable", "latest")
+
+
+class ClientRelease:
+    """Desktop client (MSI) known to the registry, without the file content"""
+
+    def __init__(
+        self,
+        id: int,
+        name: str,
+        version: str | None,
+        flag_name: str | None,
+        filename: str,
+        mimetype: str,
+        sha256: str,
+        size: int,
+    ):
+        self.id = id
+        self.name = name
+        self.version = version
+        self.flag_name = flag_name
+        self.filename = filename
+        self.mimetype = mimetype
+        self.sha256 = sha256
+        self.size = size
+
+    @property
+    def blob_path(self) -> str:
+        return blob_path(self.sha256)
+
+    def __repr__(self):
+        return f"<ClientRelease {self.name} {self.version} ({self.flag_name})>"
+
+
+class ClientVersionsSnapshot:
+    """Desktop clients indexed by id, version, flag and digest"""
+
+    def __init__(self, releases: list[ClientRelease]):
+        self.releases = releases
+        self.by_id: dict[int, ClientRelease] = {}
+        self.by_version: dict[str, ClientRelease] = {}
+        self.by_flag: dict[str, ClientRelease] = {}
+        self.by_sha256: dict[str, ClientRelease] = {}
+
+        # The first (by id) client wins, as the first row of the previous queries
+        for release in releases:
+            self.by_id[release.id] = release
+            self.by_sha256.setdefault(release.sha256, release)
+            if release.version:
+                self.by_version.setdefault(release.version, release)
+            if release.flag_name:
+                self.by_flag.setdefault(release.flag_name, release)
+
+
+class ClientVersionRegistry:
+    """In-process registry of the desktop client versions.
+
+    Desktop clients are loaded once (without the files) and the agents calls
+    resolve flag / version in memory. Every commit which changes DesktopClient or
+    ClientVersion increments the version counter in Redis, the other processes
+    compare it with the loaded one at most once in CLIENT_VERSIONS_CHECK_INTERVAL
+    seconds. Without Redis the registry is reloaded after that interval.
+    """
+
+    REDIS_KEY = "desktop_clients:version"
+
+    def __init__(self):
+        self.redis: redis.Redis | None = None
+        self.check_interval = 5.0
+
+        self._lock = threading.Lock()
+        self._snapshot: ClientVersionsSnapshot | None = None
+        self._loaded_version: int | None = None
+        self._checked_at = 0.0
+        self.counters = dict(loads=0, invalidations=0)
+
+    def init_app(self, app):
+        redis_url = app.config["REDIS_URL"]
+        self.redis = redis.Redis.from_url(redis_url) if redis_url else None
+        self.check_interval = app.config["CLIENT_VERSIONS_CHECK_INTERVAL"]
+        self.clear()
+
+    def stats(self) -> dict:
+        """Counters of the registry (loads, invalidations)"""
+        with self._lock:
+            return dict(self.counters)
+
+    def clear(self):
+        """Forget the loaded desktop clients (the next call loads them)"""
+        with self._lock:
+            self._snapshot = None
+
+    def invalidate(self):
+        """Desktop clients were changed: reload them in all the processes"""
+        with self._lock:
+            self._snapshot = None
+            self.counters["invalidations"] += 1
+
+        if self.redis:
+            try:
+                self.redis.incr(self.REDIS_KEY)
+            except redis.RedisError as e:
+                logger.warning("Can't invalidate desktop clients. Reason: {}", e)
+
+    def by_id(self, client_id: int) -> ClientRelease | None:
+        return self._current().by_id.get(client_id)
+
+    def by_version(self, version: str | None) -> ClientRelease | None:
+        return self._current().by_version.get(version)
+
+    def by_flag(self, flag_name: str | None) -> ClientRelease | None:
+        return self._current().by_flag.get(flag_name)
+
+    def by_sha256(self, sha256: str) -> ClientRelease | None:
+        return self._current().by_sha256.get(sha256)
+
+    def first(self) -> ClientRelease | None:
+        releases = self._current().releases
+        return releases[0] if releases else None
+
+    def resolve(self, msi_version: str | None) -> ClientRelease | None:
+        """Desktop client of the computer msi_version ("stable", "latest" or version)
+
+        Args:
+            msi_version (str | None): flag or version
+
+        Returns:
+            ClientRelease | None: desktop client or None if it does not exist
+        """
+        if msi_version in RESOLVED_FLAGS:
+            return self.by_flag(msi_version)
+        return self.by_version(msi_version)
+
+    def _shared_version(self) -> int | None:
+        if not self.redis:
+            return None
+        try:
+            return int(self.redis.get(self.REDIS_KEY) or 0)
+        except redis.RedisError as e:
+            logger.warning("Can't check desktop clients version. Reason: {}", e)
+            return None
+
+    def _current(self) -> ClientVersionsSnapshot:
+        now = time.monotonic()
+        with self._lock:
+            snapshot, loaded_version = self._snapshot, self._loaded_version
+            if snapshot and now - self._checked_at < self.check_interval:
+                return snapshot
+
+        shared_version = self._shared_version()
+        if (
+            snapshot
+            and shared_version is not None
+            and shared_version == loaded_version
+        ):
+            with self._lock:
+                self._checked_at = now
+            return snapshot
+
+        return self._load(shared_version, now)
+
+    def _load(self, shared_version: int | None, now: float) -> ClientVersionsSnapshot:
+        snapshot = ClientVersionsSnapshot(
+            [
+                ClientRelease(*row)
+                for row in db.session.execute(
+                    select(
+                        DesktopClient.id,
+                        DesktopClient.name,
+                        DesktopClient.version,
+                        ClientVersion.name,
+                        DesktopClient.filename,
+                        DesktopClient.mimetype,
+                        DesktopClient.sha256,
+                        DesktopClient.size,
+                    )
+                    .outerjoin(ClientVersion, DesktopClient.flag_id == ClientVersion.id)
+                    .order_by(DesktopClient.id)
+                )
+            ]
+        )
+
+        with self._lock:
+            self._snapshot = snapshot
+            self._loaded_version = shared_version
+            self._checked_at = now
+            self.counters["loads"] += 1
+        return snapshot
+
+
+client_version_registry = ClientVersionRegistry()
+
+CHANGED_KEY = "desktop_clients_changed"
+
+
+@event.listens_for(DesktopClient, "after_insert")
+@event.listens_for(DesktopClient, "after_update")
+@event.listens_for(DesktopClient, "after_delete")
+@event.listens_for(ClientVersion, "after_insert")
+@event.listens_for(ClientVersion, "after_update")
+@event.listens_for(ClientVersion, "after_delete")
+def mark_client_versions_changed(mapper, connection, target):
+    session = object_session(target)
+    if session:
+        session.info[CHANGED_KEY] = True
+
+
+# NOTE the registry is invalidated only when the changes are committed
+@event.listens_for(Session, "after_commit")
+def invalidate_client_versions(session: Session):
+    if session.info.pop(CHANGED_KEY, False):
+        client_version_registry.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_client_versions_changes(session: Session):
+    session.info.pop(CHANGED_KEY, None)
@@ -0,0 +1,234 @@
+import hashlib
+import json
+from datetime import datetime
+from itertools import chain
+
+from sqlalchemy import event, inspect, literal, or_, select, true, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app import db
+from app import models as m
+from app import schema as s
+from app.controllers.client_version_registry import RESOLVED_FLAGS
+
+# Columns the configuration documents are built from (changes of the rest of the
+# columns, e.g. heartbeat times, keep the documents)
+COMPUTER_CONFIG_COLUMNS = (
+    "location_id",
+    "company_id",
+    "computer_name",
+    "device_location",
+    "sftp_host",
+    "sftp_username",
+    "sftp_password",
+    "sftp_folder_path",
+    "identifier_key",
+    "folder_password",
+    "manager_host",
+    "files_checksum",
+    "msi_version",
+)
+LOCATION_CONFIG_COLUMNS = (
+    "name",
+    "company_id",
+    "use_pcc_backup",
+    "pcc_fac_id",
+    "default_sftp_path",
+)
+COMPANY_CONFIG_COLUMNS = ("name",)
+
+
+def get_msi_version(msi_version: str | None) -> str:
+    """Version of the desktop client which the computer should use
+
+    NOTE it is read from the database: the registry of the other process can still
+    have the previous versions when the document is built after their change
+    """
+    query = select(m.DesktopClient.version).order_by(m.DesktopClient.id).limit(1)
+    if msi_version in RESOLVED_FLAGS:
+        query = query.join(
+            m.ClientVersion, m.DesktopClient.flag_id == m.ClientVersion.id
+        ).where(m.ClientVersion.name == msi_version)
+    else:
+        query = query.where(m.DesktopClient.version == msi_version)
+
+    version = db.session.execute(query).scalar()
+    return version if version else "undefined"
+
+
+def build_computer_config(computer: m.Computer) -> dict:
+    """Configuration document of the computer (credentials, locations, msi version)
+
+    NOTE computers counters of the additional locations are taken when the document
+    is built (the agent uses only their names and paths)
+    """
+    remote_files_checksum = computer.files_checksum if computer.files_checksum else {}
+    msi_version = get_msi_version(computer.msi_version)
+
+    return s.ComputerCredentialsInfo(
+        status="success",
+        message="Supplying credentials",
+        host=computer.sftp_host,
+        company_name=computer.company_name,
+        location_name=computer.location_name if computer.location_name else "",
+        additional_locations=computer.get_additional_locations,
+        sftp_username=computer.sftp_username,
+        sftp_password=computer.sftp_password,
+        sftp_folder_path=computer.sftp_folder_path,
+        additional_folder_paths=[],
+        identifier_key=computer.identifier_key,
+        computer_name=computer.computer_name,
+        folder_password=computer.folder_password,
+        manager_host=computer.manager_host,
+        device_location=computer.device_location,
+        files_checksum=json.loads(str(remote_files_checksum)),
+        msi_version=msi_version,
+        version=msi_version,
+        use_pcc_backup=computer.location.use_pcc_backup if computer.location else False,
+        pcc_fac_id=computer.location.pcc_fac_id if computer.location else None,
+    ).dict()
+
+
+def insert_computer_config(dialect_name: str):
+    if dialect_name == "postgresql":
+        return postgresql.insert(m.ComputerConfig.__table__)
+    return sqlite.insert(m.ComputerConfig.__table__)
+
+
+def get_computer_config(computer: m.Computer) -> tuple[str, str]:
+    """Configuration document of the computer (built if it was changed)
+
+    NOTE the generation of the document is read before the data of the computer
+    (callers commit their changes, so the computer is loaded again), the document
+    is stored only if its generation was not changed while it was built
+
+    Args:
+        computer (m.Computer): computer
+
+    Returns:
+        tuple[str, str]: JSON document and its etag (sha256 of the document)
+    """
+    configs = m.ComputerConfig.__table__
+    row = db.session.execute(
+        select(configs.c.document, configs.c.etag, configs.c.generation).where(
+            configs.c.computer_id == computer.id
+        )
+    ).first()
+    if row and row.document is not None:
+        return row.document, row.etag
+
+    document = json.dumps(build_computer_config(computer), sort_keys=True)
+    etag = hashlib.sha256(document.encode()).hexdigest()
+
+    if row:
+        store = (
+            update(configs)
+            .where(
+                configs.c.computer_id == computer.id,
+                configs.c.generation == row.generation,
+            )
+            .values(document=document, etag=etag, created_at=datetime.utcnow())
+        )
+    else:
+        store = (
+            insert_computer_config(db.engine.dialect.name)
+            .values(
+                computer_id=computer.id,
+                document=document,
+                etag=etag,
+                generation=0,
+                created_at=datetime.utcnow(),
+            )
+            .on_conflict_do_nothing(index_elements=[configs.c.computer_id])
+        )
+    db.session.execute(store)
+    db.session.commit()
+
+    return document, etag
+
+
+def is_changed(obj, columns: tuple[str, ...]) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[column].history.has_changes() for column in columns)
+
+
+# NOTE documents are cleared in the same transaction as the changes of their data,
+# the rows are kept (with the next generation) to reject documents being built
+@event.listens_for(Session, "after_flush")
+def clear_changed_computer_configs(session: Session, flush_context):
+    computer_ids: set[int] = set()
+    location_ids: set[int] = set()
+    company_ids: set[int] = set()
+    all_computers = False
+
+    for obj in chain(session.new, session.dirty, session.deleted):
+        match obj:
+            case m.Computer() if obj not in session.new and is_changed(
+                obj, COMPUTER_CONFIG_COLUMNS
+            ):
+                computer_ids.add(obj.id)
+            case m.Location() if obj not in session.new and is_changed(
+                obj, LOCATION_CONFIG_COLUMNS
+            ):
+                location_ids.add(obj.id)
+            case m.Company() if obj not in session.new and is_changed(
+                obj, COMPANY_CONFIG_COLUMNS
+            ):
+                company_ids.add(obj.id)
+            case m.AdditionalLocation():
+                computer_ids.update(
+                    computer_id
+                    for computer_id in chain(
+                        [obj.computer_id],
+                        inspect(obj).attrs.computer_id.history.deleted,
+                    )
+                    if computer_id
+                )
+            case m.DesktopClient() | m.ClientVersion():
+                all_computers = True
+
+    if not (computer_ids or location_ids or company_ids or all_computers):
+        return
+
+    computers = m.Computer.__table__.c
+    changed_computers = select(computers.id, literal(1), literal(datetime.utcnow()))
+    if all_computers:
+        changed_computers = changed_computers.where(true())
+    else:
+        locations = m.Location.__table__.c
+        additional_locations = m.AdditionalLocation.__table__.c
+        # Additional locations of the computers include the company name
+        changed_locations = or_(
+            additional_locations.location_id.in_(location_ids),
+            additional_locations.location_id.in_(
+                select(locations.id).where(locations.company_id.in_(company_ids))
+            ),
+        )
+        changed_computers = changed_computers.where(
+            or_(
+                computers.id.in_(computer_ids),
+                computers.location_id.in_(location_ids),
+                computers.company_id.in_(company_ids),
+                computers.id.in_(
+                    select(additional_locations.computer_id).where(changed_locations)
+                ),
+            )
+        )
+
+    connection = session.connection()
+    configs = m.ComputerConfig.__table__
+    upsert = insert_computer_config(connection.dialect.name).from_select(
+        ["computer_id", "generation", "created_at"], changed_computers
+    )
+    connection.execute(
+        upsert.on_conflict_do_update(
+            index_elements=[configs.c.computer_id],
+            set_=dict(
+                document=None,
+                etag=None,
+                generation=configs.c.generation + 1,
+                created_at=upsert.excluded.created_at,
+            ),
+        )
+    )
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from sqlalchemy import update
+
+from app import db
+from app.logger import logger
+from app.models import Computer
+from config import BaseConfig as CFG
+
+
+def update_computers_status(computer_ids: list[int] | None = None) -> int:
+    """Refresh stored status (computer_status) of computers.
+
+    Statuses are changed on heartbeats by the Computer model itself, this sweep handles
+    time-based decay (ONLINE -> ONLINE_NO_BACKUP -> OFFLINE_NO_BACKUP) and bulk
+    changes made without ORM. Only rows with changed status are updated.
+
+    Args:
+        computer_ids (list[int], optional): refresh only these computers. Defaults to all.
+
+    Returns:
+        int: number of computers with changed status
+    """
+    current_east_time = CFG.offset_to_est(datetime.utcnow(), True)
+    actual_status = Computer.status_case(current_east_time)
+
+    query = (
+        update(Computer)
+        .where(Computer.computer_status != actual_status)
+        .values(computer_status=actual_status, status_changed_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if computer_ids is not None:
+        query = query.where(Computer.id.in_(computer_ids))
+
+    changed_computers = db.session.execute(query).rowcount
+    db.session.commit()
+
+    if computer_ids is None:
+        logger.info("Computers status sweep: {} statuses changed", changed_computers)
+
+    return changed_computers
@@ -0,0 +1,185 @@
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import and_, false, func, or_, select, true
+
+from app import db
+from app.models import (
+    Computer,
+    ComputerStatus,
+    DeviceRole,
+    Location,
+    LocationStatus,
+    User,
+    UserPermissionLevel,
+)
+from app.models.location_group import locations_to_group
+from app.schema import DashboardStats
+
+# Cached dashboard stats by permission scope: {scope: (expiration time, stats)}
+_stats_cache: dict[tuple, tuple[float, DashboardStats]] = {}
+_stats_cache_lock = threading.Lock()
+
+
+def get_permission_scope(user: User) -> tuple:
+    """Key of the data visible for the user (users with the same scope see the same data)
+
+    Args:
+        user (User): user instance
+
+    Returns:
+        tuple: (permission level, id of the company/location group/location)
+    """
+    match user.permission:
+        case UserPermissionLevel.GLOBAL:
+            return (UserPermissionLevel.GLOBAL, None)
+        case UserPermissionLevel.COMPANY:
+            return (UserPermissionLevel.COMPANY, user.company_id)
+        case UserPermissionLevel.LOCATION_GROUP:
+            return (UserPermissionLevel.LOCATION_GROUP, user.location_group[0].id)
+        case UserPermissionLevel.LOCATION:
+            return (UserPermissionLevel.LOCATION, user.location[0].id)
+        case _:
+            return (None, None)
+
+
+def _scope_filters(scope: tuple) -> tuple[list, list]:
+    """Locations and computers filters for the permission scope"""
+    permission, scope_id = scope
+    locations_filters = [Location.computers_per_location > 0]
+
+    match permission:
+        case UserPermissionLevel.GLOBAL:
+            computers_filters = []
+        case UserPermissionLevel.COMPANY:
+            locations_filters.append(Location.company_id == scope_id)
+            computers_filters = [
+                or_(
+                    Computer.company_id == scope_id,
+                    Computer.location_id.in_(
+                        select(Location.id).where(
+                            Location.is_deleted.is_(False), *locations_filters
+                        )
+                    ),
+                )
+            ]
+        case UserPermissionLevel.LOCATION_GROUP:
+            group_locations = (
+                select(Location.id)
+                .join(
+                    locations_to_group,
+                    locations_to_group.c.location_id == Location.id,
+                )
+                .where(
+                    locations_to_group.c.location_group_id == scope_id,
+                    Location.is_deleted.is_(False),
+                )
+            )
+            locations_filters.append(Location.id.in_(group_locations))
+            computers_filters = [Computer.location_id.in_(group_locations)]
+        case UserPermissionLevel.LOCATION:
+            locations_filters.append(Location.id == scope_id)
+            computers_filters = [Computer.location_id == scope_id]
+        case _:
+            locations_filters.append(false())
+            computers_filters = [false()]
+
+    return locations_filters, computers_filters
+
+
+def calculate_dashboard_stats(scope: tuple) -> DashboardStats:
+    """Calculate all the dashboard counters of the scope with one query
+
+    Args:
+        scope (tuple): permission scope (see get_permission_scope)
+
+    Returns:
+        DashboardStats: locations and computers counters
+    """
+    locations_filters, computers_filters = _scope_filters(scope)
+
+    activated_location = Location.activated.is_(True)
+    locations_stats = (
+        select(
+            func.count().label("total_locations"),
+            func.count().filter(activated_location).label("activated_locations"),
+            func.count()
+            .filter(and_(activated_location, Location.status == LocationStatus.OFFLINE))
+            .label("locations_offline"),
+            func.count()
+            .filter(and_(activated_location, Location.status == LocationStatus.ONLINE))
+            .label("locations_online"),
+            func.count()
+            .filter(
+                and_(
+                    activated_location,
+                    Location.status == LocationStatus.ONLINE_PRIMARY_OFFLINE,
+                )
+            )
+            .label("locations_primary_offline"),
+        )
+        .where(Location.is_deleted.is_(False), *locations_filters)
+        .subquery()
+    )
+
+    activated = Computer.activated.is_(True)
+    online = Computer.computer_status == ComputerStatus.ONLINE
+    offline = and_(activated, Computer.computer_status != ComputerStatus.ONLINE)
+    primary = Computer.device_role == DeviceRole.PRIMARY
+    alternate = Computer.device_role == DeviceRole.ALTERNATE
+    computers_stats = (
+        select(
+            func.count().label("total_computers"),
+            func.count().filter(activated).label("activated_computers"),
+            func.count().filter(online).label("computers_online"),
+            func.count().filter(offline).label("computers_offline"),
+            func.count().filter(and_(activated, primary)).label("activated_primary"),
+            func.count().filter(and_(online, primary)).label("primary_online"),
+            func.count().filter(and_(offline, primary)).label("primary_offline"),
+            func.count()
+            .filter(and_(activated, alternate))
+            .label("activated_alternate"),
+            func.count().filter(and_(online, alternate)).label("alternate_online"),
+            func.count().filter(and_(offline, alternate)).label("alternate_offline"),
+        )
+        .where(Computer.is_deleted.is_(False), *computers_filters)
+        .subquery()
+    )
+
+    # Both subqueries return one row - join them to get all the stats in one round trip
+    row = db.session.execute(
+        select(locations_stats, computers_stats).select_from(
+            locations_stats.join(computers_stats, true())
+        )
+    ).one()
+
+    return DashboardStats(**row._mapping)
+
+
+def get_dashboard_stats(user: User) -> DashboardStats:
+    """Dashboard counters visible for the user.
+    Stats are cached per permission scope for DASHBOARD_STATS_CACHE_TTL seconds.
+
+    Args:
+        user (User): user instance
+
+    Returns:
+        DashboardStats: locations and computers counters
+    """
+    scope = get_permission_scope(user)
+    cache_ttl = current_app.config["DASHBOARD_STATS_CACHE_TTL"]
+
+    if cache_ttl:
+        with _stats_cache_lock:
+            cached = _stats_cache.get(scope)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+    stats = calculate_dashboard_stats(scope)
+
+    if cache_ttl:
+        with _stats_cache_lock:
+            _stats_cache[scope] = (time.monotonic() + cache_ttl, stats)
+
+    return stats
@@ -1,8 +1,10 @@
+import io
 from datetime import datetime, timedelta
 
 from app import db
 from app import models as m
 from app.logger import logger
+from app.utils.blob_store import save_blob
 from config import BaseConfig as CFG
 
 
@@ -263,21 +265,23 @@ def init_db(test_me: bool = False):
 
         m.ClientVersion(name="stable").save()
 
+        sha256, size = save_blob(io.BytesIO(b"test_bytes"))
         m.DesktopClient(
             mimetype="application/octet-stream",
             filename="test_version.msi",
-            blob=b"test_bytes",
-            size=345,
+            sha256=sha256,
+            size=size,
             name="test_version",
             version="1.0.1.1",
             description="test description",
             flag_name="stable",
         ).save()
+        sha256, size = save_blob(io.BytesIO(b"new_test_bytes"))
         m.DesktopClient(
             mimetype="application/octet-stream",
             filename="new_test_version.msi",
-            blob=b"new_test_bytes",
-            size=345,
+            sha256=sha256,
+            size=size,
             name="new_test_version",
             version="1.0.9.110769",
             description="new version",
@@ -0,0 +1,314 @@
+import atexit
+import threading
+import time
+from datetime import datetime
+
+import zoneinfo
+from sqlalchemy import bindparam, insert, update
+
+from app import db
+from app.controllers.backup_log import backup_log_on_download_success
+from app.controllers.computer_status import update_computers_status
+from app.logger import logger
+from app.models import Computer, LogEvent, LogType
+
+
+class BufferedHeartbeat:
+    """Latest heartbeat state of one computer waiting to be written to the database"""
+
+    def __init__(self, computer_id: int, logs_enabled: bool):
+        self.computer_id = computer_id
+        self.logs_enabled = logs_enabled
+        self.computer_ip: str | None = None
+        self.last_time_online: datetime | None = None
+        self.last_download_time: datetime | None = None
+        self.log_events: list[dict] = []
+        # Time (monotonic) when the oldest not flushed heartbeat was accepted
+        self.accepted_at = time.monotonic()
+
+    def merge(self, other: "BufferedHeartbeat"):
+        """Merge older buffered state (e.g. from a failed flush) into this one"""
+        self.accepted_at = min(self.accepted_at, other.accepted_at)
+        self.log_events = other.log_events + self.log_events
+        self.last_download_time = self.last_download_time or other.last_download_time
+
+
+class HeartbeatBuffer:
+    """Write-behind buffer for the agents heartbeats (/last_time).
+
+    Heartbeats are accepted in memory and written in batches by a background thread:
+    one multi-row UPDATE of computers and one bulk INSERT of log events per flush.
+    A heartbeat never stays in the buffer longer than HEARTBEAT_MAX_STALENESS seconds
+    (unless the database is unavailable) and the buffer is drained on shutdown.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.flush_interval = 1.0
+        self.max_staleness = 30.0
+        self.max_size = 500
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: dict[int, BufferedHeartbeat] = {}
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config["HEARTBEAT_WRITE_BEHIND"]
+        self.flush_interval = app.config["HEARTBEAT_FLUSH_INTERVAL"]
+        self.max_staleness = app.config["HEARTBEAT_MAX_STALENESS"]
+        self.max_size = app.config["HEARTBEAT_BUFFER_MAX_SIZE"]
+
+        if self.enabled:
+            atexit.register(self.drain)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(
+        self,
+        computer: Computer,
+        computer_ip: str | None,
+        last_time_online: datetime,
+        last_download_time: datetime | None = None,
+    ):
+        """Accept heartbeat of the computer into the buffer
+
+        Args:
+            computer (Computer): computer that sent heartbeat
+            computer_ip (str | None): ip address of the request
+            last_time_online (datetime): heartbeat time (EST)
+            last_download_time (datetime | None, optional): backup download time (EST). Defaults to None.
+        """
+        with self._lock:
+            heartbeat = self._pending.get(computer.id)
+            if not heartbeat:
+                heartbeat = BufferedHeartbeat(computer.id, computer.logs_enabled)
+                self._pending[computer.id] = heartbeat
+
+            heartbeat.computer_ip = computer_ip
+            heartbeat.last_time_online = last_time_online
+
+            if heartbeat.logs_enabled:
+                heartbeat.log_events.append(
+                    dict(
+                        computer_id=computer.id,
+                        log_type=LogType.HEARTBEAT,
+                        created_at=last_time_online,
+                        data="",
+                    )
+                )
+
+            if last_download_time:
+                heartbeat.last_download_time = last_download_time
+                if heartbeat.logs_enabled:
+                    heartbeat.log_events.append(
+                        dict(
+                            computer_id=computer.id,
+                            log_type=LogType.BACKUP_DOWNLOAD,
+                            created_at=last_download_time,
+                            data="",
+                        )
+                    )
+
+            buffer_size = len(self._pending)
+
+        self._ensure_thread()
+
+        if buffer_size >= self.max_size:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """Write all buffered heartbeats to the database
+
+        Returns:
+            int: number of computers updated
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = self._pending
+                self._pending = {}
+
+            if not batch:
+                return 0
+
+            heartbeats = list(batch.values())
+            with self.app.app_context():
+                try:
+                    self._write_batch(heartbeats)
+                except Exception as err:
+                    db.session.rollback()
+                    logger.error(
+                        "Heartbeat buffer flush failed ({} computers): {}",
+                        len(batch),
+                        err,
+                    )
+                    self._requeue(batch)
+                    return 0
+
+                # NOTE the batch is committed at this point: the next steps are
+                # never requeued, otherwise the batch would be written twice
+                self._update_statuses(heartbeats)
+                self._update_backup_logs(heartbeats)
+
+            return len(batch)
+
+    def drain(self):
+        """Stop background flushing and write everything that is left in the buffer"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=self.max_staleness)
+
+        with self._lock:
+            pending = len(self._pending)
+
+        if pending:
+            logger.info("Draining heartbeat buffer: {} computers", pending)
+            self.flush()
+
+    def _write_batch(self, batch: list[BufferedHeartbeat]):
+        computers_table = Computer.__table__
+
+        db.session.execute(
+            update(computers_table)
+            .where(computers_table.c.id == bindparam("_id"))
+            .values(
+                last_time_online=bindparam("_last_time_online"),
+                computer_ip=bindparam("_computer_ip"),
+            ),
+            [
+                dict(
+                    _id=heartbeat.computer_id,
+                    _last_time_online=heartbeat.last_time_online,
+                    _computer_ip=heartbeat.computer_ip,
+                )
+                for heartbeat in batch
+            ],
+        )
+
+        downloads = [heartbeat for heartbeat in batch if heartbeat.last_download_time]
+        if downloads:
+            db.session.execute(
+                update(computers_table)
+                .where(computers_table.c.id == bindparam("_id"))
+                .values(last_download_time=bindparam("_last_download_time")),
+                [
+                    dict(
+                        _id=heartbeat.computer_id,
+                        _last_download_time=heartbeat.last_download_time,
+                    )
+                    for heartbeat in downloads
+                ],
+            )
+
+        log_events = [log for heartbeat in batch for log in heartbeat.log_events]
+        if log_events:
+            db.session.execute(insert(LogEvent.__table__), log_events)
+
+        db.session.commit()
+
+        logger.debug(
+            "Heartbeat buffer flushed: {} computers, {} downloads, {} log events",
+            len(batch),
+            len(downloads),
+            len(log_events),
+        )
+
+    def _update_statuses(self, batch: list[BufferedHeartbeat]):
+        try:
+            update_computers_status([heartbeat.computer_id for heartbeat in batch])
+        except Exception as err:
+            db.session.rollback()
+            logger.error(
+                "Heartbeat buffer status update failed ({} computers): {}",
+                len(batch),
+                err,
+            )
+
+    def _update_backup_logs(self, batch: list[BufferedHeartbeat]):
+        # Backup periods depend on the previous period of the computer, so they are
+        # still processed per computer, but only once per flush
+        downloads = [
+            heartbeat
+            for heartbeat in batch
+            if heartbeat.last_download_time and heartbeat.logs_enabled
+        ]
+        if not downloads:
+            return
+
+        computers = {
+            computer.id: computer
+            for computer in Computer.query.filter(
+                Computer.id.in_([heartbeat.computer_id for heartbeat in downloads])
+            )
+        }
+        for heartbeat in downloads:
+            computer = computers.get(heartbeat.computer_id)
+            if not computer:
+                continue
+
+            utc_download_time = heartbeat.last_download_time.replace(
+                tzinfo=zoneinfo.ZoneInfo("America/New_York")
+            ).astimezone(zoneinfo.ZoneInfo("UTC"))
+            try:
+                backup_log_on_download_success(
+                    computer, utc_download_time.replace(tzinfo=None)
+                )
+            except Exception as err:
+                db.session.rollback()
+                logger.error(
+                    "Heartbeat buffer backup log failed (computer {}): {}",
+                    heartbeat.computer_id,
+                    err,
+                )
+
+    def _requeue(self, batch: dict[int, BufferedHeartbeat]):
+        with self._lock:
+            for computer_id, heartbeat in batch.items():
+                newer = self._pending.get(computer_id)
+                if newer:
+                    newer.merge(heartbeat)
+                else:
+                    self._pending[computer_id] = heartbeat
+
+    def _is_flush_due(self) -> bool:
+        with self._lock:
+            if not self._pending:
+                return False
+            if len(self._pending) >= self.max_size:
+                return True
+            oldest = min(heartbeat.accepted_at for heartbeat in self._pending.values())
+
+        return time.monotonic() - oldest >= self.max_staleness
+
+    def _ensure_thread(self):
+        # NOTE thread is started lazily to be created in the worker process (after fork)
+        if self._thread and self._thread.is_alive() or self._stopped.is_set():
+            return
+
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="heartbeat-buffer", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+
+            if self._stopped.is_set():
+                break
+
+            if self._is_flush_due():
+                self.flush()
+
+
+heartbeat_buffer = HeartbeatBuffer()
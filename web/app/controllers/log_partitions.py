@@ -0,0 +1,188 @@
+import re
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app import db
+from app.logger import logger
+from config import BaseConfig as CFG
+
+# Tables partitioned by month (PostgreSQL only) and their partition key columns.
+# backup_logs is partitioned by end_time: periods are read and purged by end time.
+PARTITIONED_LOG_TABLES = {
+    "log_events": "created_at",
+    "backup_logs": "end_time",
+}
+
+PARTITION_BOUND_RE = re.compile(r"FROM \((?P<start>.+?)\) TO \((?P<end>.+?)\)")
+
+
+def month_start(date: datetime, months: int = 0) -> datetime:
+    """Return the first day of the month shifted by months from the month of the date"""
+    month_index = date.year * 12 + date.month - 1 + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+
+def is_partitioned(table_name: str) -> bool:
+    """Check that the table is partitioned (always False for not PostgreSQL databases)"""
+    if db.engine.dialect.name != "postgresql":
+        return False
+
+    return bool(
+        db.session.execute(
+            text(
+                "SELECT 1 FROM pg_partitioned_table "
+                "WHERE partrelid = to_regclass(:table_name)"
+            ),
+            dict(table_name=table_name),
+        ).scalar()
+    )
+
+
+def _parse_bound(value: str) -> datetime | None:
+    if value in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+
+def get_partitions(
+    table_name: str,
+) -> list[tuple[str, datetime | None, datetime | None]]:
+    """Return partitions of the table with their ranges
+
+    Args:
+        table_name (str): partitioned table name
+
+    Returns:
+        list[tuple[str, datetime | None, datetime | None]]: (name, start, end) of the range
+            partitions ordered by start. None start/end means MINVALUE/MAXVALUE.
+            DEFAULT partition is not included.
+    """
+    rows = db.session.execute(
+        text(
+            "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+            "FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(:table_name)"
+        ),
+        dict(table_name=table_name),
+    ).all()
+
+    partitions = []
+    for name, bound in rows:
+        match = PARTITION_BOUND_RE.search(bound)
+        if not match:
+            continue
+        partitions.append(
+            (name, _parse_bound(match["start"]), _parse_bound(match["end"]))
+        )
+
+    return sorted(partitions, key=lambda partition: partition[1] or datetime.min)
+
+
+def create_month_partition(table_name: str, start: datetime) -> str:
+    """Create partition of the table for the month starting at start
+
+    Rows of this month already stored in the DEFAULT partition are moved to the
+    new partition.
+
+    Args:
+        table_name (str): partitioned table name
+        start (datetime): first day of the month
+
+    Returns:
+        str: name of the created partition
+    """
+    column = PARTITIONED_LOG_TABLES[table_name]
+    partition = f"{table_name}_p{start:%Y%m}"
+    end = month_start(start, 1)
+    bounds = f"FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+
+    db.session.execute(
+        text(
+            f"CREATE TABLE {partition} "
+            f"(LIKE {table_name} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+    )
+    db.session.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {table_name}_default "
+            f"WHERE {column} >= :start AND {column} < :end RETURNING *) "
+            f"INSERT INTO {partition} SELECT * FROM moved"
+        ),
+        dict(start=start, end=end),
+    )
+    db.session.execute(
+        text(
+            f"ALTER TABLE {table_name} "
+            f"ATTACH PARTITION {partition} FOR VALUES {bounds}"
+        )
+    )
+    db.session.commit()
+
+    return partition
+
+
+def create_log_partitions(
+    months_ahead: int = CFG.LOG_PARTITIONS_MONTHS_AHEAD,
+) -> list[str]:
+    """Create monthly partitions of the log tables up to months_ahead months from now
+
+    Args:
+        months_ahead (int, optional): number of upcoming months to have partitions for.
+            Defaults to CFG.LOG_PARTITIONS_MONTHS_AHEAD.
+
+    Returns:
+        list[str]: names of created partitions
+    """
+    created = []
+    current_month = month_start(datetime.utcnow())
+
+    for table_name in PARTITIONED_LOG_TABLES:
+        if not is_partitioned(table_name):
+            logger.debug("Table {} is not partitioned", table_name)
+            continue
+
+        # Months before the end of the last partition are covered already
+        covered_until = max(
+            (end for _, _, end in get_partitions(table_name) if end),
+            default=datetime.min,
+        )
+        for months in range(months_ahead + 1):
+            start = month_start(current_month, months)
+            if start < covered_until:
+                continue
+            created.append(create_month_partition(table_name, start))
+
+    logger.info("Log partitions created: {}", created)
+
+    return created
+
+
+def drop_expired_partitions(table_name: str, expired_before: datetime) -> list[str]:
+    """Drop partitions of the table which contain only expired rows
+
+    Args:
+        table_name (str): partitioned table name
+        expired_before (datetime): rows older than this time are expired
+
+    Returns:
+        list[str]: names of dropped partitions
+    """
+    if not is_partitioned(table_name):
+        return []
+
+    dropped = []
+    for name, _, end in get_partitions(table_name):
+        if not end or end > expired_before:
+            continue
+
+        db.session.execute(text(f"ALTER TABLE {table_name} DETACH PARTITION {name}"))
+        db.session.execute(text(f"DROP TABLE {name}"))
+        db.session.commit()
+        dropped.append(name)
+
+    if dropped:
+        logger.info("Expired partitions of {} dropped: {}", table_name, dropped)
+
+    return dropped
@@ -1,18 +1,22 @@
 import json
 import os
-import time
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterator
 from urllib.parse import urljoin
 
-import requests
 from flask import abort, current_app
 from pydantic import ValidationError
+from sqlalchemy import and_, select
+from sqlalchemy.dialects import postgresql, sqlite
 from requests.exceptions import HTTPError
 
+from app import db
 from app import models as m
 from app import schema as s
+from app.controllers.pcc_client import SpikeArrestError, pcc_client
+from app.controllers.pcc_token import pcc_token_manager
 from app.logger import logger
-from app.utils import get_base64_string
 from config import BaseConfig as CFG
 
 
@@ -20,10 +24,6 @@ class UnknownTypeError(Exception):
     pass
 
 
-class SpikeArrestError(Exception):
-    pass
-
-
 def update_daily_requests_count(reset_time: int, remaining_requests: int) -> None:
     """Update daily requests count
 
@@ -36,21 +36,21 @@ def update_daily_requests_count(reset_time: int, remaining_requests: int) -> Non
 
     used_requests = current_app.config["PCC_DAILY_QUOTA_LIMIT"] - remaining_requests
 
-    # Check if reset time is already exists
-    daily_requests: m.PCCDailyRequest | None = m.PCCDailyRequest.query.filter_by(
-        reset_time=reset_time_as_date
-    ).first()
-
-    # If not - create new
-    if not daily_requests:
-        daily_requests = m.PCCDailyRequest(
+    # NOTE upsert: facilities are fetched by several threads, which can create the
+    # counter of the same reset time at once (reset_time is unique)
+    if db.engine.dialect.name == "postgresql":
+        upsert = postgresql.insert(m.PCCDailyRequest.__table__)
+    else:
+        upsert = sqlite.insert(m.PCCDailyRequest.__table__)
+    db.session.execute(
+        upsert.values(
             reset_time=reset_time_as_date, requests_count=used_requests
+        ).on_conflict_do_update(
+            index_elements=[m.PCCDailyRequest.reset_time],
+            set_=dict(requests_count=upsert.excluded.requests_count),
         )
-        daily_requests.save()
-    # If exists - update
-    else:
-        daily_requests.requests_count = used_requests
-        daily_requests.update()
+    )
+    db.session.commit()
 
 
 def check_daily_requests_count() -> None:
@@ -87,58 +87,12 @@ def check_daily_requests_count() -> None:
 
 
 def get_pcc_2_legged_token() -> str:
-    """Retrieve valid 2-legged access token for PCC API
+    """Retrieve valid 2-legged access token for PCC API (see PCCTokenManager)
 
     Returns:
         str: PCC API 2-legged access token
     """
-    # Try to get existing token
-    token = m.PCCAccessToken.query.first()
-    if token and (token.created_at + timedelta(seconds=token.expires_in)) > (
-        datetime.now() + timedelta(seconds=60)
-    ):
-        logger.debug(
-            "Existing token is valid till: {}",
-            token.created_at + timedelta(seconds=token.expires_in),
-        )
-        return token.token
-
-    server_path = os.path.join("auth", "token")
-    url = urljoin(CFG.PCC_BASE_URL, server_path)
-    base64_secret = get_base64_string(f"{CFG.PCC_CLIENT_ID}:{CFG.PCC_CLIENT_SECRET}")
-
-    # If token is expired or not exists - get new one
-    try:
-        response = requests.post(
-            url,
-            headers={
-                "Authorization": f"Basic {base64_secret}",
-                "Content-Type": "application/x-www-form-urlencoded",
-            },
-            data={"grant_type": "client_credentials"},
-            cert=(CFG.CERTIFICATE_PATH, CFG.PRIVATEKEY_PATH),
-        )
-        response.raise_for_status()
-
-        access_token_info = s.TwoLeggedAuthResult.parse_obj(response.json())
-    except (ValidationError, HTTPError) as e:
-        logger.error("Can't get PCC API access token. Reason: {}", e)
-        raise e
-
-    # Save new token to DB
-    if not token:
-        token = m.PCCAccessToken(
-            token=access_token_info.access_token,
-            expires_in=access_token_info.expires_in,
-        )
-        token.save()
-    else:
-        token.token = access_token_info.access_token
-        token.expires_in = access_token_info.expires_in
-        token.created_at = datetime.now()
-        token.save()
-
-    return token.token
+    return pcc_token_manager.get_token()
 
 
 def execute_pcc_request(
@@ -160,56 +114,32 @@ def execute_pcc_request(
     Returns:
         Response: response object
     """
-    # Two retries for the case when we have SpikeArrest error (frequency 20 ms)
-    for i in range(2):
-        # Check daily requests count and raise error if it's exceeded
-        check_daily_requests_count()
-        try:
-            res = requests.get(
-                url,
-                params=params,
-                headers=headers,
-                stream=stream,
-                cert=(CFG.CERTIFICATE_PATH, CFG.PRIVATEKEY_PATH),
+    # Check daily requests count and raise error if it's exceeded
+    check_daily_requests_count()
+    try:
+        # Pooled connections, rate limits and retries are handled by PCCClient
+        res = pcc_client.get(url, params=params, headers=headers, stream=stream)
+
+        if res.headers.get("X-Quota-Time-To-Reset") and res.headers.get(
+            "X-Quota-Remaining"
+        ):
+            logger.debug(
+                "Daily Quota limit: {}. Requests remains: {}",
+                int(res.headers["X-Quota-Limit"]),
+                int(res.headers["X-Quota-Remaining"]),
             )
 
-            if res.headers.get("X-Quota-Time-To-Reset") and res.headers.get(
-                "X-Quota-Remaining"
-            ):
-                logger.debug(
-                    "Daily Quota limit: {}. Requests remains: {}",
-                    int(res.headers["X-Quota-Limit"]),
-                    int(res.headers["X-Quota-Remaining"]),
-                )
-
-                update_daily_requests_count(
-                    int(res.headers["X-Quota-Time-To-Reset"]),
-                    int(res.headers["X-Quota-Remaining"]),
-                )
+            update_daily_requests_count(
+                int(res.headers["X-Quota-Time-To-Reset"]),
+                int(res.headers["X-Quota-Remaining"]),
+            )
 
-            if res.status_code in (429, 503):
-                # When we have SpikeArrest error because of minute quota - raise exception
-                if res.headers["X-Quota-Minute-Remaining"] == 0:
-                    raise SpikeArrestError(
-                        "SpikeArrest error (minute quota). Retry in 1 minute"
-                    )
-                # When we have SpikeArrest error because of frequency (20 ms)
-                else:
-                    # If that is first time - retry after 400 ms
-                    if i == 0:
-                        time.sleep(0.4)
-                        continue
-                    else:
-                        raise SpikeArrestError(
-                            "SpikeArrest error (too high frequency of requests)"
-                        )
-
-            res.raise_for_status()
-        except (SpikeArrestError, HTTPError) as e:
-            logger.error(str(e))
-            raise e
+        res.raise_for_status()
+    except (SpikeArrestError, HTTPError) as e:
+        logger.error(str(e))
+        raise e
 
-        return res
+    return res
 
 
 def get_activations() -> list[s.OrgActivationData]:
@@ -299,21 +229,102 @@ def get_org_facilities_list(pcc_org_uuid: str) -> list[s.Facility]:
     return facilities_list
 
 
-def create_new_creation_reports() -> None:
+def get_existing_companies_and_locations() -> tuple[
+    dict[str, tuple[int, str | None]], dict[tuple[str, str], set[int | None]]
+]:
+    """Existing companies and locations for matching with PCC API data (one query)
+
+    Returns:
+        tuple: (id, pcc_org_id) by company name and
+            pcc_fac_id values by (company name, location name)
+    """
+    companies: dict[str, tuple[int, str | None]] = {}
+    locations: dict[tuple[str, str], set[int | None]] = {}
+
+    for (
+        company_id,
+        company_name,
+        pcc_org_id,
+        location_name,
+        pcc_fac_id,
+    ) in db.session.execute(
+        select(
+            m.Company.id,
+            m.Company.name,
+            m.Company.pcc_org_id,
+            m.Location.name,
+            m.Location.pcc_fac_id,
+        )
+        .outerjoin(
+            m.Location,
+            and_(
+                m.Location.company_id == m.Company.id,
+                m.Location.is_deleted.is_(False),
+            ),
+        )
+        .where(m.Company.is_deleted.is_(False))
+    ):
+        companies[company_name] = (company_id, pcc_org_id)
+        if location_name is not None:
+            locations.setdefault((company_name, location_name), set()).add(pcc_fac_id)
+
+    return companies, locations
+
+
+def fetch_org_facilities(
+    organizations: list[s.OrgActivationData],
+) -> Iterator[tuple[s.OrgActivationData, list[s.Facility]]]:
+    """Fetch facilities of the organizations concurrently (PCC_SCAN_WORKERS threads)
+
+    The requests are throttled by the PCC API rate limiter shared by the threads.
+
+    Yields:
+        tuple: organization and the list of its facilities (in the initial order)
+    """
+    app = current_app._get_current_object()
+
+    def fetch(organization: s.OrgActivationData) -> list[s.Facility]:
+        with app.app_context():
+            return get_org_facilities_list(organization.orgUuid)
+
+    executor = ThreadPoolExecutor(max_workers=current_app.config["PCC_SCAN_WORKERS"])
+    try:
+        futures = [
+            executor.submit(fetch, organization) for organization in organizations
+        ]
+        for organization, future in zip(organizations, futures):
+            yield organization, future.result()
+    finally:
+        # Don't send the rest of the requests if the scanning failed
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def create_new_creation_reports(
+    scan_record: m.PCCActivationsScan | None = None,
+) -> None:
     """
     Retrieve current list of activations from PCC API and generate new reports for approve
+
+    Args:
+        scan_record (m.PCCActivationsScan, optional): scan to save the progress to
     """
 
     # Get the list of all existing AppActivations
     activations_list = get_activations()
 
+    if scan_record:
+        scan_record.organizations_total = len(activations_list)
+        scan_record.organizations_scanned = 0
+        scan_record.save()
+
+    # Existing companies and locations are matched with PCC API data in memory
+    companies, locations = get_existing_companies_and_locations()
+
     # Check the existence of the organization in DB and create if not exists
-    for organization in activations_list:
+    for organization, facilities_list in fetch_org_facilities(activations_list):
         # List of objects which should be created
         objects_to_approve: list[s.PCCReportObject] = []
 
-        facilities_list = get_org_facilities_list(organization.orgUuid)
-
         # If not all the company facilities are integrated to our app - filter them
         if organization.scope != 1:
             activated_facilities: list[s.Facility] = []
@@ -335,16 +346,9 @@ def create_new_creation_reports() -> None:
                 )
 
         # There can be companies which are already exist but do not have pcc_org_id
-        company_by_org_uuid = m.Company.query.filter(
-            m.Company.pcc_org_id == organization.orgUuid, m.Company.name == company_name
-        ).first()
-
-        # Try to find company just by name
-        company_by_name = None
-        if not company_by_org_uuid:
-            company_by_name = m.Company.query.filter_by(name=company_name).first()
+        company_id, company_org_uuid = companies.get(company_name, (None, None))
 
-        if not company_by_org_uuid and not company_by_name:
+        if not company_id:
             objects_to_approve.append(
                 s.PCCReportObject(
                     type=s.PCCReportType.COMPANY.value,
@@ -359,14 +363,14 @@ def create_new_creation_reports() -> None:
                 company_name,
                 organization.orgUuid,
             )
-        elif company_by_name:
+        elif company_org_uuid != organization.orgUuid:
             objects_to_approve.append(
                 s.PCCReportObject(
                     type=s.PCCReportType.COMPANY.value,
                     action=s.PCCReportAction.UPDATE.value,
                     pcc_org_id=organization.orgUuid,
                     name=company_name,
-                    id=company_by_name.id,
+                    id=company_id,
                 ).dict()
             )
 
@@ -378,23 +382,10 @@ def create_new_creation_reports() -> None:
 
         # Check the existence of the facility in DB and add to approving list if not exists
         for facility in facilities_list:
-            location_by_fac_id = m.Location.query.filter(
-                m.Location.company_name == company_name,
-                m.Location.pcc_fac_id == facility.facId,
-                m.Location.name == facility.facilityName,
-            ).first()
-
-            # Try to find location just by name
-            location_by_name = None
-            if not location_by_fac_id:
-                location_by_name = m.Location.query.filter(
-                    m.Location.company_name == company_name,
-                    m.Location.name == facility.facilityName,
-                ).first()
+            location_fac_ids = locations.get((company_name, facility.facilityName))
 
             # Add new location to approving list if not exists
-            if not location_by_fac_id and not location_by_name:
-                facility_info = facility
+            if location_fac_ids is None:
                 objects_to_approve.append(
                     s.PCCReportObject(
                         type=s.PCCReportType.LOCATION.value,
@@ -408,18 +399,18 @@ def create_new_creation_reports() -> None:
 
                 logger.info(
                     "New location [{}] added to approving list. PCC facId: {}",
-                    facility_info.facilityName,
-                    facility_info.facId,
+                    facility.facilityName,
+                    facility.facId,
                 )
 
             # Update location if it doesn't have pcc_fac_id
-            elif location_by_name:
+            elif facility.facId not in location_fac_ids:
                 objects_to_approve.append(
                     s.PCCReportObject(
                         type=s.PCCReportType.LOCATION.value,
                         action=s.PCCReportAction.UPDATE.value,
                         pcc_fac_id=facility.facId,
-                        name=location_by_name.name,
+                        name=facility.facilityName,
                         pcc_org_id=organization.orgUuid,
                         use_pcc_backup=True,
                     ).dict()
@@ -427,7 +418,7 @@ def create_new_creation_reports() -> None:
 
                 logger.info(
                     "Location [{}] update added to approving list. PCC facId: {}",
-                    location_by_name.name,
+                    facility.facilityName,
                     facility.facId,
                 )
 
@@ -442,6 +433,10 @@ def create_new_creation_reports() -> None:
 
             logger.info("Creation report {} saved to DB", report.id)
 
+        if scan_record:
+            scan_record.organizations_scanned += 1
+            scan_record.save()
+
 
 def scan_pcc_activations(scan_record_id: int):
     """
@@ -452,7 +447,7 @@ def scan_pcc_activations(scan_record_id: int):
     scan_record = m.PCCActivationsScan.query.get(scan_record_id)
 
     try:
-        create_new_creation_reports()
+        create_new_creation_reports(scan_record)
     except Exception as e:
         logger.error("Can't generate new creation report. Reason: {}", e)
         scan_record.status = m.ScanStatus.FAILED
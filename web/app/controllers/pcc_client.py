@@ -0,0 +1,242 @@
+import random
+import threading
+import time
+
+import requests
+from flask import has_request_context
+from requests.adapters import HTTPAdapter
+
+from app.logger import logger
+from config import BaseConfig as CFG
+
+
+class SpikeArrestError(Exception):
+    pass
+
+
+class PCCRateLimitedError(SpikeArrestError):
+    """The request would wait for the rate limits longer than allowed"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"PCC API is rate limited. Retry in {retry_after:.1f} s")
+        self.retry_after = retry_after
+
+
+# Responses of PCC API which are retried (SpikeArrest and temporary unavailability)
+RETRY_STATUS_CODES = (429, 503)
+
+
+class TokenBucket:
+    """Token bucket: `capacity` requests at once, then `rate` requests per second"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def wait_time(self, now: float) -> float:
+        """Seconds to wait before the next token is available (nothing is taken)"""
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def reserve(self, now: float) -> float:
+        """Take one token (in advance if the bucket is empty)
+
+        Returns:
+            float: seconds to wait before the reserved token is available
+        """
+        wait = self.wait_time(now)
+        self.tokens -= 1
+        return wait
+
+
+class PCCRateLimiter:
+    """Client side limits of PCC API requests (in the process).
+
+    Requests are spaced by the SpikeArrest interval (20 ms) and are spread over the
+    minute quota, so PCC API is not asked more often than it allows instead of
+    sleeping after the 429 errors. The daily quota is checked by the caller
+    (see check_daily_requests_count).
+    """
+
+    def __init__(self, interval: float = 0.02, minute_quota: int = 1000):
+        self._lock = threading.Lock()
+        self._spike_arrest = TokenBucket(1 / interval, 1)
+        self._minute_quota = TokenBucket(minute_quota / 60, minute_quota)
+        self._paused_till = 0.0
+
+    def acquire(self, timeout: float | None = None) -> float:
+        """Wait till the request is allowed
+
+        Args:
+            timeout (float | None, optional): max seconds to wait. Defaults to None
+                (wait as long as the limits require).
+
+        Raises:
+            PCCRateLimitedError: the request would wait longer than timeout (nothing
+                is reserved then)
+
+        Returns:
+            float: seconds spent waiting
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = max(
+                self._spike_arrest.wait_time(now),
+                self._minute_quota.wait_time(now),
+                self._paused_till - now,
+            )
+            if timeout is not None and wait > timeout:
+                raise PCCRateLimitedError(wait)
+            self._spike_arrest.reserve(now)
+            self._minute_quota.reserve(now)
+        if wait > 0:
+            time.sleep(wait)
+        return max(wait, 0.0)
+
+    def pause(self, seconds: float):
+        """Hold all the requests (PCC API reported that the quota is exhausted)"""
+        with self._lock:
+            self._paused_till = max(self._paused_till, time.monotonic() + seconds)
+
+
+class PCCClient:
+    """HTTP client of PCC API.
+
+    All the requests go through one requests.Session, so the pooled connections
+    (and their mutual TLS sessions) are reused instead of the new TLS handshake on
+    every call. Requests are throttled by PCCRateLimiter and the SpikeArrest /
+    unavailability errors and connection errors are retried with jittered
+    exponential backoff. Requests of the web requests (agents, users) wait for the
+    rate limits at most PCC_RATE_LIMIT_WAIT seconds and fail with
+    PCCRateLimitedError instead of holding the worker.
+    """
+
+    def __init__(self):
+        self.pool_size = 10
+        self.max_retries = 3
+        # Base delay (seconds) of the retries: backoff * 2^attempt * (0.5..1.5)
+        self.retry_backoff = 0.4
+        self.timeout = 60
+        self.rate_limit_wait = 5.0
+        self.limiter = PCCRateLimiter()
+
+        self._session: requests.Session | None = None
+        self._lock = threading.Lock()
+        self.counters = dict(requests=0, retries=0, throttled=0, errors=0)
+
+    def init_app(self, app):
+        self.pool_size = app.config["PCC_POOL_SIZE"]
+        self.max_retries = app.config["PCC_MAX_RETRIES"]
+        self.retry_backoff = app.config["PCC_RETRY_BACKOFF"]
+        self.timeout = app.config["PCC_REQUEST_TIMEOUT"]
+        self.rate_limit_wait = app.config["PCC_RATE_LIMIT_WAIT"]
+        self.limiter = PCCRateLimiter(
+            app.config["PCC_SPIKE_ARREST_INTERVAL"],
+            app.config["PCC_MINUTE_QUOTA_LIMIT"],
+        )
+        self.close()
+
+    @property
+    def session(self) -> requests.Session:
+        """Session with the pool of mutual TLS connections to PCC API"""
+        with self._lock:
+            if not self._session:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=self.pool_size, pool_maxsize=self.pool_size
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.cert = (CFG.CERTIFICATE_PATH, CFG.PRIVATEKEY_PATH)
+                self._session = session
+            return self._session
+
+    def close(self):
+        """Close the pooled connections"""
+        with self._lock:
+            if self._session:
+                self._session.close()
+                self._session = None
+
+    def stats(self) -> dict:
+        """Counters of the requests (requests, retries, throttled, errors)"""
+        with self._lock:
+            return dict(self.counters)
+
+    def _count(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def _backoff(self, attempt: int) -> float:
+        return self.retry_backoff * 2**attempt * random.uniform(0.5, 1.5)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Execute PCC API request with the rate limits and retries
+
+        Args:
+            method (str): HTTP method
+            url (str): PCC API url
+            kwargs: arguments of requests.Session.request
+
+        Raises:
+            SpikeArrestError: minute quota is exhausted or retries are exceeded
+            PCCRateLimitedError: rate limits hold the request of the web request
+                longer than PCC_RATE_LIMIT_WAIT
+
+        Returns:
+            requests.Response: response of PCC API (errors are not raised)
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        # Background jobs (scanning) wait for the limits, web requests don't
+        wait_timeout = self.rate_limit_wait if has_request_context() else None
+
+        for attempt in range(self.max_retries + 1):
+            if self.limiter.acquire(wait_timeout):
+                self._count("throttled")
+            self._count("requests")
+
+            try:
+                res = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._count("errors")
+                if attempt == self.max_retries:
+                    raise e
+                logger.warning("PCC API request failed. Reason: {}. Retrying", e)
+                self._count("retries")
+                time.sleep(self._backoff(attempt))
+                continue
+
+            if res.status_code not in RETRY_STATUS_CODES:
+                return res
+
+            self._count("errors")
+            # Minute quota is exhausted - hold all the requests and fail this one
+            if res.headers.get("X-Quota-Minute-Remaining") == "0":
+                self.limiter.pause(60)
+                raise SpikeArrestError(
+                    "SpikeArrest error (minute quota). Retry in 1 minute"
+                )
+            if attempt == self.max_retries:
+                raise SpikeArrestError(
+                    "SpikeArrest error (too high frequency of requests)"
+                )
+            logger.warning(
+                "PCC API responded {}. Retry {}", res.status_code, attempt + 1
+            )
+            self._count("retries")
+            res.close()
+            time.sleep(self._backoff(attempt))
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+
+pcc_client = PCCClient()
@@ -0,0 +1,257 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urljoin
+
+import redis
+from pydantic import ValidationError
+from requests.exceptions import HTTPError
+
+from app import models as m
+from app import schema as s
+from app.controllers.pcc_client import SpikeArrestError, pcc_client
+from app.logger import logger
+from app.utils import get_base64_string
+from config import BaseConfig as CFG
+
+
+def request_pcc_2_legged_token() -> s.TwoLeggedAuthResult:
+    """Request the new 2-legged access token from PCC API
+
+    Returns:
+        s.TwoLeggedAuthResult: access token and its lifetime (seconds)
+    """
+    server_path = os.path.join("auth", "token")
+    url = urljoin(CFG.PCC_BASE_URL, server_path)
+    base64_secret = get_base64_string(f"{CFG.PCC_CLIENT_ID}:{CFG.PCC_CLIENT_SECRET}")
+
+    try:
+        response = pcc_client.post(
+            url,
+            headers={
+                "Authorization": f"Basic {base64_secret}",
+                "Content-Type": "application/x-www-form-urlencoded",
+            },
+            data={"grant_type": "client_credentials"},
+        )
+        response.raise_for_status()
+
+        return s.TwoLeggedAuthResult.parse_obj(response.json())
+    except (ValidationError, HTTPError, SpikeArrestError) as e:
+        logger.error("Can't get PCC API access token. Reason: {}", e)
+        raise e
+
+
+class PCCTokenManager:
+    """Cache of the PCC API 2-legged access token.
+
+    The token is looked up in the process memory, then in Redis (shared by all the
+    app and worker processes) and in the database (pcc_access_tokens), so PCC API
+    is asked for the new token only when the cached one expires.
+
+    The token is refreshed PCC_TOKEN_REFRESH_MARGIN seconds before its expiration by
+    one caller (single-flight: in-process lock and Redis lock across the processes),
+    the rest of the callers keep using the current token while it is valid.
+    Without Redis the refresh is single-flight only inside the process.
+    """
+
+    REDIS_KEY = "pcc:access_token"
+    REDIS_LOCK_KEY = "pcc:access_token:refresh"
+
+    def __init__(self):
+        self.redis: redis.Redis | None = None
+        # Token is refreshed when it expires sooner than this (seconds)
+        self.refresh_margin = 300
+        # Token which expires sooner than this (seconds) is never returned
+        self.min_validity = 60
+        # Max time (seconds) to wait for the refresh by another caller
+        self.refresh_timeout = 30
+
+        self._token: str | None = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._redis_lock: redis.lock.Lock | None = None
+        self.counters = dict(
+            hits=0, shared_hits=0, misses=0, refreshes=0, refresh_errors=0
+        )
+
+    def init_app(self, app):
+        redis_url = app.config["REDIS_URL"]
+        self.redis = redis.Redis.from_url(redis_url) if redis_url else None
+        self.refresh_margin = app.config["PCC_TOKEN_REFRESH_MARGIN"]
+        self.min_validity = app.config["PCC_TOKEN_MIN_VALIDITY"]
+        self.refresh_timeout = app.config["PCC_TOKEN_REFRESH_TIMEOUT"]
+
+    def stats(self) -> dict:
+        """Counters of the token lookups (hits, shared_hits, misses, refreshes...)"""
+        with self._lock:
+            return dict(self.counters)
+
+    def clear(self):
+        """Forget the token cached in the process memory"""
+        with self._lock:
+            self._token = None
+            self._expires_at = 0.0
+
+    def get_token(self) -> str:
+        """Valid PCC API 2-legged access token
+
+        Returns:
+            str: PCC API 2-legged access token
+        """
+        token, expires_at = self._cached_token()
+        time_left = expires_at - time.time()
+
+        if token and time_left > self.refresh_margin:
+            return token
+
+        # Token expires soon: only one caller refreshes it, the rest use it meanwhile
+        if token and time_left > self.min_validity:
+            if self._acquire_refresh(blocking=False):
+                try:
+                    return self._refresh(fallback_token=token)
+                finally:
+                    self._release_refresh()
+            return token
+
+        # No valid token: wait for the token refreshed by another caller or refresh it
+        self._count("misses")
+        acquired = self._acquire_refresh(blocking=True)
+        try:
+            token, expires_at = self._cached_token(count=False)
+            if token and expires_at - time.time() > self.min_validity:
+                return token
+            return self._refresh()
+        finally:
+            if acquired:
+                self._release_refresh()
+
+    def _count(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def _cached_token(self, count: bool = True) -> tuple[str | None, float]:
+        """Token from the process memory or (if it expires soon) from shared storage"""
+        with self._lock:
+            token, expires_at = self._token, self._expires_at
+        if token and expires_at - time.time() > self.refresh_margin:
+            if count:
+                self._count("hits")
+            return token, expires_at
+
+        shared_token, shared_expires_at = self._shared_token()
+        if shared_token and shared_expires_at > expires_at:
+            if count:
+                self._count("shared_hits")
+            self._remember(shared_token, shared_expires_at)
+            return shared_token, shared_expires_at
+
+        return token, expires_at
+
+    def _remember(self, token: str, expires_at: float):
+        with self._lock:
+            self._token, self._expires_at = token, expires_at
+
+    def _shared_token(self) -> tuple[str | None, float]:
+        if self.redis:
+            try:
+                cached = self.redis.get(self.REDIS_KEY)
+                if cached:
+                    cached = json.loads(cached)
+                    return cached["token"], cached["expires_at"]
+            except redis.RedisError as e:
+                logger.warning("Can't read PCC API token from Redis. Reason: {}", e)
+
+        token: m.PCCAccessToken | None = m.PCCAccessToken.query.first()
+        if not token:
+            return None, 0.0
+
+        expires_at = token.created_at + timedelta(seconds=token.expires_in)
+        return token.token, (expires_at - datetime(1970, 1, 1)).total_seconds()
+
+    def _refresh(self, fallback_token: str | None = None) -> str:
+        """Request the new token and save it to all the caches"""
+        try:
+            access_token_info = request_pcc_2_legged_token()
+        except Exception as e:
+            self._count("refresh_errors")
+            # Token which is still valid is used until the next refresh attempt
+            if fallback_token:
+                logger.warning("PCC API token refresh failed. Reason: {}", e)
+                return fallback_token
+            raise e
+
+        self._count("refreshes")
+        created_at = datetime.utcnow()
+        expires_at = time.time() + access_token_info.expires_in
+        self._remember(access_token_info.access_token, expires_at)
+
+        if self.redis:
+            try:
+                self.redis.set(
+                    self.REDIS_KEY,
+                    json.dumps(
+                        dict(
+                            token=access_token_info.access_token,
+                            expires_at=expires_at,
+                        )
+                    ),
+                    ex=access_token_info.expires_in,
+                )
+            except redis.RedisError as e:
+                logger.warning("Can't save PCC API token to Redis. Reason: {}", e)
+
+        token: m.PCCAccessToken | None = m.PCCAccessToken.query.first()
+        if not token:
+            token = m.PCCAccessToken()
+        token.token = access_token_info.access_token
+        token.expires_in = access_token_info.expires_in
+        token.created_at = created_at
+        token.save()
+
+        logger.info(
+            "PCC API token refreshed, valid till: {}",
+            created_at + timedelta(seconds=access_token_info.expires_in),
+        )
+        return access_token_info.access_token
+
+    def _acquire_refresh(self, blocking: bool) -> bool:
+        if not self._refresh_lock.acquire(
+            blocking=blocking, timeout=self.refresh_timeout if blocking else -1
+        ):
+            return False
+        if not self.redis:
+            return True
+
+        try:
+            self._redis_lock = self.redis.lock(
+                self.REDIS_LOCK_KEY, timeout=self.refresh_timeout
+            )
+            if self._redis_lock.acquire(
+                blocking=blocking, blocking_timeout=self.refresh_timeout
+            ):
+                return True
+        except redis.RedisError as e:
+            # Refresh is still single-flight inside the process
+            logger.warning("Can't lock PCC API token refresh. Reason: {}", e)
+            self._redis_lock = None
+            return True
+
+        self._redis_lock = None
+        self._refresh_lock.release()
+        return False
+
+    def _release_refresh(self):
+        if self.redis and self._redis_lock:
+            try:
+                self._redis_lock.release()
+            except redis.RedisError as e:
+                logger.warning("Can't unlock PCC API token refresh. Reason: {}", e)
+            self._redis_lock = None
+        self._refresh_lock.release()
+
+
+pcc_token_manager = PCCTokenManager()
@@ -1,5 +1,9 @@
-from datetime import datetime, timedelta
+import time
 
+from sqlalchemy import and_, bindparam, func, select, update
+
+from app import db
+from app.controllers.computer_status import update_computers_status
 from app.logger import logger
 from app.models import (
     Company,
@@ -9,68 +13,158 @@ from app.models import (
     Location,
     LocationStatus,
 )
-from config import BaseConfig as CFG
 
 
-def update_companies_locations_statistic():
+def _computers_counters(group_column) -> dict[int, dict]:
+    """Count activated, online and online primary computers grouped by company or location
+
+    Args:
+        group_column: Computer.company_id or Computer.location_id
+
+    Returns:
+        dict[int, dict]: counters by company/location id
+    """
+    is_online = and_(
+        Computer.activated.is_(True),
+        Computer.computer_status == ComputerStatus.ONLINE,
+    )
+
+    rows = db.session.execute(
+        select(
+            group_column,
+            func.count().filter(Computer.activated.is_(True)),
+            func.count().filter(is_online),
+            func.count().filter(
+                and_(is_online, Computer.device_role == DeviceRole.PRIMARY)
+            ),
+        )
+        .where(Computer.is_deleted.is_(False), group_column.is_not(None))
+        .group_by(group_column)
+    ).all()
+
+    return {
+        row[0]: dict(total=row[1], online=row[2], online_primary=row[3])
+        for row in rows
+    }
+
+
+def _bulk_update(table, rows: list[dict]):
+    """Update rows of the table (by id) with one executemany UPDATE"""
+    if not rows:
+        return
+
+    columns = [column for column in rows[0] if column != "id"]
+    db.session.execute(
+        update(table)
+        .where(table.c.id == bindparam("_id"))
+        .values({column: bindparam(f"_{column}") for column in columns}),
+        [{f"_{key}": value for key, value in row.items()} for row in rows],
+    )
+
+
+def update_companies_locations_statistic() -> dict:
+    """Update counters of Companies and Locations and status of Locations
+
+    All counters are calculated with a few GROUP BY queries and only changed rows
+    are written (executemany UPDATE) in one transaction.
+
+    Returns:
+        dict: report of the run (rows scanned/updated and elapsed time)
+    """
     logger.info("<-----Start Updating Companies and Locations statistics----->")
-
-    current_east_time = CFG.offset_to_est(datetime.utcnow(), True)
-
-    # NOTE Update number of Locations and Computers in Companies
-    companies = Company.query.all()
-
+    start_time = time.perf_counter()
+
+    # Statistic is based on stored computers statuses - make them actual first
+    update_computers_status()
+
+    # NOTE Number of Locations and Computers in Companies
+    locations_per_company = dict(
+        db.session.execute(
+            select(Location.company_id, func.count())
+            .where(Location.is_deleted.is_(False))
+            .group_by(Location.company_id)
+        ).all()
+    )
+    company_computers = _computers_counters(Computer.company_id)
+
+    companies = db.session.execute(
+        select(
+            Company.id,
+            Company.locations_per_company,
+            Company.total_computers,
+            Company.computers_online,
+            Company.computers_offline,
+        ).where(Company.is_deleted.is_(False))
+    ).all()
+
+    changed_companies = []
     for company in companies:
-        company.locations_per_company = len(company.locations)
-        company.total_computers = company.total_computers_counter
-
-        offline_company_computers = company.total_offline_computers
-        online_company_computers = Computer.query.filter(
-            Computer.company_id == company.id,
-            Computer.status == ComputerStatus.ONLINE.value,
-        ).count()
-
-        company.computers_online = online_company_computers
-        company.computers_offline = offline_company_computers
-
-        company.update()
-
-    # NOTE Update number of Computers in Locations and status of Locations
-    locations = Location.query.all()
-
+        counters = company_computers.get(company.id, dict(total=0, online=0))
+        new_values = dict(
+            id=company.id,
+            locations_per_company=locations_per_company.get(company.id, 0),
+            total_computers=counters["total"],
+            computers_online=counters["online"],
+            computers_offline=counters["total"] - counters["online"],
+        )
+        if tuple(new_values.values()) != tuple(company):
+            changed_companies.append(new_values)
+
+    # NOTE Number of Computers in Locations and status of Locations
+    location_computers = _computers_counters(Computer.location_id)
+
+    locations = db.session.execute(
+        select(
+            Location.id,
+            Location.computers_per_location,
+            Location.computers_online,
+            Location.computers_offline,
+            Location.status,
+            Location.activated,
+        ).where(Location.is_deleted.is_(False))
+    ).all()
+
+    changed_locations = []
     for location in locations:
-        location.computers_per_location = location.total_computers
-
-        online_location_computers = Computer.query.filter(
-            Computer.location_id == location.id,
-            Computer.activated.is_(True),
-            Computer.last_download_time.is_not(None),
-            Computer.last_download_time
-            >= current_east_time - timedelta(hours=1, minutes=30),
-        ).count()
-        online_primary_computers = Computer.query.filter(
-            Computer.location_id == location.id,
-            Computer.activated.is_(True),
-            Computer.device_role == DeviceRole.PRIMARY.value,
-            Computer.last_download_time.is_not(None),
-            Computer.last_download_time
-            >= current_east_time - timedelta(hours=1, minutes=30),
-        ).count()
-
-        offline_location_computers = location.total_computers_offline
-
-        location.computers_online = online_location_computers
-        location.computers_offline = offline_location_computers
+        counters = location_computers.get(
+            location.id, dict(total=0, online=0, online_primary=0)
+        )
 
         if not location.activated:
-            location.status = None
-        elif online_primary_computers:
-            location.status = LocationStatus.ONLINE
-        elif online_location_computers:
-            location.status = LocationStatus.ONLINE_PRIMARY_OFFLINE
+            status = None
+        elif counters["online_primary"]:
+            status = LocationStatus.ONLINE
+        elif counters["online"]:
+            status = LocationStatus.ONLINE_PRIMARY_OFFLINE
         else:
-            location.status = LocationStatus.OFFLINE
-
-        location.update()
-
-    logger.info("<-----Finish Updating Companies and Locations statistics----->")
+            status = LocationStatus.OFFLINE
+
+        new_values = dict(
+            id=location.id,
+            computers_per_location=counters["total"],
+            computers_online=counters["online"],
+            computers_offline=counters["total"] - counters["online"],
+            status=status,
+        )
+        if tuple(new_values.values()) != tuple(location)[:-1]:
+            changed_locations.append(new_values)
+
+    _bulk_update(Company.__table__, changed_companies)
+    _bulk_update(Location.__table__, changed_locations)
+    db.session.commit()
+
+    report = dict(
+        companies=len(companies),
+        companies_updated=len(changed_companies),
+        locations=len(locations),
+        locations_updated=len(changed_locations),
+        elapsed=round(time.perf_counter() - start_time, 3),
+    )
+    logger.info(
+        "<-----Finish Updating Companies and Locations statistics----->: "
+        "companies {companies} (updated {companies_updated}), "
+        "locations {locations} (updated {locations_updated}), {elapsed} sec",
+        **report,
+    )
+
+    return report
@@ -0,0 +1,176 @@
+from itertools import chain
+
+from sqlalchemy import event, func, inspect, or_, select, true
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app import db
+from app import models as m
+
+# Settings used when neither the computer, location, company nor global settings exist
+GLOBAL_TELEMETRY_SETTINGS_ID = 1
+TELEMETRY_SETTINGS_COLUMNS = ("send_printer_info", "send_agent_logs")
+
+
+def linked_settings_id(link_table, column, value):
+    """Telemetry settings id of the first link of the computer, location or company"""
+    return (
+        select(link_table.c.telemetry_settings_id)
+        .where(
+            link_table.c[column] == value,
+            link_table.c.telemetry_settings_id.isnot(None),
+        )
+        .order_by(link_table.c.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+def update_effective_telemetry_settings(connection: Connection, where_clause):
+    """Resolve telemetry settings of the computers in one INSERT ... SELECT
+
+    Computer settings win over the location ones, location over the company ones and
+    company over the global settings.
+
+    Args:
+        connection (Connection): connection of the current transaction
+        where_clause: condition on computers table of the computers to update
+    """
+    computers = m.Computer.__table__.c
+    resolved = (
+        select(
+            computers.id.label("computer_id"),
+            func.coalesce(
+                linked_settings_id(
+                    m.ComputerSettingsLinkTable.__table__, "computer_id", computers.id
+                ),
+                linked_settings_id(
+                    m.LocationSettingsLinkTable.__table__,
+                    "location_id",
+                    computers.location_id,
+                ),
+                linked_settings_id(
+                    m.CompanySettingsLinkTable.__table__,
+                    "company_id",
+                    computers.company_id,
+                ),
+                GLOBAL_TELEMETRY_SETTINGS_ID,
+            ).label("telemetry_settings_id"),
+        )
+        .where(where_clause)
+        .subquery()
+    )
+    settings = m.TelemetrySettings.__table__.c
+    rows = select(
+        resolved.c.computer_id,
+        resolved.c.telemetry_settings_id,
+        func.coalesce(settings.send_printer_info, true()),
+        func.coalesce(settings.send_agent_logs, true()),
+    ).select_from(
+        resolved.outerjoin(
+            m.TelemetrySettings.__table__,
+            settings.id == resolved.c.telemetry_settings_id,
+        )
+    )
+    # NOTE SQLite needs WHERE in INSERT ... SELECT ... ON CONFLICT
+    rows = rows.where(true())
+
+    table = m.ComputerTelemetrySettings.__table__
+    if connection.dialect.name == "postgresql":
+        upsert = postgresql.insert(table)
+    else:
+        upsert = sqlite.insert(table)
+    connection.execute(
+        upsert.from_select(
+            ["computer_id", "telemetry_settings_id", *TELEMETRY_SETTINGS_COLUMNS], rows
+        ).on_conflict_do_update(
+            index_elements=[table.c.computer_id],
+            set_=dict(
+                telemetry_settings_id=upsert.excluded.telemetry_settings_id,
+                send_printer_info=upsert.excluded.send_printer_info,
+                send_agent_logs=upsert.excluded.send_agent_logs,
+            ),
+        )
+    )
+
+
+def get_effective_telemetry_settings(
+    computer: m.Computer,
+) -> m.ComputerTelemetrySettings:
+    """Telemetry settings of the computer (single primary key read)
+
+    Args:
+        computer (m.Computer): computer
+
+    Returns:
+        m.ComputerTelemetrySettings: effective settings
+    """
+    settings = db.session.get(m.ComputerTelemetrySettings, computer.id)
+    if settings:
+        return settings
+
+    # Computers registered before the settings were resolved
+    update_effective_telemetry_settings(
+        db.session.connection(), m.Computer.id == computer.id
+    )
+    db.session.commit()
+    return db.session.get(m.ComputerTelemetrySettings, computer.id)
+
+
+def changed_ids(obj, column: str) -> set[int]:
+    """Current and previous values of the foreign key"""
+    history = inspect(obj).attrs[column].history
+    return {
+        value
+        for value in chain([getattr(obj, column)], history.deleted)
+        if value is not None
+    }
+
+
+# NOTE settings are recomputed in the same transaction as the changes of their levels
+@event.listens_for(Session, "after_flush")
+def recompute_effective_telemetry_settings(session: Session, flush_context):
+    computer_ids: set[int] = set()
+    location_ids: set[int] = set()
+    company_ids: set[int] = set()
+    settings_ids: set[int] = set()
+
+    for obj in chain(session.new, session.dirty, session.deleted):
+        match obj:
+            case m.Computer() if obj in session.new:
+                computer_ids.add(obj.id)
+            case m.Computer() if obj not in session.deleted:
+                state = inspect(obj)
+                if any(
+                    state.attrs[column].history.has_changes()
+                    for column in ("location_id", "company_id")
+                ):
+                    computer_ids.add(obj.id)
+            case m.ComputerSettingsLinkTable():
+                computer_ids.update(changed_ids(obj, "computer_id"))
+            case m.LocationSettingsLinkTable():
+                location_ids.update(changed_ids(obj, "location_id"))
+            case m.CompanySettingsLinkTable():
+                company_ids.update(changed_ids(obj, "company_id"))
+            case m.TelemetrySettings():
+                settings_ids.add(obj.id)
+
+    if not (computer_ids or location_ids or company_ids or settings_ids):
+        return
+
+    computers = m.Computer.__table__.c
+    effective = m.ComputerTelemetrySettings.__table__.c
+    update_effective_telemetry_settings(
+        session.connection(),
+        or_(
+            computers.id.in_(computer_ids),
+            computers.location_id.in_(location_ids),
+            computers.company_id.in_(company_ids),
+            computers.id.in_(
+                select(effective.computer_id).where(
+                    effective.telemetry_settings_id.in_(settings_ids)
+                )
+            ),
+        ),
+    )
@@ -12,12 +12,17 @@ from .utils import count
 from .system_log import SystemLog, SystemLogType
 from .pcc_creation_report import PCCCreationReport, CreationReportStatus
 from .pcc_activations_scan import PCCActivationsScan, ScanStatus
+from .billing_report_job import BillingReportJob, ReportJobStatus
 from .pcc_daily_request import PCCDailyRequest
 from .location_group import LocationGroup, LocationGroupView
 from .download_backup_call import DownloadBackupCall
 from .alert_event import AlertEvent, AlertEventType
+from .billing_rollup import DownloadBackupCallDaily, AlertEventDaily
 from .telemetry_settings import TelemetrySettings
 from .computer_settings_link_table import ComputerSettingsLinkTable
 from .location_settings_link_table import LocationSettingsLinkTable
 from .company_settings_link_table import CompanySettingsLinkTable
 from .additional_location import AdditionalLocation
+from .computer_uptime import ComputerUptime
+from .computer_config import ComputerConfig
+from .computer_telemetry_settings import ComputerTelemetrySettings
@@ -17,6 +17,13 @@ class BackupLogType(enum.Enum):
 class BackupLog(db.Model, ModelMixin):
     __tablename__ = "backup_logs"
 
+    # NOTE In PostgreSQL the table is partitioned by month of end_time
+    # (primary key is (id, end_time)), see app/controllers/log_partitions.py
+    __table_args__ = (
+        db.Index("ix_backup_logs_computer_id_start_time", "computer_id", "start_time"),
+        db.Index("ix_backup_logs_computer_id_end_time", "computer_id", "end_time"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
 
     computer_id = db.Column(db.Integer, db.ForeignKey("computers.id"))
@@ -0,0 +1,60 @@
+import enum
+from datetime import datetime
+
+from sqlalchemy import Enum
+
+from app import db
+from app.models.utils import ModelMixin
+
+
+class ReportJobStatus(enum.Enum):
+    IN_PROGRESS = "IN PROGRESS"
+    SUCCEED = "SUCCEED"
+    FAILED = "FAILED"
+
+
+class BillingReportJob(db.Model, ModelMixin):
+    """Billing report generated by the worker.
+
+    Job is identified by its scope (company or all the companies for general report)
+    and the reported period. Report file of the succeed job is kept in the artifacts
+    store (BILLING_REPORTS_DIR) and reused while the period is closed.
+    """
+
+    __tablename__ = "billing_report_jobs"
+
+    __table_args__ = (
+        db.Index(
+            "ix_billing_report_jobs_scope",
+            "company_id",
+            "from_date",
+            "to_date",
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # None for the general billing report
+    company_id = db.Column(db.Integer, db.ForeignKey("companies.id"), nullable=True)
+    # Reported period (EST)
+    from_date = db.Column(db.DateTime, nullable=False)
+    to_date = db.Column(db.DateTime, nullable=False)
+    # Period was over when the report was requested: report will never change
+    period_closed = db.Column(db.Boolean, default=False, nullable=False)
+
+    status = db.Column(Enum(ReportJobStatus), nullable=False)
+    file_name = db.Column(db.String(128))
+    error = db.Column(db.Text)
+
+    created_at = db.Column(
+        db.DateTime,
+        default=datetime.utcnow,
+        server_default=db.func.now(),
+        nullable=False,
+    )
+    finished_at = db.Column(db.DateTime)
+
+    company = db.relationship("Company", passive_deletes=True, lazy="select")
+
+    def __repr__(self):
+        return f"<Billing report job ID: {self.id}. Status: {self.status.value}>"
@@ -0,0 +1,212 @@
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import Integer, cast, event, func, insert, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from zoneinfo import ZoneInfo
+
+from app import db
+from app.models.alert_event import AlertEvent
+from app.models.download_backup_call import DownloadBackupCall
+
+
+class DownloadBackupCallDaily(db.Model):
+    """Number of PCC API download backup calls of the computer per day (UTC)"""
+
+    __tablename__ = "download_backup_calls_daily"
+
+    computer_id = db.Column(
+        db.Integer, db.ForeignKey("computers.id"), primary_key=True
+    )
+    day = db.Column(db.Date, primary_key=True, index=True)
+    calls = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<Computer {self.computer_id} PCC API calls {self.day}: {self.calls}>"
+
+
+class AlertEventDaily(db.Model):
+    """Number of alert events of the location per day (UTC)"""
+
+    __tablename__ = "alert_events_daily"
+
+    location_id = db.Column(
+        db.Integer, db.ForeignKey("locations.id"), primary_key=True
+    )
+    day = db.Column(db.Date, primary_key=True, index=True)
+    alerts = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<Location {self.location_id} alert events {self.day}: {self.alerts}>"
+
+
+class BillingRollup:
+    """Raw events table and its daily rollup table"""
+
+    def __init__(self, raw_table, raw_key: str, rollup_table, counter: str):
+        self.raw_table = raw_table
+        self.raw_key = raw_table.c[raw_key]
+        self.raw_time = raw_table.c.created_at
+        self.rollup_table = rollup_table
+        self.rollup_key = rollup_table.c[raw_key]
+        self.rollup_day = rollup_table.c.day
+        self.rollup_counter = rollup_table.c[counter]
+
+
+PCC_API_CALLS_ROLLUP = BillingRollup(
+    DownloadBackupCall.__table__,
+    "computer_id",
+    DownloadBackupCallDaily.__table__,
+    "calls",
+)
+ALERT_EVENTS_ROLLUP = BillingRollup(
+    AlertEvent.__table__,
+    "location_id",
+    AlertEventDaily.__table__,
+    "alerts",
+)
+
+
+def to_utc_naive(value: datetime) -> datetime:
+    """Convert datetime to naive UTC (as events are stored), naive is considered UTC"""
+    if value.tzinfo:
+        value = value.astimezone(ZoneInfo("UTC")).replace(tzinfo=None)
+    return value
+
+
+def count_events(
+    rollup: BillingRollup,
+    start_time: datetime,
+    end_time: datetime,
+    keys=None,
+) -> dict[int, int]:
+    """
+    Number of events in the period (including the edges) grouped by computer/location.
+
+    Whole days of the period are summed from the daily rollups, the raw events are
+    counted only for the partial days on the edges of the period.
+
+    Args:
+        rollup (BillingRollup): PCC_API_CALLS_ROLLUP or ALERT_EVENTS_ROLLUP
+        start_time (datetime): start of the period
+        end_time (datetime): end of the period
+        keys (optional): ids (list or select) of computers/locations to count.
+            Defaults to None - all.
+
+    Returns:
+        dict[int, int]: number of events by computer/location id
+    """
+    start_time = to_utc_naive(start_time)
+    end_time = to_utc_naive(end_time)
+
+    # Whole days are [first_day, last_day)
+    first_day = start_time.date()
+    if start_time.time() != time.min:
+        first_day += timedelta(days=1)
+    last_day = end_time.date()
+
+    raw_period = (rollup.raw_time >= start_time) & (rollup.raw_time <= end_time)
+    rollup_query = None
+    if first_day < last_day:
+        first_day_start = datetime.combine(first_day, time.min)
+        last_day_start = datetime.combine(last_day, time.min)
+        raw_period = or_(
+            (rollup.raw_time >= start_time) & (rollup.raw_time < first_day_start),
+            (rollup.raw_time >= last_day_start) & (rollup.raw_time <= end_time),
+        )
+        rollup_query = select(
+            rollup.rollup_key.label("key"), rollup.rollup_counter.label("events")
+        ).where(rollup.rollup_day >= first_day, rollup.rollup_day < last_day)
+        if keys is not None:
+            rollup_query = rollup_query.where(rollup.rollup_key.in_(keys))
+
+    raw_query = (
+        select(rollup.raw_key.label("key"), func.count().label("events"))
+        .where(raw_period)
+        .group_by(rollup.raw_key)
+    )
+    if keys is not None:
+        raw_query = raw_query.where(rollup.raw_key.in_(keys))
+
+    if rollup_query is not None:
+        raw_query = raw_query.union_all(rollup_query)
+    events = raw_query.subquery()
+
+    return dict(
+        db.session.execute(
+            select(events.c.key, cast(func.sum(events.c.events), Integer)).group_by(
+                events.c.key
+            )
+        ).all()
+    )
+
+
+def total_events(
+    rollup: BillingRollup, start_time: datetime, end_time: datetime, keys=None
+) -> int:
+    """Total number of events in the period (see count_events)"""
+    return sum(count_events(rollup, start_time, end_time, keys).values())
+
+
+def increment_rollup(
+    connection, rollup: BillingRollup, key: int, created_at: datetime
+):
+    """Add the new event to the rollup of its day (upsert)"""
+    if connection.dialect.name == "postgresql":
+        upsert = postgresql.insert(rollup.rollup_table)
+    else:
+        upsert = sqlite.insert(rollup.rollup_table)
+
+    connection.execute(
+        upsert.values(
+            {
+                rollup.rollup_key.name: key,
+                rollup.rollup_day.name: created_at.date(),
+                rollup.rollup_counter.name: 1,
+            }
+        ).on_conflict_do_update(
+            index_elements=[rollup.rollup_key, rollup.rollup_day],
+            set_={rollup.rollup_counter.name: rollup.rollup_counter + 1},
+        )
+    )
+
+
+def rebuild_rollups(rollup: BillingRollup, first_day: date, last_day: date) -> int:
+    """
+    Recalculate the rollups of the days [first_day, last_day] from the raw events
+
+    Returns:
+        int: number of rollup rows written
+    """
+    start_time = datetime.combine(first_day, time.min)
+    end_time = datetime.combine(last_day + timedelta(days=1), time.min)
+    day = func.date(rollup.raw_time)
+
+    db.session.execute(
+        rollup.rollup_table.delete().where(
+            rollup.rollup_day >= first_day, rollup.rollup_day <= last_day
+        )
+    )
+    return db.session.execute(
+        insert(rollup.rollup_table).from_select(
+            [rollup.rollup_key, rollup.rollup_day, rollup.rollup_counter],
+            select(rollup.raw_key, day, func.count())
+            .where(rollup.raw_time >= start_time, rollup.raw_time < end_time)
+            .group_by(rollup.raw_key, day),
+        )
+    ).rowcount
+
+
+# NOTE the rollups of the current day are maintained on every new event,
+# the nightly rebuild recalculates closed days (see rollup_billing_events)
+@event.listens_for(DownloadBackupCall, "after_insert")
+def add_pcc_api_call_to_rollup(mapper, connection, target: DownloadBackupCall):
+    increment_rollup(
+        connection, PCC_API_CALLS_ROLLUP, target.computer_id, target.created_at
+    )
+
+
+@event.listens_for(AlertEvent, "after_insert")
+def add_alert_event_to_rollup(mapper, connection, target: AlertEvent):
+    increment_rollup(
+        connection, ALERT_EVENTS_ROLLUP, target.location_id, target.created_at
+    )
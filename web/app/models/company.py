@@ -5,10 +5,9 @@ from flask_admin.babel import gettext
 from flask_admin.contrib.sqla import tools
 from flask_admin.model.template import DeleteRowAction, EditRowAction
 from flask_login import current_user
-from sqlalchemy import and_, func, or_, sql
+from sqlalchemy import and_, func, or_, select, sql
 from sqlalchemy.ext.hybrid import hybrid_method, hybrid_property
 from sqlalchemy.orm import Query, relationship
-from zoneinfo import ZoneInfo
 
 from app import db
 from app.logger import logger
@@ -432,28 +431,13 @@ class Company(db.Model, ModelMixin, SoftDeleteMixin, ActivatedMixin):
         Returns:
             int: total number of PCC API calls
         """
+        from app.models.billing_rollup import PCC_API_CALLS_ROLLUP, total_events
         from app.models.computer import Computer
-        from app.models.download_backup_call import DownloadBackupCall
 
-        # If the start_time and end_time has not UTC timezone, then convert it
-        if start_time.tzinfo and start_time.tzinfo != ZoneInfo("UTC"):
-            start_time = start_time.astimezone(ZoneInfo("UTC"))
+        # All the computers (even deleted ones) of this company
+        computers_ids = select(Computer.id).where(Computer.company_id == self.id)
 
-        if end_time.tzinfo and end_time.tzinfo != ZoneInfo("UTC"):
-            end_time = end_time.astimezone(ZoneInfo("UTC"))
-
-        # Retrieve all the computers (even deleted ones) for this company
-        computers = (
-            Computer.query.with_deleted().filter(Computer.company_id == self.id).all()
-        )
-        computers_ids: list[int] = [comp.id for comp in computers]
-        total_pcc_api_calls: int = DownloadBackupCall.query.filter(
-            DownloadBackupCall.computer_id.in_(computers_ids),
-            DownloadBackupCall.created_at >= start_time,
-            DownloadBackupCall.created_at <= end_time,
-        ).count()
-
-        return total_pcc_api_calls
+        return total_events(PCC_API_CALLS_ROLLUP, start_time, end_time, computers_ids)
 
     @hybrid_method
     def total_alert_events(
@@ -472,28 +456,13 @@ class Company(db.Model, ModelMixin, SoftDeleteMixin, ActivatedMixin):
         Returns:
             int: total number of alert events
         """
-        from app.models.alert_event import AlertEvent
+        from app.models.billing_rollup import ALERT_EVENTS_ROLLUP, total_events
         from app.models.location import Location
 
-        # If the start_time and end_time has not UTC timezone, then convert it
-        if start_time.tzinfo and start_time.tzinfo != ZoneInfo("UTC"):
-            start_time = start_time.astimezone(ZoneInfo("UTC"))
-
-        if end_time.tzinfo and end_time.tzinfo != ZoneInfo("UTC"):
-            end_time = end_time.astimezone(ZoneInfo("UTC"))
-
-        # Retrieve all the company locations (even deleted ones)
-        locations: list[Location] = (
-            Location.query.with_deleted().filter(Location.company_id == self.id).all()
-        )
-        location_ids: list[int] = [location.id for location in locations]
-        total_alert_events: int = AlertEvent.query.filter(
-            AlertEvent.location_id.in_(location_ids),
-            AlertEvent.created_at >= start_time,
-            AlertEvent.created_at <= end_time,
-        ).count()
+        # All the company locations (even deleted ones)
+        location_ids = select(Location.id).where(Location.company_id == self.id)
 
-        return total_alert_events
+        return total_events(ALERT_EVENTS_ROLLUP, start_time, end_time, location_ids)
 
 
 class CompanyView(RowActionListMixin, MyModelView):
@@ -1,4 +1,5 @@
 import enum
+import re
 from copy import copy
 from datetime import datetime, timedelta
 
@@ -7,10 +8,21 @@ from flask_admin.babel import gettext
 from flask_admin.contrib.sqla import tools
 from flask_admin.model.template import DeleteRowAction, EditRowAction
 from flask_login import current_user
-from sqlalchemy import JSON, Enum, and_, case, func, or_, select, sql
-from sqlalchemy.ext.hybrid import hybrid_method, hybrid_property
+from sqlalchemy import (
+    JSON,
+    Enum,
+    and_,
+    case,
+    event,
+    func,
+    or_,
+    select,
+    sql,
+    type_coerce,
+)
+from sqlalchemy.ext.hybrid import Comparator, hybrid_method, hybrid_property
 from sqlalchemy.orm import relationship
-from zoneinfo import ZoneInfo
+from sqlalchemy.sql import operators
 
 from app import db
 from app.logger import logger
@@ -57,6 +69,73 @@ class ComputerStatus(enum.Enum):
     NOT_ACTIVATED = "NOT_ACTIVATED"
 
 
+class StatusComparator(Comparator):
+    """SQL status of the computer with the display text (ONLINE NO BACKUP, ...).
+
+    The display text is selected and sorted, filters by the text are applied to
+    the stored enum column (the statuses which match the text) to use its index.
+    """
+
+    def __init__(self, column):
+        super().__init__(
+            func.replace(type_coerce(column, db.String), "_", " ", type_=db.String)
+        )
+        self.column = column
+
+    @property
+    def type(self):
+        return self.expression.type
+
+    @staticmethod
+    def display_text(status: ComputerStatus) -> str:
+        return status.value.replace("_", " ")
+
+    def matching(self, value, like: bool = False) -> list[ComputerStatus]:
+        """Statuses which display text (or enum) is equal to the value or LIKE it"""
+        if isinstance(value, ComputerStatus):
+            return [value]
+        if like:
+            pattern = re.compile(
+                "".join(
+                    {"%": ".*", "_": "."}.get(char, re.escape(char))
+                    for char in str(value)
+                ),
+                re.IGNORECASE | re.DOTALL,
+            )
+            return [
+                status
+                for status in ComputerStatus
+                if pattern.fullmatch(self.display_text(status))
+            ]
+        return [
+            status
+            for status in ComputerStatus
+            if value in (self.display_text(status), status.value)
+        ]
+
+    def operate(self, op, *other, **kwargs):
+        if op in (operators.eq, operators.ne) and other[0] is None:
+            return op(self.column, None)
+        if op is operators.eq:
+            return self.column.in_(self.matching(other[0]))
+        if op is operators.ne:
+            return self.column.not_in(self.matching(other[0]))
+        if op in (operators.in_op, operators.not_in_op):
+            statuses = [status for value in other[0] for status in self.matching(value)]
+            return op(self.column, statuses)
+        if op in (operators.ilike_op, operators.like_op):
+            return self.column.in_(self.matching(other[0], like=True))
+        if op in (operators.not_ilike_op, operators.not_like_op):
+            return self.column.not_in(self.matching(other[0], like=True))
+        return op(self.expression, *other, **kwargs)
+
+
+# Computer is ONLINE if it downloaded backup during this period
+STATUS_ONLINE_PERIOD = timedelta(hours=1, minutes=30)
+# Computer is ONLINE_NO_BACKUP if it sent heartbeat during this period
+STATUS_ONLINE_NO_BACKUP_PERIOD = timedelta(minutes=10)
+
+
 class PrinterStatus(enum.Enum):
     NORMAL = "NORMAL"
     OFFLINE = "OFFLINE"
@@ -69,9 +148,20 @@ class Computer(db.Model, ModelMixin, SoftDeleteMixin, ActivatedMixin):
     # NOTE this is needed to filter soft deleted records
     query_class = QueryWithSoftDelete
 
+    __table_args__ = (
+        # Offline computers of the company (summaries, alerts)
+        db.Index(
+            "ix_computers_company_id_last_download_time",
+            "company_id",
+            "last_download_time",
+        ),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
 
-    location_id = db.Column(db.Integer, db.ForeignKey("locations.id"), nullable=True)
+    location_id = db.Column(
+        db.Integer, db.ForeignKey("locations.id"), nullable=True, index=True
+    )
     company_id = db.Column(db.Integer, db.ForeignKey("companies.id"), nullable=True)
 
     computer_name = db.Column(db.String(64), unique=True, nullable=False)
@@ -102,7 +192,18 @@ class Computer(db.Model, ModelMixin, SoftDeleteMixin, ActivatedMixin):
     download_status = db.Column(db.String(64))
     last_download_time = db.Column(db.DateTime)
     last_time_online = db.Column(db.DateTime)
-    identifier_key = db.Column(db.String(128), default="new_computer", nullable=False)
+    # NOTE stored as varchar (not native enum) to keep text filters (ilike) of the views working
+    computer_status = db.Column(
+        Enum(ComputerStatus, native_enum=False, length=32),
+        nullable=False,
+        default=ComputerStatus.OFFLINE_NO_BACKUP,
+        server_default=ComputerStatus.OFFLINE_NO_BACKUP.value,
+        index=True,
+    )
+    status_changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    identifier_key = db.Column(
+        db.String(128), default="new_computer", nullable=False, index=True
+    )
 
     manager_host = db.Column(db.String(256), default=CFG.DEFAULT_MANAGER_HOST)
     # Place where backup file was downloaded last time (tempdir)
@@ -284,52 +385,71 @@ class Computer(db.Model, ModelMixin, SoftDeleteMixin, ActivatedMixin):
 
     @hybrid_property
     def status(self) -> ComputerStatus:
-        current_east_time: datetime = CFG.offset_to_est(datetime.utcnow(), True)
+        return self.computer_status
+
+    @status.comparator
+    def status(cls):
+        # NOTE the SQL status keeps the display text of the views, csv export and
+        # saved searches (ONLINE, ONLINE NO BACKUP, NOT ACTIVATED, ...)
+        return StatusComparator(cls.computer_status)
+
+    @staticmethod
+    def calculate_status(
+        activated: bool,
+        last_download_time: datetime | None,
+        last_time_online: datetime | None,
+        current_east_time: datetime | None = None,
+    ) -> ComputerStatus:
+        """Calculate computer status from its activation and last times
+
+        Args:
+            activated (bool): is computer activated
+            last_download_time (datetime | None): last backup download time (EST)
+            last_time_online (datetime | None): last heartbeat time (EST)
+            current_east_time (datetime, optional): current EST time. Defaults to now.
+
+        Returns:
+            ComputerStatus: actual status of the computer
+        """
+        if not current_east_time:
+            current_east_time = CFG.offset_to_est(datetime.utcnow(), True)
 
         # Not activated status
-        if not self.activated:
+        if not activated:
             return ComputerStatus.NOT_ACTIVATED
-        # If computer downloaded backup less than 1 hour ago - it is ONLINE
+        # If computer downloaded backup less than 1.5 hour ago - it is ONLINE
         elif (
-            db.session.query(Computer)
-            .filter(
-                Computer.id == self.id,
-                Computer.last_download_time.is_not(None),
-                Computer.last_download_time
-                >= current_east_time - timedelta(hours=1, minutes=30),
-            )
-            .first()
+            last_download_time
+            and last_download_time >= current_east_time - STATUS_ONLINE_PERIOD
         ):
             return ComputerStatus.ONLINE
-        # If computer downloaded backup more than 1 hour ago but was online less than 10 minutes ago - ONLINE_NO_BACKUP
+        # If computer downloaded backup more than 1.5 hour ago but was online less than
+        # 10 minutes ago - ONLINE_NO_BACKUP
         elif (
-            db.session.query(Computer)
-            .filter(
-                Computer.id == self.id,
-                Computer.last_time_online.is_not(None),
-                Computer.last_time_online >= current_east_time - timedelta(minutes=10),
-            )
-            .first()
+            last_time_online
+            and last_time_online >= current_east_time - STATUS_ONLINE_NO_BACKUP_PERIOD
         ):
             return ComputerStatus.ONLINE_NO_BACKUP
         else:
             return ComputerStatus.OFFLINE_NO_BACKUP
 
-    @status.expression
-    def status(cls):
-        current_east_time: datetime = CFG.offset_to_est(datetime.utcnow(), True)
+    @classmethod
+    def status_case(cls, current_east_time: datetime | None = None):
+        """SQL version of calculate_status (used to refresh stored statuses in bulk)"""
+        if not current_east_time:
+            current_east_time = CFG.offset_to_est(datetime.utcnow(), True)
 
         return case(
             [
                 (
                     cls.activated.is_(False),
-                    ComputerStatus.NOT_ACTIVATED.value.replace("_", " "),
+                    ComputerStatus.NOT_ACTIVATED.value,
                 ),
                 (
                     and_(
                         cls.last_download_time.is_not(None),
                         cls.last_download_time
-                        >= current_east_time - timedelta(hours=1, minutes=30),
+                        >= current_east_time - STATUS_ONLINE_PERIOD,
                     ),
                     ComputerStatus.ONLINE.value,
                 ),
@@ -337,14 +457,35 @@ class Computer(db.Model, ModelMixin, SoftDeleteMixin, ActivatedMixin):
                     and_(
                         cls.last_time_online.is_not(None),
                         cls.last_time_online
-                        >= current_east_time - timedelta(minutes=10),
+                        >= current_east_time - STATUS_ONLINE_NO_BACKUP_PERIOD,
                     ),
-                    ComputerStatus.ONLINE_NO_BACKUP.value.replace("_", " "),
+                    ComputerStatus.ONLINE_NO_BACKUP.value,
                 ),
             ],
-            else_=ComputerStatus.OFFLINE_NO_BACKUP.value.replace("_", " "),
+            else_=ComputerStatus.OFFLINE_NO_BACKUP.value,
+        )
+
+    def refresh_status(self, current_east_time: datetime | None = None) -> bool:
+        """Recalculate stored status of the computer (without commit)
+
+        Returns:
+            bool: True if status was changed
+        """
+        new_status = Computer.calculate_status(
+            # NOTE activated is None for new computer before its column default is applied
+            self.activated is not False,
+            self.last_download_time,
+            self.last_time_online,
+            current_east_time,
         )
 
+        if new_status == self.computer_status:
+            return False
+
+        self.computer_status = new_status
+        self.status_changed_at = datetime.utcnow()
+        return True
+
     @hybrid_property
     def location_status(self):
         return self.location.status if self.location else None
@@ -371,93 +512,39 @@ class Computer(db.Model, ModelMixin, SoftDeleteMixin, ActivatedMixin):
 
     @hybrid_property
     def last_week_offline_occurrences(self) -> int:
-        from app.models.backup_log import BackupLog, BackupLogType
-
         """
         Returns number of occurrences offline in last week
 
         Returns:
             int: number of occurrences
         """
-        current_east_time: datetime = CFG.offset_to_est(datetime.utcnow(), True)
+        from app.models.computer_uptime import last_week_uptime
 
         # If computer backup logs disables - return None
         if not self.logs_enabled:
             return None
 
-        last_log: BackupLog = (
-            BackupLog.query.filter(
-                BackupLog.computer_id == self.id,
-            )
-            .order_by(BackupLog.end_time.desc())
-            .first()
-        )
-
-        # If computer doesn't have any logs or the last one older than 7 days - return 1
-        if not last_log or last_log.end_time < current_east_time - timedelta(days=7):
-            return 1
-
-        last_week_offline_logs: int = BackupLog.query.filter(
-            BackupLog.computer_id == self.id,
-            BackupLog.backup_log_type == BackupLogType.NO_DOWNLOADS_PERIOD,
-            BackupLog.end_time >= current_east_time - timedelta(days=7),
-        ).count()
-
-        return last_week_offline_logs
+        # If computer doesn't have any backup periods during the last week - return 1
+        occurrences, _ = last_week_uptime([self.id])[self.id].offline_stats()
+        return occurrences
 
     @hybrid_property
     def last_week_offline_time(self) -> timedelta:
-        from app.models.backup_log import BackupLog, BackupLogType
-
         """
         Returns summarized offline time during the last week (timedelta object)
 
         Returns:
             timedelta: summarized offline time
         """
-        current_east_time: datetime = CFG.offset_to_est(datetime.utcnow(), True)
+        from app.models.computer_uptime import last_week_uptime
 
         # If computer backup logs disables - return None
         if not self.logs_enabled:
             return None
 
-        last_log: BackupLog = (
-            BackupLog.query.filter(
-                BackupLog.computer_id == self.id,
-            )
-            .order_by(BackupLog.end_time.desc())
-            .first()
-        )
-
-        # If computer doesn't have any logs or the last one older than 7 days - 7 days timedelta
-        if not last_log or last_log.end_time < current_east_time - timedelta(days=7):
-            return timedelta(days=7)
-
-        last_week_offline_logs: list[BackupLog] = (
-            BackupLog.query.filter(
-                BackupLog.computer_id == self.id,
-                BackupLog.backup_log_type == BackupLogType.NO_DOWNLOADS_PERIOD,
-                BackupLog.end_time >= current_east_time - timedelta(days=7),
-            )
-            .order_by(BackupLog.end_time.desc())
-            .all()
-        )
-
-        summarized_offline_time: timedelta = timedelta(seconds=0)
-
-        for log in last_week_offline_logs:
-            # If log is still in progress - end time is current time
-            if log == last_log:
-                log.end_time = current_east_time
-
-            if log.start_time < current_east_time - timedelta(days=7):
-                summarized_offline_time += log.end_time - (
-                    current_east_time - timedelta(days=7)
-                )
-            else:
-                summarized_offline_time += log.duration
-
-        return summarized_offline_time
+        # If computer doesn't have any backup periods during the last week - 7 days
+        _, offline_time = last_week_uptime([self.id])[self.id].offline_stats()
+        return offline_time
 
     @hybrid_method
     def total_pcc_api_calls(
@@ -475,22 +562,16 @@ class Computer(db.Model, ModelMixin, SoftDeleteMixin, ActivatedMixin):
         Returns:
             int: total number of PCC API calls
         """
-        from app.models.download_backup_call import DownloadBackupCall
-
-        # If the start_time and end_time has not UTC timezone, then convert it
-        if start_time.tzinfo and start_time.tzinfo != ZoneInfo("UTC"):
-            start_time = start_time.astimezone(ZoneInfo("UTC"))
+        from app.models.billing_rollup import PCC_API_CALLS_ROLLUP, total_events
 
-        if end_time.tzinfo and end_time.tzinfo != ZoneInfo("UTC"):
-            end_time = end_time.astimezone(ZoneInfo("UTC"))
+        return total_events(PCC_API_CALLS_ROLLUP, start_time, end_time, [self.id])
 
-        total_pcc_api_calls: int = DownloadBackupCall.query.filter(
-            DownloadBackupCall.computer_id == self.id,
-            DownloadBackupCall.created_at >= start_time,
-            DownloadBackupCall.created_at <= end_time,
-        ).count()
 
-        return total_pcc_api_calls
+@event.listens_for(Computer, "before_insert")
+@event.listens_for(Computer, "before_update")
+def refresh_computer_status(mapper, connection, target: Computer):
+    # Keep stored status actual on every ORM change of the computer (heartbeat, activation)
+    target.refresh_status()
 
 
 class ComputerView(RowActionListMixin, MyModelView):
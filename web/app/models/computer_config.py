@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from app import db
+
+
+class ComputerConfig(db.Model):
+    """Configuration document of the computer served to the agent (/get_credentials).
+
+    The document is built once and cleared when the data it is built from changes
+    (see app/controllers/computer_config.py), etag is sha256 of the document.
+    Every clearing increments generation, a document built for the previous
+    generation is not stored.
+    """
+
+    __tablename__ = "computer_configs"
+
+    computer_id = db.Column(
+        db.Integer,
+        db.ForeignKey("computers.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    document = db.Column(db.Text)
+    etag = db.Column(db.String(64))
+    generation = db.Column(db.Integer, default=0, server_default="0", nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<Computer {self.computer_id} config {self.etag}>"
@@ -0,0 +1,23 @@
+from app import db
+
+
+class ComputerTelemetrySettings(db.Model):
+    """Effective telemetry settings of the computer.
+
+    Resolved from the computer, location, company and global (id 1) settings and
+    recomputed when any of them changes (see app/controllers/telemetry_settings.py).
+    """
+
+    __tablename__ = "computer_telemetry_settings"
+
+    computer_id = db.Column(
+        db.Integer,
+        db.ForeignKey("computers.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    telemetry_settings_id = db.Column(db.Integer, nullable=True, index=True)
+    send_printer_info = db.Column(db.Boolean, nullable=False)
+    send_agent_logs = db.Column(db.Boolean, nullable=False)
+
+    def __repr__(self):
+        return f"<Computer {self.computer_id} telemetry {self.telemetry_settings_id}>"
@@ -0,0 +1,357 @@
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import bindparam, event, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+from app.models.backup_log import BackupLog, BackupLogType
+from config import BaseConfig as CFG
+
+HOURS_IN_DAY = 24
+# All the hours of the day
+FULL_DAY = (1 << HOURS_IN_DAY) - 1
+LAST_WEEK_HOURS = 7 * HOURS_IN_DAY
+
+# Notes of the NO_DOWNLOADS_PERIOD logs (see app/controllers/backup_log.py)
+OFFLINE_NOTE = "Device is offline"
+FAILED_NOTE = "Unsuccessful backup"
+
+
+class ComputerUptime(db.Model):
+    """Hourly availability bitmaps of the computer per day (UTC).
+
+    Bit N of every bitmap is the hour N of the day:
+        tracked_hours - hour is covered by the backup periods (logs were enabled)
+        online_hours - backups were downloaded during the hour
+        failed_hours - hour is offline because of the backup download errors
+    """
+
+    __tablename__ = "computer_uptime"
+
+    computer_id = db.Column(
+        db.Integer, db.ForeignKey("computers.id"), primary_key=True
+    )
+    day = db.Column(db.Date, primary_key=True, index=True)
+    tracked_hours = db.Column(db.Integer, default=0, nullable=False)
+    online_hours = db.Column(db.Integer, default=0, nullable=False)
+    failed_hours = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<Computer {self.computer_id} uptime {self.day}>"
+
+
+def shift(bitmap: int, hours: int) -> int:
+    """Move bitmap by the number of hours (to the right if it is negative)"""
+    return bitmap << hours if hours >= 0 else bitmap >> -hours
+
+
+class UptimeBitmap:
+    """Availability of the computer during the window of hours.
+
+    Bit N of every bitmap is the hour N of the window, so the window statistics
+    are calculated with a few bitwise operations on the whole bitmaps.
+    """
+
+    def __init__(self, start_time: datetime, hours: int):
+        # First hour of the window (UTC)
+        self.start_time = start_time
+        self.hours = hours
+        self.tracked = 0
+        self.online = 0
+        self.failed = 0
+
+    def add_day(self, day: date, tracked: int, online: int, failed: int):
+        """Put day bitmaps to their place in the window"""
+        offset = (datetime.combine(day, time.min) - self.start_time) // timedelta(
+            hours=1
+        )
+        window = (1 << self.hours) - 1
+        self.tracked |= shift(tracked, offset) & window
+        self.online |= shift(online, offset) & window
+        self.failed |= shift(failed, offset) & window
+
+    @property
+    def offline(self) -> int:
+        return self.tracked & ~self.online
+
+    def offline_hours(self) -> int:
+        return self.offline.bit_count()
+
+    def offline_occurrences(self) -> int:
+        """Number of continuous offline periods (an offline hour after not offline)"""
+        offline = self.offline
+        return (offline & ~(offline << 1)).bit_count()
+
+    def offline_stats(self) -> tuple[int, timedelta]:
+        """
+        Offline occurrences and offline time during the window.
+
+        If there are no backup periods in the window (logs are too old or missing)
+        the whole window is considered as one offline occurrence.
+        """
+        if not self.tracked:
+            return 1, timedelta(hours=self.hours)
+        return self.offline_occurrences(), timedelta(hours=self.offline_hours())
+
+    def chart_data(self) -> dict[str, list]:
+        """
+        Hourly data of the online / offline periods chart.
+
+        Single offline hour is "yellow" (longer than 1 hour without a backup),
+        longer offline periods are "red" (longer than 2 hours without a backup).
+
+        Returns:
+            dict[str, list]: labels (EST), notes and green, yellow and red data
+        """
+        offline = self.offline
+        yellow = offline & ~(offline << 1) & ~(offline >> 1)
+        red = offline & ~yellow
+
+        def hours_data(bitmap: int) -> list[int | None]:
+            return [1 if bitmap >> hour & 1 else None for hour in range(self.hours)]
+
+        return dict(
+            labels=[
+                CFG.offset_to_est(self.start_time + timedelta(hours=hour), True)
+                for hour in range(self.hours)
+            ],
+            notes=[
+                FAILED_NOTE if self.failed >> hour & 1 else OFFLINE_NOTE
+                for hour in range(self.hours)
+            ],
+            green=hours_data(self.online),
+            yellow=hours_data(yellow),
+            red=hours_data(red),
+        )
+
+
+def load_uptime(
+    computer_ids: list[int], start_time: datetime, hours: int
+) -> dict[int, UptimeBitmap]:
+    """
+    Availability bitmaps of the computers during the window of hours (one query).
+
+    Args:
+        computer_ids (list[int]): ids of the computers
+        start_time (datetime): start of the window (UTC), rounded down to the hour
+        hours (int): number of hours in the window
+
+    Returns:
+        dict[int, UptimeBitmap]: bitmaps by computer id
+    """
+    start_time = start_time.replace(minute=0, second=0, microsecond=0)
+    last_hour = start_time + timedelta(hours=hours - 1)
+    bitmaps = {
+        computer_id: UptimeBitmap(start_time, hours) for computer_id in computer_ids
+    }
+
+    uptime = ComputerUptime.__table__.c
+    for computer_id, day, tracked, online, failed in db.session.execute(
+        select(
+            uptime.computer_id,
+            uptime.day,
+            uptime.tracked_hours,
+            uptime.online_hours,
+            uptime.failed_hours,
+        ).where(
+            uptime.computer_id.in_(computer_ids),
+            uptime.day >= start_time.date(),
+            uptime.day <= last_hour.date(),
+        )
+    ):
+        bitmaps[computer_id].add_day(day, tracked, online, failed)
+
+    return bitmaps
+
+
+def last_week_uptime(computer_ids: list[int]) -> dict[int, UptimeBitmap]:
+    """Availability bitmaps of the computers during the last 7 days (168 hours)"""
+    current_hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    return load_uptime(
+        computer_ids,
+        current_hour - timedelta(hours=LAST_WEEK_HOURS - 1),
+        LAST_WEEK_HOURS,
+    )
+
+
+def day_hours(start_time: datetime, end_time: datetime) -> dict[date, int]:
+    """Bitmaps of the hours [start_time, end_time] by days"""
+    masks = {}
+    day = start_time.date()
+    while day <= end_time.date():
+        first_hour = start_time.hour if day == start_time.date() else 0
+        last_hour = end_time.hour if day == end_time.date() else HOURS_IN_DAY - 1
+        masks[day] = ((1 << (last_hour - first_hour + 1)) - 1) << first_hour
+        day += timedelta(days=1)
+    return masks
+
+
+def mark_uptime_hours(
+    connection,
+    computer_id: int,
+    start_time: datetime,
+    end_time: datetime,
+    online: bool,
+    failed: bool = False,
+):
+    """Set the state of the hours [start_time, end_time] in the bitmaps (upsert)"""
+    rows = [
+        dict(
+            computer_id=computer_id,
+            day=day,
+            tracked_hours=mask,
+            online_hours=mask if online else 0,
+            failed_hours=mask if failed else 0,
+        )
+        for day, mask in day_hours(start_time, end_time).items()
+    ]
+    if not rows:
+        return
+
+    if connection.dialect.name == "postgresql":
+        upsert = postgresql.insert(ComputerUptime.__table__)
+    else:
+        upsert = sqlite.insert(ComputerUptime.__table__)
+
+    uptime = ComputerUptime.__table__.c
+    # State of the marked hours is replaced, the rest of the day is kept
+    kept_hours = (FULL_DAY - upsert.excluded.tracked_hours).self_group()
+    connection.execute(
+        upsert.values(rows).on_conflict_do_update(
+            index_elements=[uptime.computer_id, uptime.day],
+            set_={
+                "tracked_hours": uptime.tracked_hours.op("|")(
+                    upsert.excluded.tracked_hours
+                ),
+                "online_hours": uptime.online_hours.op("&")(kept_hours).op("|")(
+                    upsert.excluded.online_hours
+                ),
+                "failed_hours": uptime.failed_hours.op("&")(kept_hours).op("|")(
+                    upsert.excluded.failed_hours
+                ),
+            },
+        )
+    )
+
+
+def clear_uptime_hours(
+    connection, computer_id: int, start_time: datetime, end_time: datetime
+):
+    """Clear the state of the hours [start_time, end_time] in the bitmaps"""
+    rows = [
+        dict(b_computer_id=computer_id, b_day=day, kept_hours=FULL_DAY - mask)
+        for day, mask in day_hours(start_time, end_time).items()
+    ]
+    if not rows:
+        return
+
+    uptime = ComputerUptime.__table__.c
+    kept_hours = bindparam("kept_hours")
+    connection.execute(
+        update(ComputerUptime.__table__)
+        .where(
+            uptime.computer_id == bindparam("b_computer_id"),
+            uptime.day == bindparam("b_day"),
+        )
+        .values(
+            tracked_hours=uptime.tracked_hours.op("&")(kept_hours),
+            online_hours=uptime.online_hours.op("&")(kept_hours),
+            failed_hours=uptime.failed_hours.op("&")(kept_hours),
+        ),
+        rows,
+    )
+
+
+def remark_uptime_hours(
+    connection, computer_id: int, start_time: datetime, end_time: datetime
+):
+    """Set the state of the hours [start_time, end_time] from the computer periods"""
+    if start_time > end_time:
+        return
+    clear_uptime_hours(connection, computer_id, start_time, end_time)
+
+    logs = BackupLog.__table__.c
+    for log in connection.execute(
+        select(logs.start_time, logs.end_time, logs.backup_log_type, logs.notes)
+        .where(
+            logs.computer_id == computer_id,
+            logs.start_time <= end_time,
+            logs.end_time >= start_time,
+        )
+        .order_by(logs.start_time)
+    ):
+        with_downloads = log.backup_log_type == BackupLogType.WITH_DOWNLOADS_PERIOD
+        mark_uptime_hours(
+            connection,
+            computer_id,
+            max(log.start_time, start_time),
+            min(log.end_time, end_time),
+            online=with_downloads,
+            failed=not with_downloads and log.notes == FAILED_NOTE,
+        )
+
+
+# NOTE previous times of the changed periods are loaded (active history) even if
+# the period is expired, they are required to find the hours which are not covered
+@event.listens_for(BackupLog.start_time, "set", active_history=True)
+@event.listens_for(BackupLog.end_time, "set", active_history=True)
+def keep_previous_period_time(target, value, oldvalue, initiator):
+    return value
+
+
+# NOTE bitmaps are maintained on every change of the backup periods
+@event.listens_for(BackupLog, "after_insert")
+@event.listens_for(BackupLog, "after_update")
+def mark_backup_period_hours(mapper, connection, target: BackupLog):
+    state = inspect(target)
+    start_time = target.start_time
+    previous_end_time = state.attrs.end_time.history.deleted
+
+    # Only the new hours of the extended period are marked
+    if (
+        previous_end_time
+        and previous_end_time[0]
+        and previous_end_time[0] < target.end_time
+        and not state.attrs.start_time.history.deleted
+        and not state.attrs.backup_log_type.history.deleted
+        and not state.attrs.notes.history.deleted
+    ):
+        start_time = max(start_time, previous_end_time[0])
+
+    # Hours which are not covered by the shortened period are set again from the
+    # rest of the periods (e.g. the new period of the split is flushed with it)
+    previous_start_time = state.attrs.start_time.history.deleted
+    old_start_time = (
+        previous_start_time[0]
+        if previous_start_time and previous_start_time[0]
+        else target.start_time
+    )
+    old_end_time = (
+        previous_end_time[0]
+        if previous_end_time and previous_end_time[0]
+        else target.end_time
+    )
+    if old_start_time < target.start_time:
+        remark_uptime_hours(
+            connection,
+            target.computer_id,
+            old_start_time,
+            min(old_end_time, target.start_time - timedelta(seconds=1)),
+        )
+    if old_end_time > target.end_time:
+        remark_uptime_hours(
+            connection,
+            target.computer_id,
+            max(old_start_time, target.end_time + timedelta(seconds=1)),
+            old_end_time,
+        )
+
+    with_downloads = target.backup_log_type == BackupLogType.WITH_DOWNLOADS_PERIOD
+    mark_uptime_hours(
+        connection,
+        target.computer_id,
+        start_time,
+        target.end_time,
+        online=with_downloads,
+        failed=not with_downloads and target.notes == FAILED_NOTE,
+    )
@@ -10,11 +10,13 @@ from flask_admin.model.template import EditRowAction, DeleteRowAction
 from markupsafe import Markup
 
 from app import db
+from app.logger import logger
 
 from app.models.client_version import ClientVersion
 from app.models.user import UserPermissionLevel, UserRole
 from app.models.utils import ModelMixin, RowActionListMixin, BlobMixin, BlobUploadField
 from app.utils import MyModelView
+from app.utils.blob_store import remove_unused_blobs
 
 
 class DesktopClient(db.Model, ModelMixin, BlobMixin):
@@ -75,12 +77,13 @@ class DesktopClientView(RowActionListMixin, MyModelView):
         "filename",
         "download",
     )
-    form_excluded_columns = ("mimetype", "size", "filename")
+    form_excluded_columns = ("mimetype", "size", "filename", "sha256")
 
     form_extra_fields = {
-        "blob": BlobUploadField(
+        "file": BlobUploadField(
             label="File",
             allowed_extensions=["msi"],
+            digest_field="sha256",
             size_field="size",
             filename_field="filename",
             mimetype_field="mimetype",
@@ -127,6 +130,19 @@ class DesktopClientView(RowActionListMixin, MyModelView):
         else:
             return False
 
+    def _remove_unused_blobs(self):
+        used_digests = set(self.session.scalars(select(DesktopClient.sha256)))
+        for digest in remove_unused_blobs(used_digests):
+            logger.info("Unused MSI blob {} removed from the store", digest)
+
+    def after_model_change(self, form, model, is_created):
+        # The replaced file is not referenced anymore
+        if not is_created:
+            self._remove_unused_blobs()
+
+    def after_model_delete(self, model):
+        self._remove_unused_blobs()
+
     def allow_row_action(self, action, model):
         if isinstance(action, EditRowAction):
             return self._can_edit(model)
@@ -12,7 +12,6 @@ from sqlalchemy import Enum, func, or_, select, sql
 from sqlalchemy.ext.hybrid import hybrid_method, hybrid_property
 from sqlalchemy.orm import relationship
 from wtforms import validators
-from zoneinfo import ZoneInfo
 
 from app import db
 
@@ -284,28 +283,13 @@ class Location(db.Model, ModelMixin, SoftDeleteMixin, ActivatedMixin):
         Returns:
             int: total number of PCC API calls
         """
+        from app.models.billing_rollup import PCC_API_CALLS_ROLLUP, total_events
         from app.models.computer import Computer
-        from app.models.download_backup_call import DownloadBackupCall
 
-        # If the start_time and end_time has not UTC timezone, then convert it
-        if start_time.tzinfo and start_time.tzinfo != ZoneInfo("UTC"):
-            start_time = start_time.astimezone(ZoneInfo("UTC"))
+        # All the computers (even deleted ones) of this location
+        computers_ids = select(Computer.id).where(Computer.location_id == self.id)
 
-        if end_time.tzinfo and end_time.tzinfo != ZoneInfo("UTC"):
-            end_time = end_time.astimezone(ZoneInfo("UTC"))
-
-        # Retrieve all the computers (even deleted ones) for this location
-        computers: list[Computer] = (
-            Computer.query.with_deleted().filter(Computer.location_id == self.id).all()
-        )
-        computers_ids: list[int] = [comp.id for comp in computers]
-        total_pcc_api_calls: int = DownloadBackupCall.query.filter(
-            DownloadBackupCall.computer_id.in_(computers_ids),
-            DownloadBackupCall.created_at >= start_time,
-            DownloadBackupCall.created_at <= end_time,
-        ).count()
-
-        return total_pcc_api_calls
+        return total_events(PCC_API_CALLS_ROLLUP, start_time, end_time, computers_ids)
 
     @hybrid_method
     def total_alert_events(
@@ -324,22 +308,9 @@ class Location(db.Model, ModelMixin, SoftDeleteMixin, ActivatedMixin):
         Returns:
             int: total number of alert events
         """
-        from app.models.alert_event import AlertEvent
-
-        # If the start_time and end_time has not UTC timezone, then convert it
-        if start_time.tzinfo and start_time.tzinfo != ZoneInfo("UTC"):
-            start_time = start_time.astimezone(ZoneInfo("UTC"))
-
-        if end_time.tzinfo and end_time.tzinfo != ZoneInfo("UTC"):
-            end_time = end_time.astimezone(ZoneInfo("UTC"))
-
-        total_alert_events: int = AlertEvent.query.filter(
-            AlertEvent.location_id == self.id,
-            AlertEvent.created_at >= start_time,
-            AlertEvent.created_at <= end_time,
-        ).count()
+        from app.models.billing_rollup import ALERT_EVENTS_ROLLUP, total_events
 
-        return total_alert_events
+        return total_events(ALERT_EVENTS_ROLLUP, start_time, end_time, [self.id])
 
 
 class LocationView(RowActionListMixin, MyModelView):
@@ -21,12 +21,18 @@ class LogType(enum.Enum):
 class LogEvent(db.Model, ModelMixin):
     __tablename__ = "log_events"
 
+    # NOTE In PostgreSQL the table is partitioned by month of created_at
+    # (primary key is (id, created_at)), see app/controllers/log_partitions.py
+    __table_args__ = (
+        db.Index("ix_log_events_computer_id_created_at", "computer_id", "created_at"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
 
     computer_id = db.Column(db.Integer, db.ForeignKey("computers.id"))
 
     log_type = db.Column(Enum(LogType), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     data = db.Column(db.String(128), server_default="", default="")
 
     def __repr__(self):
@@ -27,6 +27,9 @@ class PCCActivationsScan(db.Model, ModelMixin):
         nullable=False,
     )
     finished_at = db.Column(db.DateTime)
+    # Progress of the scanning (organizations with fetched facilities)
+    organizations_total = db.Column(db.Integer, default=0, server_default="0")
+    organizations_scanned = db.Column(db.Integer, default=0, server_default="0")
 
     def __repr__(self):
         return f"<Activations scan ID: {self.id}. Created_at: {self.created_at}>"
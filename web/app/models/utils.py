@@ -9,6 +9,7 @@ from wtforms.validators import InputRequired
 from wtforms.widgets import FileInput
 
 from app import db
+from app.utils.blob_store import blob_path, save_blob
 
 
 class ModelMixin(object):
@@ -82,9 +83,11 @@ class BlobUploadField(fields.StringField):
         size_field=None,
         filename_field=None,
         mimetype_field=None,
+        digest_field=None,
         **kwargs,
     ):
         self.allowed_extensions = allowed_extensions
+        self.digest_field = digest_field
         self.size_field = size_field
         self.filename_field = filename_field
         self.mimetype_field = mimetype_field
@@ -123,12 +126,14 @@ class BlobUploadField(fields.StringField):
 
     def populate_obj(self, obj, name):
         if self._is_uploaded_file(self.data):
-            _blob = self.data.read()
+            # File is saved to the blob store, the model keeps its digest and size
+            digest, size = save_blob(self.data.stream)
 
-            setattr(obj, name, _blob)
+            if self.digest_field:
+                setattr(obj, self.digest_field, digest)
 
             if self.size_field:
-                setattr(obj, self.size_field, len(_blob))
+                setattr(obj, self.size_field, size)
 
             if self.filename_field:
                 setattr(obj, self.filename_field, self.data.filename)
@@ -140,9 +145,14 @@ class BlobUploadField(fields.StringField):
 class BlobMixin(object):
     mimetype = db.Column(db.Unicode(length=255), nullable=False)
     filename = db.Column(db.Unicode(length=255), nullable=False)
-    blob = db.Column(db.LargeBinary(), nullable=False)
+    # sha256 of the file in the blob store (see app/utils/blob_store.py)
+    sha256 = db.Column(db.String(64), nullable=False, index=True)
     size = db.Column(db.Integer, nullable=False)
 
+    @property
+    def blob_path(self) -> str:
+        return blob_path(self.sha256)
+
 
 def count(query: sa.sql.selectable.Select) -> int:
     # Return count of query.
@@ -26,4 +26,11 @@ from .alert import ComputersByLocation
 from .location import LocationInfo
 from .printer_info import PrinterInfoDict, PrinterInfo
 from .agent_telemetry import AgentTelemetry, TelemetryRequestId
+from .agent_sync import AgentSync
 from .download_credentials_info import ComputerCredentialsInfo
+from .dashboard_stats import DashboardStats
+from .active_companies import (
+    ActiveCompaniesResponse,
+    ActiveCompanyResponse,
+    ActiveFacilityResponse,
+)
@@ -0,0 +1,14 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+
+from .printer_info import PrinterInfoDict
+
+
+class AgentSync(BaseModel):
+    computer_name: str
+    identifier_key: str
+    last_time_online: datetime
+    last_download_time: Optional[datetime]
+    config_etag: Optional[str]
+    printer_info: Optional[PrinterInfoDict]
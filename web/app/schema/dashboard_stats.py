@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+
+
+class DashboardStats(BaseModel):
+    total_locations: int = 0
+    activated_locations: int = 0
+    locations_offline: int = 0
+    locations_online: int = 0
+    locations_primary_offline: int = 0
+
+    total_computers: int = 0
+    activated_computers: int = 0
+    computers_online: int = 0
+    computers_offline: int = 0
+
+    activated_primary: int = 0
+    primary_online: int = 0
+    primary_offline: int = 0
+
+    activated_alternate: int = 0
+    alternate_online: int = 0
+    alternate_offline: int = 0
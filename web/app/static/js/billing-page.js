@@ -75,3 +75,38 @@ timeRangeSelector.addEventListener("change", (e) => {
   fromDateInput.value = startDay.toJSON().split("T")[0];
   toDateInput.value = today.toJSON().split("T")[0];
 });
+
+// Billing reports are generated by the worker: start the report job,
+// poll its status and download the report when it is ready
+const REPORT_POLL_INTERVAL = 2000;
+
+const exportBillingReport = async (element) => {
+  if (element.dataset.inProgress) {
+    return;
+  }
+  element.dataset.inProgress = "true";
+  element.classList.add("disabled");
+
+  try {
+    let response = await fetch(element.dataset.reportUrl);
+    let job = await response.json();
+
+    while (job.status === "IN_PROGRESS") {
+      await new Promise((resolve) => setTimeout(resolve, REPORT_POLL_INTERVAL));
+      response = await fetch(job.status_url);
+      job = await response.json();
+    }
+
+    if (job.status === "SUCCEED") {
+      window.location.href = job.download_url;
+    } else {
+      alert(`Billing report generation failed: ${job.error || "unknown error"}`);
+    }
+  } catch (error) {
+    console.error(error);
+    alert("Billing report generation failed");
+  } finally {
+    delete element.dataset.inProgress;
+    element.classList.remove("disabled");
+  }
+}
@@ -0,0 +1,77 @@
+import hashlib
+import os
+import tempfile
+import time
+from typing import BinaryIO
+
+from config import BaseConfig as CFG
+
+CHUNK_SIZE = 1024 * 1024
+# Files younger than this (seconds) are never removed (upload is not committed yet)
+UNUSED_BLOB_MIN_AGE = 60 * 60
+
+
+def blob_path(digest: str) -> str:
+    """Path of the file in the content-addressed blob store (named by sha256)"""
+    return os.path.join(CFG.BLOB_STORE_DIR, digest[:2], digest)
+
+
+def save_blob(stream: BinaryIO) -> tuple[str, int]:
+    """Save the stream to the blob store (chunk by chunk)
+
+    The same content is stored only once, the file is written to the temporary
+    file and moved to its place, so readers never see partially written blobs.
+
+    Args:
+        stream (BinaryIO): content of the blob
+
+    Returns:
+        tuple[str, int]: sha256 hex digest and size of the blob
+    """
+    os.makedirs(CFG.BLOB_STORE_DIR, exist_ok=True)
+    sha256 = hashlib.sha256()
+    size = 0
+
+    fd, tmp_path = tempfile.mkstemp(dir=CFG.BLOB_STORE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            while chunk := stream.read(CHUNK_SIZE):
+                sha256.update(chunk)
+                size += len(chunk)
+                tmp_file.write(chunk)
+
+        digest = sha256.hexdigest()
+        path = blob_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return digest, size
+
+
+def remove_unused_blobs(used_digests: set[str]) -> list[str]:
+    """Remove the blobs which are not referenced anymore
+
+    Args:
+        used_digests (set[str]): digests of the blobs which are still used
+
+    Returns:
+        list[str]: digests of the removed blobs
+    """
+    removed = []
+    if not os.path.isdir(CFG.BLOB_STORE_DIR):
+        return removed
+
+    min_mtime = time.time() - UNUSED_BLOB_MIN_AGE
+    for dir_entry in os.scandir(CFG.BLOB_STORE_DIR):
+        if not dir_entry.is_dir():
+            continue
+        for entry in os.scandir(dir_entry.path):
+            if entry.name in used_digests or entry.stat().st_mtime > min_mtime:
+                continue
+            os.remove(entry.path)
+            removed.append(entry.name)
+
+    return removed
@@ -1,4 +1,13 @@
-from flask_mail import Message
+import enum
+import queue
+import smtplib
+import threading
+import time
+from datetime import datetime
+from typing import Any
+
+from flask import current_app
+from flask_mail import Connection, Message
 
 from app import mail
 from app.logger import logger
@@ -9,14 +18,223 @@ def send_email(
     subject: str,
     recipients: list[str],
     html: str,
-    sender: str = CFG.MAIL_DEFAULT_SENDER,
+    sender: str | None = None,
 ):
     msg = Message(
         subject=subject,
-        sender=sender,
+        sender=sender or current_app.config["MAIL_DEFAULT_SENDER"],
         recipients=recipients,
         html=html,
     )
 
     mail.send(msg)
     logger.info("Email with subject {} was successfully sent", subject)
+
+
+class EmailStatus(enum.Enum):
+    QUEUED = "queued"
+    SENT = "sent"
+    FAILED = "failed"
+
+
+class QueuedEmail:
+    """Message added to the EmailQueue and its delivery status
+
+    The status is kept only in memory of the process which sends the email, it
+    is not saved to the DB and is lost on restart.
+    """
+
+    def __init__(self, message: Message, context: Any = None):
+        self.message = message
+        # Any object the caller needs to process the delivery result (e.g. location)
+        self.context = context
+        self.status = EmailStatus.QUEUED
+        self.attempts = 0
+        self.error: str | None = None
+        self.sent_at: datetime | None = None
+
+
+def is_transient_error(err: Exception) -> bool:
+    """Check if sending of the email can succeed on retry"""
+    if isinstance(err, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(err, smtplib.SMTPResponseException):
+        # 4xx - temporary failures (e.g. 421 service not available, 451 local error)
+        return 400 <= err.smtp_code < 500
+    if isinstance(err, smtplib.SMTPException):
+        return False
+    # Network errors (refused connection, timeout, reset)
+    return isinstance(err, OSError)
+
+
+class EmailQueue:
+    """Outbound mail queue.
+
+    Emails are collected with add() and delivered by send_all() with up to
+    max_connections threads, every thread reuses one SMTP connection for its
+    messages. Transient errors are retried with exponential backoff, the result
+    of delivery is kept in QueuedEmail.status.
+
+    The queue lives in memory: delivery statuses are valid only for the process
+    (and the send_all() call) which sent the emails, they are not shared between
+    workers and are lost on restart. Callers should process them right after
+    send_all() and save what they need (e.g. alert flags) to the DB.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = CFG.MAIL_MAX_CONNECTIONS,
+        max_retries: int = CFG.MAIL_SEND_RETRIES,
+        retry_backoff: float = CFG.MAIL_RETRY_BACKOFF,
+    ):
+        self.max_connections = max(max_connections, 1)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.emails: list[QueuedEmail] = []
+
+    def __len__(self):
+        return len(self.emails)
+
+    def add(
+        self,
+        subject: str,
+        recipients: list[str],
+        html: str,
+        sender: str | None = None,
+        context: Any = None,
+    ) -> QueuedEmail:
+        """Add email to the queue (it is sent by send_all())
+
+        Args:
+            subject (str): email subject
+            recipients (list[str]): email recipients
+            html (str): email body
+            sender (str, optional): email sender. Defaults to MAIL_DEFAULT_SENDER
+                of the current app config.
+            context (Any, optional): object to identify the email after sending. Defaults to None.
+
+        Returns:
+            QueuedEmail: queued email
+        """
+        email = QueuedEmail(
+            Message(
+                subject=subject,
+                sender=sender or current_app.config["MAIL_DEFAULT_SENDER"],
+                recipients=recipients,
+                html=html,
+            ),
+            context=context,
+        )
+        self.emails.append(email)
+        return email
+
+    def send_all(self) -> dict:
+        """Send all the queued emails
+
+        Returns:
+            dict: delivery report (number of sent and failed emails and elapsed time)
+        """
+        start_time = time.perf_counter()
+        pending = queue.SimpleQueue()
+        for email in self.emails:
+            if email.status == EmailStatus.QUEUED:
+                pending.put(email)
+
+        app = current_app._get_current_object()
+        workers = [
+            threading.Thread(
+                target=self._worker, args=(app, pending), name=f"email-queue-{i}"
+            )
+            for i in range(min(self.max_connections, pending.qsize()))
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        report = dict(
+            sent=self.count(EmailStatus.SENT),
+            failed=self.count(EmailStatus.FAILED),
+            connections=len(workers),
+            elapsed=round(time.perf_counter() - start_time, 3),
+        )
+        if workers:
+            logger.info(
+                "Email queue processed: sent {sent}, failed {failed}, "
+                "connections {connections}, {elapsed} sec",
+                **report,
+            )
+
+        return report
+
+    def count(self, status: EmailStatus) -> int:
+        return sum(1 for email in self.emails if email.status == status)
+
+    def _worker(self, app, pending: queue.SimpleQueue):
+        with app.app_context():
+            connection: Connection | None = None
+            try:
+                while True:
+                    try:
+                        email = pending.get_nowait()
+                    except queue.Empty:
+                        break
+                    connection = self._deliver(email, connection)
+            finally:
+                self._close(connection)
+
+    def _deliver(
+        self, email: QueuedEmail, connection: Connection | None
+    ) -> Connection | None:
+        """Send the email (with retries) and return the connection to reuse"""
+        while True:
+            email.attempts += 1
+            try:
+                if not connection:
+                    connection = mail.connect().__enter__()
+                connection.send(email.message)
+            except Exception as err:
+                transient = is_transient_error(err)
+                if transient:
+                    # Connection can be broken - open a new one for the next attempt
+                    self._close(connection)
+                    connection = None
+
+                if not transient or email.attempts > self.max_retries:
+                    email.status = EmailStatus.FAILED
+                    email.error = str(err)
+                    logger.error(
+                        "Email with subject {} to {} was not sent (attempts: {}). Error: {}",
+                        email.message.subject,
+                        email.message.recipients,
+                        email.attempts,
+                        err,
+                    )
+                    return connection
+
+                logger.warning(
+                    "Email with subject {} was not sent, retry {}. Error: {}",
+                    email.message.subject,
+                    email.attempts,
+                    err,
+                )
+                time.sleep(self.retry_backoff * 2 ** (email.attempts - 1))
+                continue
+
+            email.status = EmailStatus.SENT
+            email.sent_at = datetime.utcnow()
+            logger.info(
+                "Email with subject {} to {} was successfully sent",
+                email.message.subject,
+                email.message.recipients,
+            )
+            return connection
+
+    @staticmethod
+    def _close(connection: Connection | None):
+        if not connection or not connection.host:
+            return
+        try:
+            connection.host.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.host.close()
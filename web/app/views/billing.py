@@ -1,17 +1,24 @@
 import enum
-import io
+import os
 from datetime import datetime, timedelta
 
-from flask import Blueprint, abort, render_template, request, send_file
+from flask import Blueprint, abort, jsonify, render_template, request, send_file
 from flask_login import current_user, login_required
 from sqlalchemy.orm import Query
 from zoneinfo import ZoneInfo
 
 from app import db
 from app import models as m
-from app.controllers import create_general_billing_report, create_pagination
+from app.controllers import (
+    billing_report_path,
+    create_pagination,
+    get_or_create_billing_report_job,
+)
 from app.logger import logger
 from config import BaseConfig as CFG
+from worker import generate_billing_report
+
+from .utils import billing_report_job_info
 
 billing_blueprint = Blueprint("billing", __name__, url_prefix="/billing")
 
@@ -122,10 +129,10 @@ def get_billing_page():
 @billing_blueprint.route("/report", methods=["GET"])
 @login_required
 def general_billing_report():
-    """Generates general billing report for all the companies and returns it as .xlsx file
+    """Starts generating of general billing report for all the companies in the worker
 
     Returns:
-        Response: billing report as .xlsx file
+        Response: billing report job info (status and urls to poll and download)
     """
     # Only global users can access this information
     if current_user.permission != m.UserPermissionLevel.GLOBAL:
@@ -154,12 +161,71 @@ def general_billing_report():
         logger.error("Incorrect date format to generate general billing report")
         abort(400, "Invalid date format.")
 
-    # Generate general billing report for company
-    report: io.BytesIO = create_general_billing_report(from_date, to_date)
+    # Generate general billing report in the worker (or take the cached one)
+    job, created = get_or_create_billing_report_job(None, from_date, to_date)
+    job_info = billing_report_job_info(job)
+    if created:
+        generate_billing_report.delay(job.id)
+        logger.debug("Celery task for general billing report {} started", job.id)
+
+    return jsonify(job_info), 202
+
+
+@billing_blueprint.route("/report-jobs/<int:job_id>", methods=["GET"])
+@login_required
+def billing_report_job_status(job_id: int):
+    """Status of the billing report job (polled by the billing page)
+
+    Args:
+        job_id (int): billing report job id
+
+    Returns:
+        Response: billing report job info
+    """
+    if current_user.permission != m.UserPermissionLevel.GLOBAL:
+        abort(403, "You don't have access to this information.")
+
+    job: m.BillingReportJob = m.BillingReportJob.query.get(job_id)
+    if not job:
+        abort(404, "Billing report not found.")
+
+    return jsonify(billing_report_job_info(job)), 200
+
+
+@billing_blueprint.route("/report-jobs/<int:job_id>/download", methods=["GET"])
+@login_required
+def download_billing_report(job_id: int):
+    """Returns report of the finished billing report job as .xlsx file
+
+    Args:
+        job_id (int): billing report job id
+
+    Returns:
+        Response: billing report as .xlsx file
+    """
+    if current_user.permission != m.UserPermissionLevel.GLOBAL:
+        abort(403, "You don't have access to this information.")
+
+    job: m.BillingReportJob = m.BillingReportJob.query.get(job_id)
+    if not job:
+        abort(404, "Billing report not found.")
+
+    if job.status != m.ReportJobStatus.SUCCEED:
+        abort(409, f"Billing report is not ready: {job.status.value}")
+
+    path = billing_report_path(job)
+    if not os.path.exists(path):
+        logger.error("File of billing report {} not found", job.id)
+        abort(404, "Billing report file not found, generate the report again.")
+
+    if job.company:
+        download_name = f"Report_{job.company.name}.xlsx"
+    else:
+        download_name = "General_Report.xlsx"
 
     return send_file(
-        report,
+        path,
         mimetype="application/ms-excel",
         as_attachment=True,
-        download_name="General_Report.xlsx",
+        download_name=download_name,
     )
@@ -1,4 +1,3 @@
-import io
 from zoneinfo import ZoneInfo
 from datetime import datetime
 
@@ -7,7 +6,6 @@ from flask import (
     Blueprint,
     abort,
     request,
-    send_file,
     flash,
     redirect,
     url_for,
@@ -15,10 +13,11 @@ from flask import (
 from flask_login import login_required, current_user
 
 from app import models as m
-from app.controllers import create_company_billing_report
+from app.controllers import get_or_create_billing_report_job
 from app.logger import logger
+from worker import generate_billing_report
 
-from .utils import has_access_to_company
+from .utils import billing_report_job_info, has_access_to_company
 
 
 company_blueprint = Blueprint("company_blueprint", __name__, url_prefix="/company")
@@ -171,13 +170,13 @@ def company_location_groups(company_id: int):
 @company_blueprint.route("/<int:company_id>/billing-report", methods=["GET"])
 @login_required
 def company_billing_report(company_id: int):
-    """Generates billing report for company and returns it as .xlsx file
+    """Starts generating of billing report for company in the worker
 
     Args:
         company_id (int): company id
 
     Returns:
-        Response: billing report as .xlsx file
+        Response: billing report job info (status and urls to poll and download)
     """
     # Only global users can access this information
     if current_user.permission != m.UserPermissionLevel.GLOBAL:
@@ -214,15 +213,14 @@ def company_billing_report(company_id: int):
         logger.error(f"Company with id {company_id} not found")
         abort(404, "Company not found.")
 
-    # Generate billing report for company
-    report: io.BytesIO = create_company_billing_report(company, from_date, to_date)
+    # Generate billing report for company in the worker (or take the cached one)
+    job, created = get_or_create_billing_report_job(company.id, from_date, to_date)
+    job_info = billing_report_job_info(job)
+    if created:
+        generate_billing_report.delay(job.id)
+        logger.debug("Celery task for billing report {} started", job.id)
 
-    return send_file(
-        report,
-        mimetype="application/ms-excel",
-        as_attachment=True,
-        download_name=f"Report_{company.name}.xlsx",
-    )
+    return jsonify(job_info), 202
 
 
 @company_blueprint.route("/<int:company_id>/activation", methods=["GET"])
@@ -2,8 +2,9 @@ import csv
 import io
 from urllib.parse import unquote
 
-from flask import Blueprint, Response, request
+from flask import Blueprint, Response, request, stream_with_context
 from flask_login import current_user, login_required
+from sqlalchemy.orm import aliased
 
 from app import db
 from app import models as m
@@ -39,6 +40,21 @@ text_mappings = [
     ("computer_ip", m.Computer.computer_ip),
 ]
 
+CSV_HEADERS = [
+    "Subscription",
+    "Computer Name",
+    "Status",
+    "Company Name",
+    "Location Name",
+    "Location Status",
+    "Device Type",
+    "Last time online",
+    "Last download time",
+    "Computer IP",
+]
+# Number of rows fetched from db cursor and written to the response at once
+CSV_BATCH_SIZE = 1000
+
 download_csv_blueprint = Blueprint("download_csv", __name__, url_prefix="/download_csv")
 
 
@@ -123,19 +139,14 @@ def download_csv():
     computer_view = ComputerView(m.Computer, db.session)
     computers_query = computer_view.get_query()
 
-    # Log initial count after permission filtering
-    initial_count = computers_query.count()
     logger.info(
-        f"After permission filtering: {initial_count} computers (user: {current_user.username}, permission: {current_user.permission})"
+        f"CSV export (user: {current_user.username}, "
+        f"permission: {current_user.permission})"
     )
 
     # Apply Flask-Admin filters if present
     computers_query = apply_flask_admin_filters(computers_query, request.args)
 
-    # Log count after Flask-Admin filters
-    after_admin_filters_count = computers_query.count()
-    logger.info(f"After Flask-Admin filters: {after_admin_filters_count} computers")
-
     for filter_key, field in text_mappings:
         if filter_key in filters:
             computers_query = apply_text_filter(
@@ -154,55 +165,77 @@ def download_csv():
                 computers_query, field, filters[filter_key]
             )
 
-    computers = computers_query.all()
-
-    logger.info(f"Found {len(computers)} computers matching filters")
-
-    with io.StringIO() as output:
-        writer = csv.writer(output)
-
-        writer.writerow(
-            [
-                "Subscription",
-                "Computer Name",
-                "Status",
-                "Company Name",
-                "Location Name",
-                "Location Status",
-                "Device Type",
-                "Last time online",
-                "Last download time",
-                "Computer IP",
-            ]
+    # Only columns needed for csv (aliased - company/location can be joined by filters)
+    company = aliased(m.Company)
+    location = aliased(m.Location)
+    rows_query = (
+        computers_query.outerjoin(company, company.id == m.Computer.company_id)
+        .outerjoin(location, location.id == m.Computer.location_id)
+        .with_entities(
+            company.is_trial,
+            m.Computer.computer_name,
+            m.Computer.computer_status,
+            company.name,
+            location.name,
+            location.status,
+            m.Computer.device_type,
+            m.Computer.last_time_online,
+            m.Computer.last_download_time,
+            m.Computer.computer_ip,
         )
+        .order_by(m.Computer.id)
+        .yield_per(CSV_BATCH_SIZE)
+    )
 
-        for computer in computers:
+    def generate_csv():
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(CSV_HEADERS)
+
+        rows_count = 0
+        for (
+            is_trial,
+            computer_name,
+            status,
+            company_name,
+            location_name,
+            location_status,
+            device_type,
+            last_time_online,
+            last_download_time,
+            computer_ip,
+        ) in rows_query:
             writer.writerow(
                 [
-                    "Pro" if not computer.is_company_trial else "Lite",
-                    computer.computer_name or "",
-                    computer.status or "",
-                    computer.company_name or "",
-                    computer.location_name if computer.location else "",
-                    computer.location_status if computer.location else "",
-                    computer.device_type or "",
-                    computer.last_time_online.strftime("%Y-%m-%d %H:%M:%S")
-                    if computer.last_time_online
+                    "Pro" if not is_trial else "Lite",
+                    computer_name or "",
+                    status or "",
+                    company_name or "",
+                    location_name or "",
+                    location_status or "",
+                    device_type or "",
+                    last_time_online.strftime("%Y-%m-%d %H:%M:%S")
+                    if last_time_online
                     else "",
-                    computer.last_download_time.strftime("%Y-%m-%d %H:%M:%S")
-                    if computer.last_download_time
+                    last_download_time.strftime("%Y-%m-%d %H:%M:%S")
+                    if last_download_time
                     else "",
-                    computer.computer_ip or "",
+                    computer_ip or "",
                 ]
             )
+            rows_count += 1
+
+            if rows_count % CSV_BATCH_SIZE == 0:
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate()
 
-        # Get CSV content
-        csv_content = output.getvalue()
+        yield output.getvalue()
+        logger.info(f"CSV generation completed, {rows_count} computers exported")
 
-    # Return CSV file for download
-    logger.info("CSV generation completed, sending file to user")
+    # Rows are fetched from db and sent to user by batches (constant memory)
     return Response(
-        csv_content,
+        stream_with_context(generate_csv()),
         mimetype="text/csv",
         headers={"Content-Disposition": "attachment; filename=computers_export.csv"},
     )
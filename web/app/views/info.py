@@ -6,7 +6,7 @@ from flask_login import current_user, login_required
 from app import db
 from app import models as m
 from app.controllers import backup_log_on_request_to_view, create_pagination
-from config import BaseConfig as CFG
+from app.models.computer_uptime import load_uptime
 
 from .utils import has_access_to_company, has_access_to_computer, has_access_to_location
 
@@ -62,14 +62,12 @@ def computer_info(computer_id):
     # Logs information for chart
     chart_days = request.args.get("chart_days", 7, type=int)
 
-    logs_for_chart = (
-        m.BackupLog.query.filter(
-            m.BackupLog.computer_id == computer_id,
-            m.BackupLog.end_time >= datetime.utcnow() - timedelta(days=chart_days),
-        )
-        .order_by(m.BackupLog.start_time.asc())
-        .all()
-    )
+    # The first hour is loaded only to know if the offline period continues
+    current_hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    chart_hours = chart_days * 24 + 1
+    uptime = load_uptime(
+        [computer_id], current_hour - timedelta(hours=chart_hours), chart_hours + 1
+    )[computer_id]
 
     # List objects with different data for chart.
     labels = []
@@ -78,47 +76,13 @@ def computer_info(computer_id):
     chart_yellow_data = []
     chart_red_data = []
 
-    if logs_for_chart:
-        # Set the start time for the chart (eastern time - chart_days)
-        log_time = CFG.offset_to_est(
-            datetime.utcnow().replace(minute=0, second=0, microsecond=0), True
-        ) - timedelta(days=chart_days)
-        log_to_use_index = 0
-
-        current_log_type = None
-
-        # Fill all the list objects with data for every hour
-        while log_time < CFG.offset_to_est(datetime.utcnow(), True):
-            labels.append(log_time)
-            notes.append(logs_for_chart[log_to_use_index].notes)
-
-            # Check if the current log_time is in the range of the current log
-            if (
-                log_time < logs_for_chart[log_to_use_index].est_start_time
-                or log_time > logs_for_chart[log_to_use_index].est_end_time
-            ):
-                current_log_type = None
-            elif not logs_for_chart[log_to_use_index].error:
-                current_log_type = "green"
-            elif (
-                logs_for_chart[log_to_use_index].error
-                == "Longer than 1 hour without a backup"
-            ):
-                current_log_type = "yellow"
-            else:
-                current_log_type = "red"
-
-            chart_green_data.append(1 if current_log_type == "green" else None)
-            chart_yellow_data.append(1 if current_log_type == "yellow" else None)
-            chart_red_data.append(1 if current_log_type == "red" else None)
-
-            log_time += timedelta(hours=1)
-
-            if (
-                log_time > logs_for_chart[log_to_use_index].est_end_time
-                and (log_to_use_index + 1) <= len(logs_for_chart) - 1
-            ):
-                log_to_use_index += 1
+    if uptime.tracked:
+        chart_data = uptime.chart_data()
+        labels = chart_data["labels"][1:]
+        notes = chart_data["notes"][1:]
+        chart_green_data = chart_data["green"][1:]
+        chart_yellow_data = chart_data["yellow"][1:]
+        chart_red_data = chart_data["red"][1:]
 
     return render_template(
         "info/computer.html",
@@ -140,6 +140,18 @@ def creation_reports():
             previous_scan_finished_at = all_scan_records[0].finished_at
             current_scan_status = "READY"
 
+    # Progress of the current scanning (organizations with fetched facilities)
+    scan_progress = None
+    if (
+        all_scan_records
+        and all_scan_records[0].status == m.ScanStatus.IN_PROGRESS
+        and all_scan_records[0].organizations_total
+    ):
+        scan_progress = (
+            f"{all_scan_records[0].organizations_scanned}"
+            f"/{all_scan_records[0].organizations_total}"
+        )
+
     # Check if the scanning button should be enabled or disabled
     waiting_creation_report = m.PCCCreationReport.query.filter_by(
         status=m.CreationReportStatus.WAITING
@@ -163,6 +175,7 @@ def creation_reports():
         previous_scan_result=previous_scan_result,
         previous_scan_finished_at=previous_scan_finished_at,
         current_scan_status=current_scan_status,
+        scan_progress=scan_progress,
         approved_page=approved_page,
         scan_disabled=scan_disabled,
         reason=reason,
@@ -1,6 +1,8 @@
 from app import models as m
 from datetime import datetime
+from flask import url_for
 from app import db
+from app.controllers.telemetry_settings import get_effective_telemetry_settings
 
 
 def get_companies_merged_locations(
@@ -122,29 +124,32 @@ def has_access_to_company(user: m.User, company: m.Company):
             return False
 
 
+def billing_report_job_info(job: m.BillingReportJob) -> dict:
+    """Billing report job status and urls to poll it and to download the report"""
+    return dict(
+        id=job.id,
+        status=job.status.name,
+        error=job.error,
+        status_url=url_for("billing.billing_report_job_status", job_id=job.id),
+        download_url=(
+            url_for("billing.download_billing_report", job_id=job.id)
+            if job.status == m.ReportJobStatus.SUCCEED
+            else None
+        ),
+    )
+
+
 def get_telemetry_settings_for_computer(computer: m.Computer) -> m.TelemetrySettings:
-    """Get telemetry settings for computer"""
-    linked_table = m.ComputerSettingsLinkTable.query.filter_by(
-        computer_id=computer.id
-    ).first()
-    if not linked_table:
-        linked_table = m.LocationSettingsLinkTable.query.filter_by(
-            location_id=computer.location_id
-        ).first()
-        if not linked_table:
-            linked_table = m.CompanySettingsLinkTable.query.filter_by(
-                company_id=computer.company_id
-            ).first()
-            if not linked_table:
-                linked_table = m.TelemetrySettings.query.get(1)
-                if not linked_table:
-                    linked_table = m.TelemetrySettings()
-                    linked_table.save()
-                    return linked_table
-                return linked_table
+    """Get telemetry settings for computer (default ones if they don't exist yet)"""
+    effective = get_effective_telemetry_settings(computer)
     telemetry_settings = m.TelemetrySettings.query.filter_by(
-        id=linked_table.telemetry_settings_id
+        id=effective.telemetry_settings_id
     ).first()
+    if not telemetry_settings:
+        return m.TelemetrySettings(
+            send_printer_info=effective.send_printer_info,
+            send_agent_logs=effective.send_agent_logs,
+        )
     return telemetry_settings
 
 
@@ -48,6 +48,11 @@ class BaseConfig(object):
     MAIL_USE_TLS = False
     MAIL_USE_SSL = True
     MAIL_DEFAULT_SENDER = os.environ.get("SUPPORT_EMAIL")
+    # Outbound mail queue: parallel SMTP connections, retries of transient errors
+    # and initial backoff (seconds, doubled on every retry)
+    MAIL_MAX_CONNECTIONS = int(os.environ.get("MAIL_MAX_CONNECTIONS", 4))
+    MAIL_SEND_RETRIES = int(os.environ.get("MAIL_SEND_RETRIES", 3))
+    MAIL_RETRY_BACKOFF = float(os.environ.get("MAIL_RETRY_BACKOFF", 2))
 
     CLIENT_VERSIONS = [
         ("stable", "stable"),
@@ -123,6 +128,32 @@ class BaseConfig(object):
     CERTIFICATE_PATH = os.environ.get("CERTIFICATE_PATH", None)
     PRIVATEKEY_PATH = os.environ.get("PRIVATEKEY_PATH", None)
     GLOBAL_COMPANY_ID = os.environ.get("GLOBAL_COMPANY_ID", 1)
+    # PCC API access token is refreshed when it expires sooner than this (seconds)
+    PCC_TOKEN_REFRESH_MARGIN = int(os.environ.get("PCC_TOKEN_REFRESH_MARGIN", 300))
+    # Token which expires sooner than this (seconds) is never used
+    PCC_TOKEN_MIN_VALIDITY = int(os.environ.get("PCC_TOKEN_MIN_VALIDITY", 60))
+    # Max time (seconds) to wait for the token refreshed by another process
+    PCC_TOKEN_REFRESH_TIMEOUT = int(os.environ.get("PCC_TOKEN_REFRESH_TIMEOUT", 30))
+    # Min interval between PCC API requests (SpikeArrest, seconds)
+    PCC_SPIKE_ARREST_INTERVAL = float(os.environ.get("PCC_SPIKE_ARREST_INTERVAL", 0.02))
+    PCC_MINUTE_QUOTA_LIMIT = int(os.environ.get("PCC_MINUTE_QUOTA_LIMIT", 1000))
+    # Pooled connections to PCC API (per process)
+    PCC_POOL_SIZE = int(os.environ.get("PCC_POOL_SIZE", 10))
+    # Retries of the SpikeArrest and connection errors (jittered backoff, seconds)
+    PCC_MAX_RETRIES = int(os.environ.get("PCC_MAX_RETRIES", 3))
+    PCC_RETRY_BACKOFF = float(os.environ.get("PCC_RETRY_BACKOFF", 0.4))
+    PCC_REQUEST_TIMEOUT = int(os.environ.get("PCC_REQUEST_TIMEOUT", 60))
+    # Max time (seconds) a web request waits for the rate limits of PCC API
+    PCC_RATE_LIMIT_WAIT = float(os.environ.get("PCC_RATE_LIMIT_WAIT", 5))
+    # Organizations whose facilities are fetched concurrently by the scanning
+    PCC_SCAN_WORKERS = int(os.environ.get("PCC_SCAN_WORKERS", 4))
+
+    # Redis shared by the app and the worker processes (PCC API token cache)
+    REDIS_URL = os.environ.get("REDIS_URL", None)
+    # How often (seconds) the loaded desktop client versions are checked for changes
+    CLIENT_VERSIONS_CHECK_INTERVAL = float(
+        os.environ.get("CLIENT_VERSIONS_CHECK_INTERVAL", 5)
+    )
 
     # Logs deletion periods in days
     SYSTEM_LOGS_DELETION_PERIOD = int(
@@ -132,6 +163,42 @@ class BaseConfig(object):
         os.environ.get("COMPUTER_LOGS_DELETION_PERIOD", 90)
     )
     LOG_EVENT_DELETION_PERIOD = int(os.environ.get("LOG_EVENT_DELETION_PERIOD", 10))
+    # Max rows deleted (and committed) at once by the old logs cleaning
+    CLEAN_LOGS_BATCH_SIZE = int(os.environ.get("CLEAN_LOGS_BATCH_SIZE", 5000))
+    # Number of upcoming months to keep log_events/backup_logs partitions for
+    LOG_PARTITIONS_MONTHS_AHEAD = int(os.environ.get("LOG_PARTITIONS_MONTHS_AHEAD", 3))
+
+    # Write-behind buffer for agents heartbeats (/last_time)
+    HEARTBEAT_WRITE_BEHIND = (
+        os.environ.get("HEARTBEAT_WRITE_BEHIND", "false").lower() == "true"
+    )
+    # How often (seconds) the buffer checks if it should be flushed
+    HEARTBEAT_FLUSH_INTERVAL = float(os.environ.get("HEARTBEAT_FLUSH_INTERVAL", 1))
+    # Max time (seconds) a heartbeat can wait in the buffer before written to db
+    HEARTBEAT_MAX_STALENESS = float(os.environ.get("HEARTBEAT_MAX_STALENESS", 30))
+    # Buffered computers amount which triggers flush regardless of staleness
+    HEARTBEAT_BUFFER_MAX_SIZE = int(os.environ.get("HEARTBEAT_BUFFER_MAX_SIZE", 500))
+
+    # Closed days (UTC) of billing rollups recalculated by the nightly job
+    BILLING_ROLLUP_REBUILD_DAYS = int(os.environ.get("BILLING_ROLLUP_REBUILD_DAYS", 3))
+
+    # Artifacts store of the billing reports generated by the worker (must be shared
+    # by the app and the worker)
+    BILLING_REPORTS_DIR = os.environ.get(
+        "BILLING_REPORTS_DIR", os.path.join(base_dir, "billing_reports")
+    )
+    # Report job in progress longer than this (seconds) is considered lost
+    BILLING_REPORT_JOB_TIMEOUT = int(os.environ.get("BILLING_REPORT_JOB_TIMEOUT", 600))
+    # Days to keep the cached reports of the closed periods
+    BILLING_REPORTS_CACHE_DAYS = int(os.environ.get("BILLING_REPORTS_CACHE_DAYS", 30))
+
+    # Content-addressed store of the uploaded files (MSI installers)
+    BLOB_STORE_DIR = os.environ.get(
+        "BLOB_STORE_DIR", os.path.join(base_dir, "blob_store")
+    )
+
+    # Cache time (seconds) of the main page stats per permission scope (0 - no cache)
+    DASHBOARD_STATS_CACHE_TTL = int(os.environ.get("DASHBOARD_STATS_CACHE_TTL", 30))
 
     MAX_LOCATION_ACTIVE_COMPUTERS_LITE = int(
         os.environ.get("MAX_LOCATION_ACTIVE_COMPUTERS_LITE", 1)
@@ -180,6 +247,7 @@ class TestingConfig(BaseConfig):
 
     TESTING = True
     PRESERVE_CONTEXT_ON_EXCEPTION = False
+    DASHBOARD_STATS_CACHE_TTL = 0
     SQLALCHEMY_DATABASE_URI = os.environ.get(
         "TEST_DATABASE_URL",
         "sqlite:///" + os.path.join(base_dir, "database-test.sqlite3"),
@@ -0,0 +1,34 @@
+"""computer_configs
+
+Revision ID: a6c3d9e2f7b8
+Revises: f5b2c8d3a6e1
+Create Date: 2026-10-19 18:21:07.482915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a6c3d9e2f7b8"
+down_revision = "f5b2c8d3a6e1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "computer_configs",
+        sa.Column("computer_id", sa.Integer(), nullable=False),
+        sa.Column("document", sa.Text(), nullable=False),
+        sa.Column("etag", sa.String(length=64), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["computer_id"], ["computers.id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("computer_id"),
+    )
+
+
+def downgrade():
+    op.drop_table("computer_configs")
@@ -0,0 +1,115 @@
+"""partition_log_tables
+
+Revision ID: ae4aa2ae342a
+Revises: 4c1e2b7d9a10
+Create Date: 2026-10-18 21:05:43.118204
+
+Converts log_events (by created_at) and backup_logs (by end_time) to tables
+partitioned by month. Existing table is attached as one "<table>_legacy"
+partition with all the current rows (no data copying), new rows go to monthly
+partitions created here and by the "flask create-log-partitions" command.
+PostgreSQL only.
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "ae4aa2ae342a"
+down_revision = "4c1e2b7d9a10"
+branch_labels = None
+depends_on = None
+
+PARTITIONED_TABLES = {
+    "log_events": "created_at",
+    "backup_logs": "end_time",
+}
+MONTHS_AHEAD = 3
+
+
+def month_start(date: datetime, months: int = 0) -> datetime:
+    month_index = date.year * 12 + date.month - 1 + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    for table, column in PARTITIONED_TABLES.items():
+        legacy = f"{table}_legacy"
+
+        op.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+        op.execute(
+            f"ALTER TABLE {legacy} RENAME CONSTRAINT {table}_pkey TO {legacy}_pkey"
+        )
+
+        # Partition key must be NOT NULL and a part of the primary key
+        op.execute(f"DELETE FROM {legacy} WHERE {column} IS NULL")
+        op.execute(f"ALTER TABLE {legacy} ALTER COLUMN {column} SET NOT NULL")
+        op.execute(
+            f"ALTER TABLE {legacy} DROP CONSTRAINT {legacy}_pkey, "
+            f"ADD CONSTRAINT {legacy}_pkey PRIMARY KEY (id, {column})"
+        )
+
+        op.execute(
+            f"CREATE TABLE {table} "
+            f"(LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE ({column})"
+        )
+        op.execute(
+            f"ALTER TABLE {table} "
+            f"ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, {column})"
+        )
+        op.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {table}_computer_id_fkey "
+            "FOREIGN KEY (computer_id) REFERENCES computers (id)"
+        )
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+
+        # Legacy partition keeps all the existing rows (till the end of current month)
+        last_time = bind.execute(
+            sa.text(f"SELECT max({column}) FROM {legacy}")
+        ).scalar()
+        legacy_end = month_start(max(last_time or datetime.min, datetime.utcnow()), 1)
+        op.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {legacy} "
+            f"FOR VALUES FROM (MINVALUE) TO ('{legacy_end:%Y-%m-%d}')"
+        )
+        op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+        for months in range(MONTHS_AHEAD):
+            start = month_start(legacy_end, months)
+            end = month_start(start, 1)
+            op.execute(
+                f"CREATE TABLE {table}_p{start:%Y%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+            )
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    for table, column in PARTITIONED_TABLES.items():
+        plain = f"{table}_plain"
+
+        op.execute(
+            f"CREATE TABLE {plain} "
+            f"(LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        op.execute(f"INSERT INTO {plain} SELECT * FROM {table}")
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {plain}.id")
+        op.execute(f"DROP TABLE {table}")
+        op.execute(f"ALTER TABLE {plain} RENAME TO {table}")
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)")
+        op.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {table}_computer_id_fkey "
+            "FOREIGN KEY (computer_id) REFERENCES computers (id)"
+        )
+
+    op.execute("ALTER TABLE log_events ALTER COLUMN created_at DROP NOT NULL")
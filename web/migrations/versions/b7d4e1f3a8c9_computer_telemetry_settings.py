@@ -0,0 +1,44 @@
+"""computer_telemetry_settings
+
+Revision ID: b7d4e1f3a8c9
+Revises: a6c3d9e2f7b8
+Create Date: 2026-10-19 19:02:33.157640
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "b7d4e1f3a8c9"
+down_revision = "a6c3d9e2f7b8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "computer_telemetry_settings",
+        sa.Column("computer_id", sa.Integer(), nullable=False),
+        sa.Column("telemetry_settings_id", sa.Integer(), nullable=True),
+        sa.Column("send_printer_info", sa.Boolean(), nullable=False),
+        sa.Column("send_agent_logs", sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["computer_id"], ["computers.id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("computer_id"),
+    )
+    op.create_index(
+        op.f("ix_computer_telemetry_settings_telemetry_settings_id"),
+        "computer_telemetry_settings",
+        ["telemetry_settings_id"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index(
+        op.f("ix_computer_telemetry_settings_telemetry_settings_id"),
+        table_name="computer_telemetry_settings",
+    )
+    op.drop_table("computer_telemetry_settings")
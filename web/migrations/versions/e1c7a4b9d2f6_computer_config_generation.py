@@ -0,0 +1,40 @@
+"""computer_config_generation
+
+Revision ID: e1c7a4b9d2f6
+Revises: b7d4e1f3a8c9
+Create Date: 2026-10-20 11:42:19.503288
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e1c7a4b9d2f6"
+down_revision = "b7d4e1f3a8c9"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "computer_configs",
+        sa.Column("generation", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.alter_column(
+        "computer_configs", "document", existing_type=sa.Text(), nullable=True
+    )
+    op.alter_column(
+        "computer_configs", "etag", existing_type=sa.String(length=64), nullable=True
+    )
+
+
+def downgrade():
+    op.execute("DELETE FROM computer_configs WHERE document IS NULL")
+    op.alter_column(
+        "computer_configs", "etag", existing_type=sa.String(length=64), nullable=False
+    )
+    op.alter_column(
+        "computer_configs", "document", existing_type=sa.Text(), nullable=False
+    )
+    op.drop_column("computer_configs", "generation")
@@ -0,0 +1,77 @@
+"""desktop_clients_blob_store
+
+Revision ID: f5b2c8d3a6e1
+Revises: e4f1a7c9b2d5
+Create Date: 2026-10-19 17:05:42.913304
+
+"""
+import io
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.blob_store import blob_path, save_blob
+
+
+# revision identifiers, used by Alembic.
+revision = "f5b2c8d3a6e1"
+down_revision = "e4f1a7c9b2d5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "desktop_clients", sa.Column("sha256", sa.String(length=64), nullable=True)
+    )
+
+    # Move MSI files to the blob store one by one (blobs can be large)
+    connection = op.get_bind()
+    client_ids = connection.execute(
+        sa.text("SELECT id FROM desktop_clients ORDER BY id")
+    ).scalars()
+    for client_id in list(client_ids):
+        blob = connection.execute(
+            sa.text("SELECT blob FROM desktop_clients WHERE id = :id"),
+            dict(id=client_id),
+        ).scalar_one()
+        sha256, size = save_blob(io.BytesIO(blob))
+        connection.execute(
+            sa.text(
+                "UPDATE desktop_clients SET sha256 = :sha256, size = :size "
+                "WHERE id = :id"
+            ),
+            dict(sha256=sha256, size=size, id=client_id),
+        )
+
+    op.alter_column("desktop_clients", "sha256", nullable=False)
+    op.create_index(
+        op.f("ix_desktop_clients_sha256"), "desktop_clients", ["sha256"], unique=False
+    )
+    op.drop_column("desktop_clients", "blob")
+
+
+def downgrade():
+    op.add_column(
+        "desktop_clients",
+        sa.Column("blob", sa.LargeBinary(), autoincrement=False, nullable=True),
+    )
+
+    # Files are kept in the blob store
+    connection = op.get_bind()
+    for client_id, sha256 in list(
+        connection.execute(sa.text("SELECT id, sha256 FROM desktop_clients"))
+    ):
+        path = blob_path(sha256)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"MSI file {path} is missing in the blob store")
+        with open(path, "rb") as blob_file:
+            connection.execute(
+                sa.text("UPDATE desktop_clients SET blob = :blob WHERE id = :id"),
+                dict(blob=blob_file.read(), id=client_id),
+            )
+
+    op.alter_column("desktop_clients", "blob", nullable=False)
+    op.drop_index(op.f("ix_desktop_clients_sha256"), table_name="desktop_clients")
+    op.drop_column("desktop_clients", "sha256")
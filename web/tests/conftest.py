@@ -12,6 +12,12 @@ app.config["TESTING"] = True
 app.config["SERVER_NAME"] = "localhost:5000"
 
 
+@pytest.fixture(autouse=True)
+def blob_store(monkeypatch, tmp_path):
+    monkeypatch.setattr(CFG, "BLOB_STORE_DIR", str(tmp_path / "blob_store"))
+    yield CFG.BLOB_STORE_DIR
+
+
 @pytest.fixture
 def client():
     with app.test_client() as client:
@@ -0,0 +1,61 @@
+import datetime
+
+from app.models import Computer
+from app.models.computer import PrinterStatus
+
+
+def test_agent_sync(client):
+    data = dict(
+        computer_name="comp4_test",
+        identifier_key="comp4_identifier_key",
+        last_time_online=str(datetime.datetime.now()),
+        printer_info=dict(PrinterStatus=128, Name="Office printer"),
+    )
+    response = client.post("/agent/sync", json=data)
+
+    assert response.status_code == 200
+    assert response.json["status"] == "success"
+    assert response.json["sftp_host"] == "comp4_sftp_host"
+    assert response.json["config"]["computer_name"] == "comp4_test"
+    assert "send_printer_info" in response.json
+    config_etag = response.json["config_etag"]
+
+    computer = Computer.query.filter_by(identifier_key="comp4_identifier_key").first()
+    assert computer.printer_name == "Office printer"
+    assert computer.printer_status == PrinterStatus.OFFLINE
+    assert computer.last_time_online
+
+    # Configuration is not sent again until it is changed
+    data.update(config_etag=config_etag)
+    data.pop("printer_info")
+    response = client.post("/agent/sync", json=data)
+    assert response.status_code == 200
+    assert response.json["config"] is None
+    assert response.json["config_etag"] == config_etag
+
+    # The same etag as in the get_credentials response
+    response = client.post(
+        "/get_credentials",
+        json=dict(identifier_key="comp4_identifier_key", computer_name="comp4_test"),
+        headers={"If-None-Match": config_etag},
+    )
+    assert response.status_code == 304
+
+    computer.sftp_folder_path = "new_folder_path"
+    computer.update()
+    response = client.post("/agent/sync", json=data)
+    assert response.json["config"]["sftp_folder_path"] == "new_folder_path"
+    assert response.json["config_etag"] != config_etag
+
+    response = client.post(
+        "/agent/sync", json=dict(data, identifier_key="wrong_identifier_key")
+    )
+    assert response.status_code == 400
+    assert response.json["message"] == "Wrong id."
+
+    response = client.post(
+        "/agent/sync",
+        json=dict(data, computer_name="unknown", identifier_key="unknown"),
+    )
+    assert response.status_code == 400
+    assert response.json["rmcreds"] == "rmcreds"
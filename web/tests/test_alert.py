@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import mail, models as m
+from app.controllers import send_critical_alert, send_weekly_summary
+from app.controllers.alert import alert_users_index
+from config import BaseConfig as CFG
+
+
+def test_send_critical_alert(test_db, monkeypatch):
+    monkeypatch.setitem(current_app.config, "MAIL_DEFAULT_SENDER", "support@mail.com")
+
+    # Maywood is offline for 2 hours: alert only location level users
+    current_east_time = CFG.offset_to_est(datetime.utcnow(), True)
+    maywood = m.Location.query.filter_by(name="Maywood").first()
+    for computer in m.Computer.query.filter_by(location_id=maywood.id):
+        computer.last_download_time = current_east_time - timedelta(
+            hours=2, minutes=10
+        )
+    test_db.session.commit()
+
+    with mail.record_messages() as outbox:
+        stats = send_critical_alert()
+
+    recipients = {message.subject: message.recipients for message in outbox}
+    assert recipients == {
+        "ALERT! Location Maywood is offline": ["test_user_location@mail.com"],
+        # SpringField computers downloaded last backup 50 hours ago
+        "ALERT! Location SpringField is offline": ["location_dro_user@mail.com"],
+    }
+    assert m.AlertEvent.query.count() == 2
+
+    assert stats["locations"] == 3
+    assert stats["alerts"] == 2
+    # 4 SELECTs regardless of number of locations and users + INSERT of alert events
+    # and upsert of their daily rollups
+    assert stats["queries"] == 4 + 2 * 2
+
+
+def test_alert_users_index(test_db):
+    atlas = m.Company.query.filter_by(name="Atlas").first()
+    maywood = m.Location.query.filter_by(name="Maywood").first()
+    ararat = m.Location.query.filter_by(name="Ararat").first()
+    closed = m.Location(name="Closed", company_id=atlas.id, is_deleted=True)
+    north = m.LocationGroup(name="North", company_id=atlas.id, locations=[ararat])
+    south = m.LocationGroup(name="South", company_id=atlas.id, is_deleted=True)
+    test_db.session.add_all([closed, north, south])
+
+    def add_user(username: str, **links):
+        test_db.session.add(
+            m.User(
+                username=username,
+                email=f"{username}@mail.com",
+                password=username,
+                activated=True,
+                company_id=atlas.id,
+                **links,
+            )
+        )
+
+    add_user("closed_user", location=[closed])
+    add_user("group_user", location_group=[north], location=[ararat])
+    add_user("ungrouped_user", location_group=[south], location=[ararat])
+    test_db.session.commit()
+
+    users_index = {
+        key: [user.username for user in users]
+        for key, users in alert_users_index([atlas.id]).items()
+    }
+
+    # Users of deleted locations and groups are not escalated to the company level,
+    # users of a group are not indexed by their location
+    assert users_index == {
+        ("company", atlas.id): ["test_user_company"],
+        ("location", maywood.id): ["test_user_location"],
+        ("location_group", north.id): ["group_user"],
+        ("location", ararat.id): ["ungrouped_user"],
+    }
+
+
+def test_send_weekly_summary(test_db, monkeypatch):
+    monkeypatch.setitem(current_app.config, "MAIL_DEFAULT_SENDER", "support@mail.com")
+
+    # comp1_intime was offline for 3 hours during the last week
+    comp1 = m.Computer.query.filter_by(computer_name="comp1_intime").first()
+    current_hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    for backup_log_type, start_hours, end_hours in (
+        (m.BackupLogType.WITH_DOWNLOADS_PERIOD, 10, 8),
+        (m.BackupLogType.NO_DOWNLOADS_PERIOD, 7, 5),
+        (m.BackupLogType.WITH_DOWNLOADS_PERIOD, 4, 0),
+    ):
+        test_db.session.add(
+            m.BackupLog(
+                computer_id=comp1.id,
+                backup_log_type=backup_log_type,
+                start_time=current_hour - timedelta(hours=start_hours),
+                end_time=current_hour
+                - timedelta(hours=end_hours)
+                + timedelta(minutes=59, seconds=59),
+            )
+        )
+
+    # User of a deleted location doesn't get the company summary
+    atlas = m.Company.query.filter_by(name="Atlas").first()
+    closed = m.Location(name="Closed", company_id=atlas.id, is_deleted=True)
+    test_db.session.add(
+        m.User(
+            username="closed_user",
+            email="closed_user@mail.com",
+            password="closed_user",
+            activated=True,
+            company_id=atlas.id,
+            location=[closed],
+        )
+    )
+    test_db.session.commit()
+
+    with mail.record_messages() as outbox:
+        stats = send_weekly_summary()
+
+    assert [message.recipients for message in outbox] == [
+        [message.recipients[0]] for message in outbox
+    ]
+    emails = {message.recipients[0]: message.html for message in outbox}
+    assert set(emails) == {
+        "test_user_company@mail.com",
+        "test_user_location@mail.com",
+        "location_dro_user@mail.com",
+    }
+    company_email = " ".join(emails["test_user_company@mail.com"].split())
+    assert "comp1_intime </td>" in company_email
+    assert "1 </td> <td style=\"border: 1px solid; padding: 10px 0\"> 3:00:00" in (
+        company_email
+    )
+
+    assert stats["companies"] == 3
+    assert stats["computers"] == 7
+    assert stats["emails"] == 3
+    # Stats of all the computers and emails are calculated by a constant number of
+    # queries: companies, users, location groups, computers and their uptime
+    assert stats["queries"] == 5
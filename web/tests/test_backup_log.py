@@ -0,0 +1,111 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+from flask import current_app
+
+from app import models as m
+from app.controllers import (
+    backup_log_on_download_error_with_message,
+    backup_log_on_download_success,
+)
+from app.logger import logger
+
+HEARTBEAT_THREADS = 8
+HEARTBEATS = 200
+
+
+def test_backup_log_on_download_success(test_db):
+    computer = m.Computer.query.filter_by(computer_name="comp3_test").first()
+    m.BackupLog.query.filter_by(computer_id=computer.id).delete()
+    computer.last_time_logs_enabled = datetime.utcnow() - timedelta(days=1)
+    test_db.session.commit()
+
+    download_time = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    download_time -= timedelta(hours=5)
+
+    # Downloads during the same hour extend the same period
+    backup_log_on_download_success(computer, download_time + timedelta(minutes=5))
+    backup_log_on_download_success(computer, download_time + timedelta(minutes=35))
+
+    logs = m.BackupLog.query.filter_by(computer_id=computer.id).all()
+    assert len(logs) == 1
+    assert logs[0].backup_log_type == m.BackupLogType.WITH_DOWNLOADS_PERIOD
+    assert logs[0].start_time == download_time
+    assert logs[0].end_time == download_time + timedelta(minutes=59, seconds=59)
+
+    # Hours without downloads are closed by the NO_DOWNLOADS_PERIOD
+    backup_log_on_download_success(computer, download_time + timedelta(hours=3))
+
+    logs = (
+        m.BackupLog.query.filter_by(computer_id=computer.id)
+        .order_by(m.BackupLog.start_time)
+        .all()
+    )
+    assert [log.backup_log_type for log in logs] == [
+        m.BackupLogType.WITH_DOWNLOADS_PERIOD,
+        m.BackupLogType.NO_DOWNLOADS_PERIOD,
+        m.BackupLogType.WITH_DOWNLOADS_PERIOD,
+    ]
+    assert logs[1].start_time == download_time + timedelta(hours=1)
+    assert logs[1].end_time == download_time + timedelta(hours=3, seconds=-1)
+
+
+def test_backup_log_on_download_error_with_message(test_db):
+    computer = m.Computer.query.filter_by(computer_name="comp3_test").first()
+    m.BackupLog.query.filter_by(computer_id=computer.id).delete()
+    computer.last_time_logs_enabled = datetime.utcnow() - timedelta(days=1)
+    test_db.session.commit()
+
+    # Repeated errors during the same hour keep one period with the last message
+    backup_log_on_download_error_with_message(computer, "Disk is full")
+    backup_log_on_download_error_with_message(computer, "Access denied")
+
+    current_hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    logs = m.BackupLog.query.filter_by(computer_id=computer.id).all()
+    assert len(logs) == 1
+    assert logs[0].backup_log_type == m.BackupLogType.NO_DOWNLOADS_PERIOD
+    assert logs[0].start_time == current_hour
+    assert logs[0].notes == "Access denied"
+
+
+def test_backup_log_concurrent_heartbeats(test_db):
+    if test_db.engine.dialect.name != "postgresql":
+        pytest.skip("concurrent transactions are checked only on PostgreSQL")
+
+    app = current_app._get_current_object()
+    computer = m.Computer.query.filter_by(computer_name="comp3_test").first()
+    m.BackupLog.query.filter_by(computer_id=computer.id).delete()
+    computer.last_time_logs_enabled = datetime.utcnow() - timedelta(days=1)
+    test_db.session.commit()
+    computer_id = computer.id
+
+    start_hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    start_hour -= timedelta(hours=1)
+
+    def heartbeat(i: int):
+        with app.app_context():
+            computer = m.Computer.query.get(computer_id)
+            backup_log_on_download_success(
+                computer, start_hour + timedelta(minutes=i % 60)
+            )
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=HEARTBEAT_THREADS) as executor:
+        list(executor.map(heartbeat, range(HEARTBEATS)))
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "{} heartbeats in {} threads: {:.3f}s ({:.1f} ms per heartbeat)",
+        HEARTBEATS,
+        HEARTBEAT_THREADS,
+        elapsed,
+        elapsed / HEARTBEATS * 1000,
+    )
+
+    # Parallel downloads during the same hour never duplicate the period
+    test_db.session.expire_all()
+    logs = m.BackupLog.query.filter_by(computer_id=computer_id).all()
+    assert len(logs) == 1
+    assert logs[0].backup_log_type == m.BackupLogType.WITH_DOWNLOADS_PERIOD
+    assert logs[0].start_time == start_hour
@@ -0,0 +1,220 @@
+import io
+import os
+import re
+import zipfile
+from datetime import datetime, timedelta
+
+import pytest
+from flask import current_app
+from tests.utils import login
+
+import worker
+from app import db, models as m
+from app.controllers import (
+    billing_report_path,
+    clean_billing_report_jobs,
+    create_company_billing_report,
+)
+from app.controllers.alert import count_queries
+from config import BaseConfig as CFG
+
+
+def read_xlsx_rows(file) -> dict[int, list[str]]:
+    """Values of the first worksheet by row index (constant memory workbooks
+    use inline strings)"""
+    sheet = zipfile.ZipFile(file).read("xl/worksheets/sheet1.xml").decode()
+
+    rows = {}
+    for number, row in re.findall(r'<row r="(\d+)"[^>]*>(.*?)</row>', sheet):
+        rows[int(number) - 1] = [
+            inline or value
+            for inline, value in re.findall(
+                r"<c [^>]*?(?:/>|>(?:<is><t>(.*?)</t></is>|<v>(.*?)</v>)</c>)", row
+            )
+        ]
+    return rows
+
+
+def add_billing_events(computer: m.Computer, calls: int, alerts: int):
+    now = datetime.utcnow()
+    for i in range(calls):
+        db.session.add(
+            m.DownloadBackupCall(
+                computer_id=computer.id, created_at=now - timedelta(hours=i)
+            )
+        )
+    for i in range(alerts):
+        db.session.add(
+            m.AlertEvent(
+                location_id=computer.location_id,
+                alert_type=m.AlertEventType.CRITICAL_ALERT,
+                created_at=now - timedelta(hours=i),
+            )
+        )
+    db.session.commit()
+
+
+def test_company_billing_report(test_db):
+    atlas = m.Company.query.filter_by(name="Atlas").first()
+    comp1 = m.Computer.query.filter_by(computer_name="comp1_intime").first()
+    comp2 = m.Computer.query.filter_by(computer_name="comp2_late").first()
+    add_billing_events(comp1, calls=3, alerts=2)
+    add_billing_events(comp2, calls=2, alerts=0)
+    # Out of the report period
+    test_db.session.add(
+        m.DownloadBackupCall(
+            computer_id=comp1.id, created_at=datetime.utcnow() - timedelta(days=60)
+        )
+    )
+    # Deleted computers are still billed
+    comp2.delete()
+
+    from_date = datetime.utcnow() - timedelta(days=30)
+    to_date = datetime.utcnow() + timedelta(days=1)
+
+    stats = dict(queries=0)
+    with count_queries(stats):
+        rows = read_xlsx_rows(create_company_billing_report(atlas, from_date, to_date))
+
+    assert rows[1] == [
+        "Total locations: 2",
+        "Total computers: 5",
+        "Total users: 2",
+        "Total alerts: 2",
+        "Total API Calls: 5",
+    ]
+    assert rows[4] == ["Ararat", "Total_computers: 0", "0", "0", "Active"]
+    assert rows[5] == ["Maywood", "Total_computers: 5", "5", "2", "Active"]
+    assert rows[6] == ["", "comp1_intime", "3", "", "Active"]
+    assert rows[7] == ["", "comp2_late", "2", "", "Deleted"]
+
+    # Number of queries does not depend on the number of locations and computers
+    more_computers = [
+        m.Computer(
+            computer_name=f"billing_comp_{i}",
+            identifier_key=f"billing_comp_key_{i}",
+            company_id=atlas.id,
+            location_id=comp1.location_id,
+        )
+        for i in range(20)
+    ]
+    test_db.session.add_all(more_computers)
+    test_db.session.commit()
+
+    more_stats = dict(queries=0)
+    with count_queries(more_stats):
+        rows = read_xlsx_rows(create_company_billing_report(atlas, from_date, to_date))
+
+    assert rows[5] == ["Maywood", "Total_computers: 25", "5", "2", "Active"]
+    assert more_stats["queries"] == stats["queries"]
+
+
+@pytest.fixture
+def eager_report_jobs(monkeypatch, tmp_path):
+    """Run billing report jobs in the current process instead of the worker"""
+    started_jobs = []
+
+    def delay(job_id: int):
+        started_jobs.append(job_id)
+        worker.generate_billing_report(job_id)
+
+    monkeypatch.setattr(worker, "flask_app", current_app._get_current_object())
+    monkeypatch.setattr(worker.generate_billing_report, "delay", delay)
+    monkeypatch.setattr(CFG, "BILLING_REPORTS_DIR", str(tmp_path))
+
+    yield started_jobs
+
+
+def test_general_billing_report(client, eager_report_jobs):
+    login(client, "test_user_view", "test_user_view")
+
+    response = client.get(
+        "/billing/report",
+        query_string=dict(
+            from_date=(datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d"),
+            to_date=(datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d"),
+        ),
+    )
+
+    assert response.status_code == 202
+    assert len(eager_report_jobs) == 1
+    job_info = response.json
+    # Job is created in progress: status is polled
+    assert job_info["status"] == "IN_PROGRESS"
+    assert job_info["download_url"] is None
+
+    job_info = client.get(job_info["status_url"]).json
+    assert job_info["status"] == "SUCCEED"
+
+    response = client.get(job_info["download_url"])
+    assert response.status_code == 200
+    assert "General_Report.xlsx" in response.headers["Content-Disposition"]
+
+    rows = read_xlsx_rows(io.BytesIO(response.data))
+    assert rows[1][:3] == [
+        "Total companies: 3",
+        "Total locations: 3",
+        "Total computers: 7",
+    ]
+    assert rows[3] == [
+        "Company",
+        "Location",
+        "Computer",
+        "API Calls",
+        "Alerts",
+        "Status",
+    ]
+    assert rows[4] == [
+        "Atlas",
+        "Total_locations: 2",
+        "Total_computers: 5",
+        "0",
+        "0",
+        "Active",
+    ]
+
+
+def test_billing_report_cache(client, eager_report_jobs):
+    login(client, "test_user_view", "test_user_view")
+    atlas = m.Company.query.filter_by(name="Atlas").first()
+    url = f"/company/{atlas.id}/billing-report"
+
+    # Closed period: report is generated once and then served from the cache
+    closed_period = dict(from_date="2024-01-01", to_date="2024-02-01")
+    first = client.get(url, query_string=closed_period).json
+    second = client.get(url, query_string=closed_period).json
+
+    assert len(eager_report_jobs) == 1
+    assert second["id"] == first["id"]
+    assert second["status"] == "SUCCEED"
+    response = client.get(second["download_url"])
+    assert response.status_code == 200
+    assert "Report_Atlas.xlsx" in response.headers["Content-Disposition"]
+
+    # Open period: data still changes, so report is generated again
+    open_period = dict(
+        from_date=(datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d"),
+        to_date=(datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d"),
+    )
+    first = client.get(url, query_string=open_period).json
+    second = client.get(url, query_string=open_period).json
+
+    assert len(eager_report_jobs) == 3
+    assert second["id"] != first["id"]
+
+    # Lost cached file is generated again
+    cached_job = m.BillingReportJob.query.get(eager_report_jobs[0])
+    os.remove(billing_report_path(cached_job))
+    job_info = client.get(url, query_string=closed_period).json
+    assert job_info["id"] != eager_report_jobs[0]
+    assert len(eager_report_jobs) == 4
+
+    # Old jobs of open periods are deleted with their files
+    open_job = m.BillingReportJob.query.get(eager_report_jobs[1])
+    open_job_path = billing_report_path(open_job)
+    open_job.created_at = datetime.utcnow() - timedelta(days=2)
+    open_job.save()
+
+    assert clean_billing_report_jobs() == 1
+    assert not os.path.exists(open_job_path)
+    assert m.BillingReportJob.query.count() == 3
@@ -0,0 +1,85 @@
+from datetime import datetime, time, timedelta
+
+from zoneinfo import ZoneInfo
+
+from app import models as m
+from app.controllers import rollup_billing_events
+from app.models.billing_rollup import PCC_API_CALLS_ROLLUP, count_events
+
+
+def test_billing_rollups(test_db):
+    comp1 = m.Computer.query.filter_by(computer_name="comp1_intime").first()
+    comp2 = m.Computer.query.filter_by(computer_name="comp2_late").first()
+    maywood = m.Location.query.filter_by(name="Maywood").first()
+    atlas = m.Company.query.filter_by(name="Atlas").first()
+
+    # Events every 6 hours during the last 10 days
+    today = datetime.combine(datetime.utcnow().date(), time.min)
+    times = [today - timedelta(hours=6 * i) for i in range(40)]
+    for created_at in times:
+        test_db.session.add(
+            m.DownloadBackupCall(computer_id=comp1.id, created_at=created_at)
+        )
+        test_db.session.add(
+            m.AlertEvent(
+                location_id=maywood.id,
+                alert_type=m.AlertEventType.CRITICAL_ALERT,
+                created_at=created_at,
+            )
+        )
+    test_db.session.add(m.DownloadBackupCall(computer_id=comp2.id, created_at=today))
+    test_db.session.commit()
+
+    # Rollups are maintained on every new event
+    assert m.DownloadBackupCallDaily.query.filter_by(
+        computer_id=comp1.id, day=(today - timedelta(days=3)).date()
+    ).first().calls == 4
+    assert m.AlertEventDaily.query.filter_by(
+        location_id=maywood.id, day=today.date()
+    ).first().alerts == 1
+
+    # EST period: partial edge days (UTC) are counted from the raw events
+    start_time = (today - timedelta(days=7, hours=1)).replace(
+        tzinfo=ZoneInfo("UTC")
+    ).astimezone(ZoneInfo("America/New_York"))
+    end_time = start_time + timedelta(days=5, hours=3)
+    utc_start, utc_end = (
+        value.astimezone(ZoneInfo("UTC")).replace(tzinfo=None)
+        for value in (start_time, end_time)
+    )
+    expected = len([t for t in times if utc_start <= t <= utc_end])
+
+    assert comp1.total_pcc_api_calls(start_time, end_time) == expected
+    assert maywood.total_pcc_api_calls(start_time, end_time) == expected
+    assert maywood.total_alert_events(start_time, end_time) == expected
+    assert atlas.total_alert_events(start_time, end_time) == expected
+    assert atlas.total_pcc_api_calls(start_time, today) == len(
+        [t for t in times if utc_start <= t]
+    ) + 1
+    # Period shorter than a day
+    assert comp1.total_pcc_api_calls(
+        today - timedelta(hours=7), today - timedelta(hours=5)
+    ) == 1
+
+    # Whole days are summed from the rollups: raw events are not scanned
+    middle_day = today - timedelta(days=4)
+    test_db.session.query(m.DownloadBackupCall).filter(
+        m.DownloadBackupCall.created_at >= middle_day,
+        m.DownloadBackupCall.created_at < middle_day + timedelta(days=1),
+    ).delete()
+    test_db.session.commit()
+    assert comp1.total_pcc_api_calls(start_time, end_time) == expected
+
+    # Nightly rebuild recalculates rollups of the closed days from the raw events
+    report = rollup_billing_events(days=10)
+    # 10 closed days of comp1 calls except the cleaned one
+    assert report["pcc_api_calls"] == 9
+
+    assert comp1.total_pcc_api_calls(start_time, end_time) == expected - 4
+    assert count_events(PCC_API_CALLS_ROLLUP, start_time, end_time) == {
+        comp1.id: expected - 4
+    }
+    # Today rollups are not touched by the rebuild
+    assert m.DownloadBackupCallDaily.query.filter_by(
+        computer_id=comp2.id, day=today.date()
+    ).first().calls == 1
@@ -1,7 +1,9 @@
 from datetime import datetime, timedelta
 
 from app import models as m
-from app.controllers import clean_old_logs
+from app.controllers import clean_old_logs, create_log_partitions
+from app.controllers.clean_log import delete_in_batches
+from app.controllers.log_partitions import is_partitioned, month_start
 from config import BaseConfig as CFG
 
 
@@ -35,3 +37,35 @@ def test_clean_old_logs(test_db, add_test_logs):
     ).first().created_at > datetime.utcnow() - timedelta(
         days=CFG.LOG_EVENT_DELETION_PERIOD
     )
+
+
+def test_delete_in_batches(test_db):
+    computer = m.Computer.query.filter_by(computer_name="comp3_test").first()
+    expired_time = datetime.utcnow() - timedelta(days=CFG.LOG_EVENT_DELETION_PERIOD)
+    for i in range(5):
+        m.LogEvent(
+            computer_id=computer.id,
+            log_type=m.LogType.HEARTBEAT,
+            created_at=expired_time - timedelta(hours=i),
+        ).save()
+    m.LogEvent(computer_id=computer.id, log_type=m.LogType.HEARTBEAT).save()
+
+    deleted = delete_in_batches(
+        m.LogEvent.__table__,
+        m.LogEvent.__table__.c.created_at,
+        expired_time + timedelta(minutes=1),
+        batch_size=2,
+    )
+
+    assert deleted == 5
+    assert test_db.session.query(m.LogEvent).count() == 1
+
+
+def test_log_partitions_not_postgres(test_db):
+    assert month_start(datetime(2026, 12, 15, 10, 30), 1) == datetime(2027, 1, 1)
+    assert month_start(datetime(2026, 1, 31), -1) == datetime(2025, 12, 1)
+
+    # Tables are partitioned only in PostgreSQL
+    assert not is_partitioned("log_events")
+    assert create_log_partitions() == []
+    assert clean_old_logs()["dropped_partitions"] == 0
@@ -0,0 +1,42 @@
+from sqlalchemy import update
+
+from app import models as m
+from app.controllers import client_version_registry
+
+
+def test_client_version_registry(test_db, monkeypatch):
+    registry = client_version_registry
+    monkeypatch.setattr(registry, "check_interval", 60)
+    registry.clear()
+
+    # Desktop clients are loaded once and resolved in memory
+    loads = registry.stats()["loads"]
+    stable = registry.resolve("stable")
+    assert stable.version == "1.0.1.1"
+    assert registry.resolve("1.0.9.110769").name == "new_test_version"
+    assert registry.by_id(stable.id) is stable
+    assert registry.by_sha256(stable.sha256) is stable
+    assert registry.resolve("latest") is None
+    assert registry.resolve("0.0.0.0") is None
+    assert registry.stats()["loads"] == loads + 1
+
+    # Committed changes of the versions invalidate the registry
+    m.ClientVersion(name="latest").save()
+    new_version = m.DesktopClient.query.filter_by(name="new_test_version").first()
+    new_version.flag_name = "latest"
+    new_version.update()
+
+    assert registry.resolve("latest").version == "1.0.9.110769"
+    assert registry.stats()["loads"] == loads + 2
+
+    # Changes made by the other processes are loaded after the check interval
+    test_db.session.execute(
+        update(m.DesktopClient)
+        .where(m.DesktopClient.id == new_version.id)
+        .values(version="1.0.9.120000")
+    )
+    test_db.session.commit()
+    assert registry.resolve("latest").version == "1.0.9.110769"
+
+    monkeypatch.setattr(registry, "check_interval", 0)
+    assert registry.resolve("latest").version == "1.0.9.120000"
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from app import models as m
+from app.controllers import update_computers_status
+from config import BaseConfig as CFG
+
+
+def test_computer_status_on_change(test_db):
+    computer = (
+        test_db.session.query(m.Computer).filter_by(computer_name="comp2_late").first()
+    )
+    assert computer.status == m.ComputerStatus.OFFLINE_NO_BACKUP
+
+    # Heartbeat without download
+    computer.last_time_online = CFG.offset_to_est(datetime.utcnow(), True)
+    computer.update()
+    assert computer.status == m.ComputerStatus.ONLINE_NO_BACKUP
+
+    computer.deactivate()
+    assert computer.status == m.ComputerStatus.NOT_ACTIVATED
+    # SQL status keeps the display text (NOT ACTIVATED)
+    not_activated = m.ComputerStatus.NOT_ACTIVATED.value.replace("_", " ")
+    assert m.Computer.query.filter(m.Computer.status == not_activated).count() == 1
+    status = select(m.Computer.status).where(m.Computer.id == computer.id)
+    assert test_db.session.scalar(status) == not_activated
+
+    # Filters by the display text are applied to the stored (indexed) column
+    status_filter = m.Computer.status.ilike("%not act%")
+    assert "replace" not in str(status_filter.compile()).lower()
+    assert m.Computer.query.filter(status_filter).count() == 1
+    assert m.Computer.query.filter(~m.Computer.status.ilike("%backup")).count() == (
+        m.Computer.query.filter(
+            m.Computer.computer_status.in_(
+                [m.ComputerStatus.ONLINE, m.ComputerStatus.NOT_ACTIVATED]
+            )
+        ).count()
+    )
+
+
+def test_update_computers_status(test_db):
+    computer = (
+        test_db.session.query(m.Computer).filter_by(computer_name="comp1_intime").first()
+    )
+    computer_id = computer.id
+    assert computer.status == m.ComputerStatus.ONLINE
+
+    # Nothing to change
+    assert update_computers_status() == 0
+
+    # Time-based decay: backup was downloaded 2 hours ago (changed without ORM)
+    test_db.session.execute(
+        update(m.Computer.__table__)
+        .where(m.Computer.__table__.c.id == computer_id)
+        .values(
+            last_download_time=CFG.offset_to_est(datetime.utcnow(), True)
+            - timedelta(hours=2),
+        )
+    )
+    test_db.session.commit()
+
+    assert update_computers_status() == 1
+
+    computer = test_db.session.query(m.Computer).filter_by(id=computer_id).first()
+    assert computer.status == m.ComputerStatus.ONLINE_NO_BACKUP
+    assert computer.status_changed_at
@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+
+from app import models as m
+from app.controllers import (
+    backup_log_on_download_error,
+    backup_log_on_download_success,
+    backup_log_on_request_to_view,
+)
+from app.models.computer_uptime import load_uptime
+
+from .utils import login
+
+
+def test_computer_uptime(client):
+    computer = m.Computer.query.filter_by(computer_name="comp3_test").first()
+    m.BackupLog.query.filter_by(computer_id=computer.id).delete()
+    m.ComputerUptime.query.filter_by(computer_id=computer.id).delete()
+    computer.logs_enabled = True
+    computer.last_time_logs_enabled = datetime.utcnow() - timedelta(days=1)
+    computer.update()
+    computer_id = computer.id
+
+    current_hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+
+    # Hours: 10, 9 - online, 8 - 6 offline, 5 - online, 4 - offline, 3 - online,
+    # 2 - 0 offline (hours before the current one)
+    for hours in (10, 9, 5, 3):
+        backup_log_on_download_success(
+            computer, current_hour - timedelta(hours=hours, minutes=-10)
+        )
+    backup_log_on_request_to_view(computer)
+
+    uptime = load_uptime([computer_id], current_hour - timedelta(hours=11), 12)[
+        computer_id
+    ]
+    assert uptime.tracked == 0b111111111110
+    assert uptime.online == 0b000101000110
+    assert uptime.failed == 0
+    assert uptime.offline_hours() == 7
+    assert uptime.offline_occurrences() == 3
+
+    computer = m.Computer.query.filter_by(id=computer_id).first()
+    assert computer.last_week_offline_occurrences == 3
+    assert computer.last_week_offline_time == timedelta(hours=7)
+
+    # Download error marks the current offline period as failed
+    backup_log_on_download_error(computer)
+
+    uptime = load_uptime([computer_id], current_hour - timedelta(hours=11), 12)[
+        computer_id
+    ]
+    assert uptime.failed == 0b111000000000
+
+    chart_data = uptime.chart_data()
+    hours = [hour for hour, value in enumerate(chart_data["green"]) if value]
+    assert hours == [1, 2, 6, 8]
+    hours = [hour for hour, value in enumerate(chart_data["yellow"]) if value]
+    assert hours == [7]
+    hours = [hour for hour, value in enumerate(chart_data["red"]) if value]
+    assert hours == [3, 4, 5, 9, 10, 11]
+    assert chart_data["notes"][5] == "Device is offline"
+    assert chart_data["notes"][10] == "Unsuccessful backup"
+
+    # Periods of the other computers are not mixed
+    other_computer = m.Computer.query.filter_by(computer_name="comp4_test").first()
+    assert not load_uptime([other_computer.id], current_hour, 1)[
+        other_computer.id
+    ].tracked
+
+    # Chart of the computer page is built from the bitmaps
+    computer.location.status = m.LocationStatus.ONLINE
+    computer.update()
+    login(client, "test_user_view", "test_user_view")
+    response = client.get(f"/info/computer/{computer_id}")
+    assert response.status_code == 200
+
+
+def test_computer_uptime_shortened_period(test_db):
+    computer = m.Computer.query.filter_by(computer_name="comp3_test").first()
+    m.BackupLog.query.filter_by(computer_id=computer.id).delete()
+    m.ComputerUptime.query.filter_by(computer_id=computer.id).delete()
+    test_db.session.commit()
+    computer_id = computer.id
+
+    current_hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    start_time = current_hour - timedelta(hours=5)
+    period = m.BackupLog(
+        computer_id=computer_id,
+        backup_log_type=m.BackupLogType.WITH_DOWNLOADS_PERIOD,
+        start_time=start_time,
+        end_time=current_hour + timedelta(minutes=59, seconds=59),
+    )
+    test_db.session.add(period)
+    test_db.session.commit()
+
+    def load() -> tuple[int, int]:
+        uptime = load_uptime([computer_id], start_time, 6)[computer_id]
+        return uptime.tracked, uptime.online
+
+    assert load() == (0b111111, 0b111111)
+
+    # Hours which are not covered anymore are cleared
+    period.end_time = start_time + timedelta(hours=3, seconds=-1)
+    test_db.session.commit()
+    assert load() == (0b000111, 0b000111)
+
+    # Split period: the new period is flushed together with the shortened one
+    period.end_time = start_time + timedelta(hours=1, seconds=-1)
+    test_db.session.add(
+        m.BackupLog(
+            computer_id=computer_id,
+            backup_log_type=m.BackupLogType.NO_DOWNLOADS_PERIOD,
+            start_time=start_time + timedelta(hours=1),
+            end_time=start_time + timedelta(hours=3, seconds=-1),
+            notes="Unsuccessful backup",
+        )
+    )
+    test_db.session.commit()
+    uptime = load_uptime([computer_id], start_time, 6)[computer_id]
+    assert uptime.tracked == 0b000111
+    assert uptime.online == 0b000001
+    assert uptime.failed == 0b000110
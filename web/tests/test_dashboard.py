@@ -0,0 +1,49 @@
+from app import models as m
+from app.controllers import get_dashboard_stats, update_companies_locations_statistic
+
+from tests.utils import login, register
+
+
+def test_dashboard_stats(test_db):
+    update_companies_locations_statistic()
+
+    global_user = m.User.query.filter_by(username="test_user_view").first()
+    stats = get_dashboard_stats(global_user)
+
+    activated_computers = m.Computer.query.filter_by(activated=True)
+    assert stats.total_computers == m.Computer.query.count()
+    assert stats.activated_computers == activated_computers.count()
+    assert stats.computers_online == (
+        activated_computers.filter(
+            m.Computer.status == m.ComputerStatus.ONLINE.value
+        ).count()
+    )
+    assert stats.computers_online + stats.computers_offline == (
+        stats.activated_computers
+    )
+    assert stats.primary_online + stats.alternate_online == stats.computers_online
+    assert stats.total_locations == (
+        m.Location.query.filter(m.Location.computers_per_location > 0).count()
+    )
+
+    # Location user sees only computers of his location
+    location_user = m.User.query.filter_by(username="location_dro_user").first()
+    stats = get_dashboard_stats(location_user)
+
+    springfield = m.Location.query.filter_by(name="SpringField").first()
+    assert stats.total_computers == (
+        m.Computer.query.filter_by(location_id=springfield.id).count()
+    )
+    assert stats.total_locations == 1
+
+
+def test_index_page(client):
+    register("sam")
+    login(client, "sam")
+
+    response = client.get("/")
+    assert response.status_code == 200
+
+    response = client.get("/dashboard_stats")
+    assert response.status_code == 200
+    assert response.json["total_computers"] == m.Computer.query.count()
@@ -1,6 +1,10 @@
 import csv
 import io
+import tracemalloc
 
+from sqlalchemy import insert
+
+from app import db, models as m
 from tests.utils import login, register
 
 
@@ -99,3 +103,41 @@ def test_download_csv_with_flask_admin_filters(client):
     lines = csv_content.split("\n")
     # Header + 5 computers + empty line at end
     assert len(lines) >= 6, f"Expected at least 6 lines, got {len(lines)}"
+
+
+def test_download_csv_memory_does_not_grow(client):
+    """Streaming export: peak memory doesn't depend on number of exported computers"""
+    register("sam")
+    login(client, "sam")
+    company = m.Company.query.filter_by(name="Atlas").first()
+
+    def export_peak_memory(computers: int) -> int:
+        db.session.execute(
+            insert(m.Computer.__table__),
+            [
+                dict(
+                    computer_name=f"bench_{computers}_{i}",
+                    identifier_key=f"bench_{computers}_{i}",
+                    company_id=company.id,
+                )
+                for i in range(computers)
+            ],
+        )
+        db.session.commit()
+
+        tracemalloc.start()
+        response = client.get(
+            f"/download_csv?search=<<computer_name>>%3Abench_{computers}_",
+            buffered=False,
+        )
+        exported = sum(chunk.count(b"\n") for chunk in response.response) - 1
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert exported == computers
+        return peak
+
+    small_export_peak = export_peak_memory(1000)
+    large_export_peak = export_peak_memory(10000)
+
+    assert large_export_peak < small_export_peak * 2
@@ -1,4 +1,9 @@
 import datetime
+
+from sqlalchemy.orm import Session
+
+from app import db
+from app.controllers import computer_config
 from app.models import Computer
 from app.api import check_msi_version
 from app.schema import LastTime
@@ -76,6 +81,98 @@ def test_get_credentials(client):
     assert response.status_code == 422
 
 
+def test_get_credentials_etag(client):
+    data = dict(identifier_key="comp4_identifier_key", computer_name="comp4_test")
+    response = client.post("/get_credentials", json=data)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    # Unchanged configuration is not sent again (heartbeat fields are updated)
+    computer = Computer.query.filter_by(identifier_key="comp4_identifier_key").first()
+    last_time_online = datetime.datetime(2000, 1, 1)
+    computer.last_time_online = last_time_online
+    computer.update()
+    response = client.post(
+        "/get_credentials", json=data, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert not response.data
+    assert computer.last_time_online != last_time_online
+
+    computer.last_download_time = datetime.datetime.now()
+    computer.update()
+    response = client.post(
+        "/get_credentials", json=data, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+    # Changes of the computer, its location or company build the new configuration
+    computer.files_checksum = '{"file.zip": "checksum"}'
+    computer.update()
+    response = client.post(
+        "/get_credentials", json=data, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.json["files_checksum"] == {"file.zip": "checksum"}
+    assert response.headers["ETag"] != etag
+    etag = response.headers["ETag"]
+
+    computer.location.name = "Renamed location"
+    computer.location.update()
+    response = client.post(
+        "/get_credentials", json=data, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.json["location_name"] == "Renamed location"
+    etag = response.headers["ETag"]
+
+    computer.company.name = "Renamed company"
+    computer.company.update()
+    response = client.post(
+        "/get_credentials", json=data, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.json["company_name"] == "Renamed company"
+
+
+def test_get_credentials_concurrent_change(client, monkeypatch):
+    data = dict(identifier_key="comp4_identifier_key", computer_name="comp4_test")
+    folder_paths = iter(["/changed/first", "/changed/second"])
+    build_computer_config = computer_config.build_computer_config
+
+    def build_with_concurrent_change(computer: Computer) -> dict:
+        document = build_computer_config(computer)
+        # Another request changes the computer while the document is being built
+        with Session(db.engine) as session:
+            session.get(Computer, computer.id).sftp_folder_path = next(folder_paths)
+            session.commit()
+        return document
+
+    monkeypatch.setattr(
+        computer_config, "build_computer_config", build_with_concurrent_change
+    )
+
+    # Outdated documents are returned but not stored (for the new and cleared one)
+    response = client.post("/get_credentials", json=data)
+    assert response.status_code == 200
+    assert not response.json["sftp_folder_path"].startswith("/changed/")
+
+    response = client.post("/get_credentials", json=data)
+    assert response.status_code == 200
+    assert response.json["sftp_folder_path"] == "/changed/first"
+
+    monkeypatch.undo()
+    response = client.post("/get_credentials", json=data)
+    assert response.status_code == 200
+    assert response.json["sftp_folder_path"] == "/changed/second"
+    etag = response.headers["ETag"]
+    response = client.post(
+        "/get_credentials", json=data, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+
 def test_download_status(client):
     response = client.post(
         "/download_status",
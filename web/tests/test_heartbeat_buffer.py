@@ -0,0 +1,112 @@
+import datetime
+import sys
+
+from flask import current_app
+
+from app import models as m
+from app.controllers.heartbeat_buffer import HeartbeatBuffer
+from config import BaseConfig as CFG
+
+
+def test_heartbeat_buffer_flush(test_db):
+    buffer = HeartbeatBuffer()
+    buffer.app = current_app._get_current_object()
+    buffer._stopped.set()  # do not start background thread in tests
+
+    computer = (
+        test_db.session.query(m.Computer).filter_by(computer_name="comp3_test").first()
+    )
+    computer_id = computer.id
+    online_time = CFG.offset_to_est(datetime.datetime.utcnow(), True)
+
+    buffer.add(computer, "10.0.0.1", last_time_online=online_time)
+    buffer.add(
+        computer,
+        "10.0.0.2",
+        last_time_online=online_time,
+        last_download_time=online_time,
+    )
+
+    # Both heartbeats of the same computer are merged into one buffered row
+    assert len(buffer) == 1
+    assert test_db.session.query(m.LogEvent).count() == 0
+
+    assert buffer.flush() == 1
+    assert len(buffer) == 0
+
+    computer = test_db.session.query(m.Computer).filter_by(id=computer_id).first()
+    assert computer.computer_ip == "10.0.0.2"
+    assert computer.last_time_online == online_time
+    assert computer.last_download_time == online_time
+
+    log_types = [log.log_type for log in test_db.session.query(m.LogEvent).all()]
+    assert log_types.count(m.LogType.HEARTBEAT) == 2
+    assert log_types.count(m.LogType.BACKUP_DOWNLOAD) == 1
+    assert (
+        test_db.session.query(m.BackupLog).filter_by(computer_id=computer_id).count()
+        == 1
+    )
+
+
+def test_heartbeat_buffer_flush_after_commit_failure(test_db, monkeypatch):
+    # NOTE app.controllers.heartbeat_buffer attribute is the buffer, not the module
+    heartbeat_buffer_module = sys.modules["app.controllers.heartbeat_buffer"]
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("post-commit step failed")
+
+    monkeypatch.setattr(heartbeat_buffer_module, "update_computers_status", fail)
+    monkeypatch.setattr(heartbeat_buffer_module, "backup_log_on_download_success", fail)
+
+    buffer = HeartbeatBuffer()
+    buffer.app = current_app._get_current_object()
+    buffer._stopped.set()
+
+    computer = (
+        test_db.session.query(m.Computer).filter_by(computer_name="comp3_test").first()
+    )
+    online_time = CFG.offset_to_est(datetime.datetime.utcnow(), True)
+    buffer.add(
+        computer,
+        "10.0.0.1",
+        last_time_online=online_time,
+        last_download_time=online_time,
+    )
+
+    # Committed batch is not requeued when the next steps fail
+    assert buffer.flush() == 1
+    assert len(buffer) == 0
+    assert buffer.flush() == 0
+    assert test_db.session.query(m.LogEvent).count() == 2
+
+
+def test_last_time_write_behind(client):
+    from app.controllers import heartbeat_buffer
+
+    heartbeat_buffer.app = current_app._get_current_object()
+    heartbeat_buffer.enabled = True
+    heartbeat_buffer._stopped.set()
+
+    try:
+        response = client.post(
+            "/last_time",
+            json=dict(
+                identifier_key="comp3_identifier_key",
+                computer_name="comp3_test",
+                last_time_online=str(datetime.datetime.now()),
+                last_download_time=str(datetime.datetime.now()),
+            ),
+        )
+
+        assert response.status_code == 200
+        assert response.json["status"] == "success"
+        assert len(heartbeat_buffer) == 1
+        assert m.LogEvent.query.count() == 0
+
+        heartbeat_buffer.drain()
+
+        assert len(heartbeat_buffer) == 0
+        assert m.LogEvent.query.count() == 2
+    finally:
+        heartbeat_buffer.enabled = False
+        heartbeat_buffer._stopped.clear()
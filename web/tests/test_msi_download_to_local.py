@@ -1,3 +1,17 @@
+import hashlib
+import io
+import os
+import time
+
+from app import models as m
+from app.utils.blob_store import (
+    UNUSED_BLOB_MIN_AGE,
+    blob_path,
+    remove_unused_blobs,
+    save_blob,
+)
+
+
 def test_download_msi(client):
     response = client.get("/download/1")
 
@@ -53,3 +67,55 @@ def test_lid_msi(client):
     assert response.status_code == 200
     # ensure that the filename is correct
     assert "_lid_1.msi" in response.headers["Content-Disposition"]
+
+
+def test_msi_download_conditional_requests(client):
+    msi = m.DesktopClient.query.filter_by(flag_name="stable").first()
+    etag = f'"{msi.sha256}"'
+
+    response = client.get(f"/download/{msi.id}")
+    assert response.status_code == 200
+    assert response.headers["ETag"] == etag
+    assert "no-cache" in response.headers["Cache-Control"]
+
+    # File is not sent again if the client has it
+    response = client.get(f"/download/{msi.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert not response.data
+
+    # Interrupted download is resumed from the received part
+    response = client.get(f"/download/{msi.id}", headers={"Range": "bytes=5-"})
+    assert response.status_code == 206
+    assert response.data == b"bytes"
+    assert response.headers["Content-Range"] == "bytes 5-9/10"
+
+    # Content-addressed URL is cached forever
+    response = client.get(f"/download/msi/{msi.sha256}")
+    assert response.status_code == 200
+    assert response.data == b"test_bytes"
+    assert "immutable" in response.headers["Cache-Control"]
+    assert client.get("/download/msi/unknown").status_code == 404
+
+
+def test_blob_store(test_db, blob_store):
+    digest, size = save_blob(io.BytesIO(b"test_bytes"))
+    assert size == len(b"test_bytes")
+    assert digest == hashlib.sha256(b"test_bytes").hexdigest()
+    assert m.DesktopClient.query.filter_by(sha256=digest).count() == 1
+
+    # The same content is stored once
+    assert save_blob(io.BytesIO(b"test_bytes")) == (digest, size)
+    with open(blob_path(digest), "rb") as blob_file:
+        assert blob_file.read() == b"test_bytes"
+    assert len(os.listdir(os.path.dirname(blob_path(digest)))) == 1
+
+    # Only old files which are not used are removed
+    unused_digest, _ = save_blob(io.BytesIO(b"unused_bytes"))
+    assert remove_unused_blobs({digest}) == []
+
+    old_time = time.time() - UNUSED_BLOB_MIN_AGE - 1
+    for path in (blob_path(digest), blob_path(unused_digest)):
+        os.utime(path, (old_time, old_time))
+    assert remove_unused_blobs({digest}) == [unused_digest]
+    assert os.path.exists(blob_path(digest))
+    assert not os.path.exists(blob_path(unused_digest))
@@ -1,3 +1,5 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 import pytest
@@ -8,11 +10,16 @@ from app import models as m
 from app import schema as s
 from app.controllers import (
     check_daily_requests_count,
+    create_new_creation_reports,
     get_activations,
     get_org_facilities_list,
     get_pcc_2_legged_token,
+    pcc_client,
+    pcc_token_manager,
     update_daily_requests_count,
 )
+from app.controllers.pcc_client import PCCRateLimiter
+from config import BaseConfig as CFG
 
 # NOTE: These tests are skipped by default because they require next things:
 # 1. The machine should be under the USA VPN or in the USA localization
@@ -24,6 +31,11 @@ from app.controllers import (
 SANDBOX_ORG_UUID = "11848592-809A-42F4-82E3-5CE14964A007"
 
 
+def update_daily_requests_count_in_app(app, reset_time: int, remaining: int):
+    with app.app_context():
+        update_daily_requests_count(reset_time, remaining)
+
+
 def test_update_daily_requests_count(test_db):
     from datetime import datetime
 
@@ -64,6 +76,18 @@ def test_update_daily_requests_count(test_db):
     )
     assert first_record.requests_count == EXPECTED_VALUE
 
+    # Counters are updated from several threads of the organizations scan
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(
+            executor.map(
+                update_daily_requests_count_in_app,
+                [current_app._get_current_object()] * 8,
+                [TEST_EPOCH_TIME_SECOND] * 8,
+                [TEST_REQUESTS_NUMBER_BIG] * 8,
+            )
+        )
+    assert m.PCCDailyRequest.query.filter_by(reset_time=reset_time_second).count() == 1
+
     # Create test report for the second time
     update_daily_requests_count(TEST_EPOCH_TIME_SECOND, TEST_REQUESTS_NUMBER_SMALL)
     total_test_records = m.PCCDailyRequest.query.filter(
@@ -194,6 +218,121 @@ def test_get_org_facilities(client):
         assert isinstance(facility, s.Facility)
 
 
+def test_create_new_creation_reports(test_db, monkeypatch, requests_mock):
+    monkeypatch.setattr(CFG, "PCC_BASE_URL", "https://pcc.test/")
+    monkeypatch.setattr(CFG, "PCC_APP_NAME", "emar")
+    monkeypatch.setattr(pcc_client, "limiter", PCCRateLimiter(0.001, 10000))
+    pcc_token_manager.clear()
+
+    atlas = m.Company.query.filter_by(name="Atlas").first()
+    atlas.pcc_org_id = "atlas-uuid"
+    maywood = m.Location.query.filter_by(name="Maywood").first()
+    maywood.pcc_fac_id = 12
+    test_db.session.commit()
+
+    def facility(fac_id: int, name: str, org_name: str, org_uuid: str) -> dict:
+        return dict(
+            active=True,
+            facId=fac_id,
+            facilityName=name,
+            orgName=org_name,
+            orgUuid=org_uuid,
+            timeZone="EST",
+            timeZoneOffset=-5,
+        )
+
+    def paging(has_more: bool = False) -> dict:
+        return dict(hasMore=has_more, page=1, pageSize=200)
+
+    requests_mock.post(
+        "https://pcc.test/auth/token",
+        json=dict(access_token="token", expires_in=3600),
+    )
+    requests_mock.get(
+        "https://pcc.test/api/public/preview1/applications/emar/activations",
+        json=dict(
+            data=[
+                dict(orgUuid="atlas-uuid", scope=1),
+                dict(
+                    orgUuid="dro-uuid",
+                    scope=2,
+                    facilityInfo=[dict(activationDate="2023-01-01", facId=5)],
+                ),
+                dict(orgUuid="new-uuid", scope=1),
+            ],
+            paging=paging(),
+        ),
+    )
+    requests_mock.get(
+        "https://pcc.test/api/public/preview1/orgs/atlas-uuid/facs",
+        [
+            {
+                "json": dict(
+                    data=[
+                        facility(12, "Maywood", "Atlas", "atlas-uuid"),
+                        facility(13, "Ararat", "Atlas", "atlas-uuid"),
+                    ],
+                    paging=paging(has_more=True),
+                )
+            },
+            {
+                "json": dict(
+                    data=[facility(14, "Newfield", "Atlas", "atlas-uuid")],
+                    paging=paging(),
+                )
+            },
+        ],
+    )
+    requests_mock.get(
+        "https://pcc.test/api/public/preview1/orgs/dro-uuid/facs",
+        json=dict(
+            data=[
+                facility(5, "SpringField", "Dro", "dro-uuid"),
+                facility(6, "Not activated", "Dro", "dro-uuid"),
+            ],
+            paging=paging(),
+        ),
+    )
+    requests_mock.get(
+        "https://pcc.test/api/public/preview1/orgs/new-uuid/facs",
+        json=dict(
+            data=[facility(21, "New location", "New company", "new-uuid")],
+            paging=paging(),
+        ),
+    )
+
+    scan_record = m.PCCActivationsScan(status=m.ScanStatus.IN_PROGRESS)
+    scan_record.save()
+    create_new_creation_reports(scan_record)
+
+    # Facilities are matched with the existing companies and locations
+    reports = {
+        report.company_name: [
+            (obj["type"], obj["action"], obj["name"], obj["pcc_fac_id"])
+            for obj in json.loads(report.data)
+        ]
+        for report in m.PCCCreationReport.query.all()
+    }
+    assert reports == {
+        "Atlas": [
+            ("LOCATION", "UPDATE", "Ararat", 13),
+            ("LOCATION", "CREATE", "Newfield", 14),
+        ],
+        "Dro": [
+            ("COMPANY", "UPDATE", "Dro", None),
+            ("LOCATION", "UPDATE", "SpringField", 5),
+        ],
+        "New company": [
+            ("COMPANY", "CREATE", "New company", None),
+            ("LOCATION", "CREATE", "New location", 21),
+        ],
+    }
+
+    # Progress of the scanning is saved
+    assert scan_record.organizations_total == 3
+    assert scan_record.organizations_scanned == 3
+
+
 # @pytest.mark.skip
 # def test_create_pcc_org_facs(client):
 #     created_objects = create_new_approving_reports()
@@ -0,0 +1,168 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+import requests
+from flask import current_app
+
+from app import models as m
+from app.controllers import execute_pcc_request
+from app.controllers.pcc_client import (
+    PCCClient,
+    PCCRateLimitedError,
+    PCCRateLimiter,
+    SpikeArrestError,
+    pcc_client,
+)
+
+PCC_URL = "https://pcc.test/api/public/preview1/orgs"
+RESET_TIME = 1695988800000
+
+
+@pytest.fixture
+def client_without_backoff(monkeypatch):
+    monkeypatch.setattr(pcc_client, "retry_backoff", 0)
+    monkeypatch.setattr(pcc_client, "limiter", PCCRateLimiter(0.001, 10000))
+    yield pcc_client
+
+
+def test_pcc_client_session(test_db):
+    client = PCCClient()
+    client.init_app(current_app)
+
+    # One session (pool of connections) is reused by all the requests
+    session = client.session
+    assert client.session is session
+    assert session.cert == (
+        current_app.config["CERTIFICATE_PATH"],
+        current_app.config["PRIVATEKEY_PATH"],
+    )
+    assert session.get_adapter(PCC_URL)._pool_maxsize == client.pool_size
+
+    client.close()
+    assert client.session is not session
+
+
+def test_pcc_client_retries(client_without_backoff: PCCClient, requests_mock):
+    stats = client_without_backoff.stats()
+    pcc_request = requests_mock.get(
+        PCC_URL,
+        [
+            {"status_code": 429},
+            {"exc": requests.ConnectionError},
+            {"status_code": 503},
+            {"json": dict(data=[])},
+        ],
+    )
+
+    # SpikeArrest, connection and unavailability errors are retried
+    res = client_without_backoff.get(PCC_URL)
+    assert res.json() == dict(data=[])
+    assert pcc_request.call_count == 4
+    assert client_without_backoff.stats()["retries"] == stats["retries"] + 3
+
+    # Retries are limited
+    requests_mock.get(PCC_URL, status_code=429)
+    with pytest.raises(SpikeArrestError):
+        client_without_backoff.get(PCC_URL)
+
+    # Other errors are returned to the caller
+    requests_mock.get(PCC_URL, status_code=404)
+    assert client_without_backoff.get(PCC_URL).status_code == 404
+
+
+def test_pcc_client_minute_quota(client_without_backoff: PCCClient, requests_mock):
+    pcc_request = requests_mock.get(
+        PCC_URL, status_code=429, headers={"X-Quota-Minute-Remaining": "0"}
+    )
+
+    # Exhausted minute quota is not retried and holds the next requests
+    with pytest.raises(SpikeArrestError):
+        client_without_backoff.get(PCC_URL)
+    assert pcc_request.call_count == 1
+    assert client_without_backoff.limiter._paused_till > time.monotonic() + 59
+
+
+def test_pcc_rate_limiter():
+    limiter = PCCRateLimiter(interval=0.02, minute_quota=1000)
+    request_times = []
+
+    def send_requests():
+        for _ in range(5):
+            limiter.acquire()
+            request_times.append(time.monotonic())
+
+    threads = [threading.Thread(target=send_requests) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Concurrent requests are spaced by the SpikeArrest interval
+    request_times.sort()
+    assert request_times[-1] - request_times[0] >= 19 * 0.02 * 0.9
+
+    # Requests are spread over the minute when the minute quota is used up
+    limiter = PCCRateLimiter(interval=0.001, minute_quota=60)
+    for _ in range(60):
+        limiter.acquire()
+    started = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - started >= 0.8
+
+
+def test_pcc_rate_limited_web_request(test_db, client_without_backoff, requests_mock):
+    pcc_request = requests_mock.get(PCC_URL, json=dict(data=[]))
+    client_without_backoff.limiter.pause(60)
+
+    # Web requests are not held by the rate limits, they fail at once
+    started = time.monotonic()
+    with current_app.test_request_context():
+        with pytest.raises(PCCRateLimitedError) as e:
+            client_without_backoff.get(PCC_URL)
+    assert time.monotonic() - started < 1
+    assert e.value.retry_after > 59
+    assert pcc_request.call_count == 0
+
+    # Requests which can't wait are not reserved
+    limiter = PCCRateLimiter(interval=0.001, minute_quota=60)
+    for _ in range(60):
+        limiter.acquire()
+    for _ in range(3):
+        with pytest.raises(PCCRateLimitedError):
+            limiter.acquire(timeout=0)
+    started = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - started < 1.5
+
+
+def test_execute_pcc_request(test_db, client_without_backoff, requests_mock):
+    reset_time = datetime.utcfromtimestamp(RESET_TIME / 1000)
+    m.PCCDailyRequest.query.filter_by(reset_time=reset_time).delete()
+    test_db.session.commit()
+
+    requests_mock.get(
+        PCC_URL,
+        [
+            {"status_code": 429},
+            {
+                "json": dict(data=[]),
+                "headers": {
+                    "X-Quota-Limit": "10000",
+                    "X-Quota-Remaining": "9000",
+                    "X-Quota-Time-To-Reset": str(RESET_TIME),
+                },
+            },
+        ],
+    )
+
+    res = execute_pcc_request(PCC_URL, params=dict(page=1))
+    assert res.json() == dict(data=[])
+    assert requests_mock.last_request.qs == {"page": ["1"]}
+
+    # Daily quota is tracked from the response headers
+    daily_requests = m.PCCDailyRequest.query.filter_by(reset_time=reset_time).first()
+    assert daily_requests.requests_count == (
+        current_app.config["PCC_DAILY_QUOTA_LIMIT"] - 9000
+    )
@@ -0,0 +1,102 @@
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+from flask import current_app
+
+from app import models as m
+from app.controllers.pcc_token import PCCTokenManager
+from config import BaseConfig as CFG
+
+PCC_BASE_URL = "https://pcc.test/"
+TOKEN_URL = "https://pcc.test/auth/token"
+
+
+@pytest.fixture
+def token_manager(test_db, monkeypatch):
+    monkeypatch.setattr(CFG, "PCC_BASE_URL", PCC_BASE_URL)
+    monkeypatch.setitem(current_app.config, "REDIS_URL", None)
+
+    manager = PCCTokenManager()
+    manager.init_app(current_app)
+    yield manager
+
+
+def test_pcc_token_cache(token_manager: PCCTokenManager, requests_mock):
+    token_request = requests_mock.post(
+        TOKEN_URL,
+        [
+            {"json": dict(access_token="first_token", expires_in=3600)},
+            {"json": dict(access_token="second_token", expires_in=3600)},
+        ],
+    )
+
+    # The first token is requested from PCC API and saved to the database
+    assert token_manager.get_token() == "first_token"
+    assert m.PCCAccessToken.query.first().token == "first_token"
+
+    # Then it is served from the process memory
+    assert token_manager.get_token() == "first_token"
+    assert token_request.call_count == 1
+
+    # Another process finds the token in the shared storage
+    token_manager.clear()
+    assert token_manager.get_token() == "first_token"
+    assert token_request.call_count == 1
+
+    assert token_manager.stats() == dict(
+        hits=1, shared_hits=1, misses=1, refreshes=1, refresh_errors=0
+    )
+
+    # Token is refreshed before it expires
+    saved_token = m.PCCAccessToken.query.first()
+    saved_token.created_at -= timedelta(
+        seconds=saved_token.expires_in - token_manager.refresh_margin + 1
+    )
+    saved_token.update()
+    token_manager.clear()
+    assert token_manager.get_token() == "second_token"
+    assert token_request.call_count == 2
+    assert token_manager.stats()["refreshes"] == 2
+
+
+def test_pcc_token_refresh_error(token_manager: PCCTokenManager, requests_mock):
+    requests_mock.post(TOKEN_URL, status_code=500)
+    token_manager._token = "valid_token"
+    token_manager._expires_at = time.time() + token_manager.refresh_margin - 1
+
+    # Token which is still valid is used if the refresh fails
+    assert token_manager.get_token() == "valid_token"
+    assert token_manager.stats()["refresh_errors"] == 1
+
+    # Expired token is never used
+    token_manager._expires_at = time.time() + token_manager.min_validity - 1
+    with pytest.raises(Exception):
+        token_manager.get_token()
+    assert token_manager.stats()["refresh_errors"] == 2
+
+
+def test_pcc_token_single_flight(token_manager: PCCTokenManager, requests_mock):
+    def slow_token_response(request, context):
+        time.sleep(0.2)
+        return dict(access_token="new_token", expires_in=3600)
+
+    token_request = requests_mock.post(TOKEN_URL, json=slow_token_response)
+    app = current_app._get_current_object()
+    tokens = []
+
+    def get_token():
+        with app.app_context():
+            tokens.append(token_manager.get_token())
+
+    threads = [threading.Thread(target=get_token) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Only one of the concurrent callers requested the new token
+    assert tokens == ["new_token"] * 8
+    assert token_request.call_count == 1
+    assert token_manager.stats()["misses"] == 8
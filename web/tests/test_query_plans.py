@@ -0,0 +1,168 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import or_, select, text
+
+from app import models as m
+
+# Query plans are checked only on PostgreSQL (TEST_DATABASE_URL=postgresql://...)
+COMPANIES = 50
+COMPUTERS = 20000
+LOG_EVENTS = 200000
+BACKUP_LOGS = 100000
+
+
+@pytest.fixture
+def seeded_db(test_db):
+    if test_db.engine.dialect.name != "postgresql":
+        pytest.skip("query plans are checked only on PostgreSQL")
+
+    def execute(statement: str, **params):
+        return test_db.session.execute(text(statement), params)
+
+    execute(
+        f"""
+        INSERT INTO companies (name)
+        SELECT 'plan_company_' || i FROM generate_series(1, {COMPANIES}) AS i
+        """
+    )
+    first_company = execute(
+        "SELECT min(id) FROM companies WHERE name LIKE 'plan_company_%'"
+    ).scalar()
+    execute(
+        f"""
+        INSERT INTO computers (
+            computer_name, identifier_key, company_id, last_download_time, activated
+        )
+        SELECT
+            'plan_comp_' || i,
+            md5(i::text),
+            :first_company + i % {COMPANIES},
+            now() - (i % 1000) * interval '1 minute',
+            true
+        FROM generate_series(1, {COMPUTERS}) AS i
+        """,
+        first_company=first_company,
+    )
+    first_computer = execute(
+        "SELECT min(id) FROM computers WHERE computer_name LIKE 'plan_comp_%'"
+    ).scalar()
+    execute(
+        f"""
+        INSERT INTO log_events (computer_id, log_type, created_at, data)
+        SELECT
+            :first_computer + i % {COMPUTERS},
+            'HEARTBEAT',
+            now() - i * interval '10 seconds',
+            ''
+        FROM generate_series(1, {LOG_EVENTS}) AS i
+        """,
+        first_computer=first_computer,
+    )
+    execute(
+        f"""
+        INSERT INTO backup_logs (computer_id, backup_log_type, start_time, end_time)
+        SELECT
+            :first_computer + i % {COMPUTERS},
+            'WITH_DOWNLOADS_PERIOD',
+            now() - i * interval '10 minutes',
+            now() - i * interval '10 minutes' + interval '5 minutes'
+        FROM generate_series(1, {BACKUP_LOGS}) AS i
+        """,
+        first_computer=first_computer,
+    )
+    test_db.session.commit()
+    execute("ANALYZE companies, computers, log_events, backup_logs")
+
+    yield test_db
+
+
+def explain(db, statement) -> dict:
+    compiled = statement.compile(dialect=db.engine.dialect)
+    return db.session.connection().exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+    ).scalar()[0]["Plan"]
+
+
+def seq_scans(plan: dict) -> list[str]:
+    """Relations read with sequential scan in the plan"""
+    relations = []
+    if plan["Node Type"] == "Seq Scan":
+        relations.append(plan["Relation Name"])
+    for subplan in plan.get("Plans", []):
+        relations += seq_scans(subplan)
+    return relations
+
+
+def heartbeat_lookup(computer_id: int, company_id: int):
+    return select(m.Computer).where(
+        m.Computer.identifier_key == "c4ca4238a0b923820dcc509a6f75849b",
+        m.Computer.is_deleted.is_(False),
+    )
+
+
+def computer_name_lookup(computer_id: int, company_id: int):
+    return select(m.Computer).where(
+        m.Computer.computer_name == "plan_comp_1",
+        m.Computer.is_deleted.is_(False),
+    )
+
+
+def last_backup_log(computer_id: int, company_id: int):
+    return (
+        select(m.BackupLog)
+        .where(m.BackupLog.computer_id == computer_id)
+        .order_by(m.BackupLog.start_time.desc())
+        .limit(1)
+    )
+
+
+def backup_logs_for_chart(computer_id: int, company_id: int):
+    return (
+        select(m.BackupLog)
+        .where(
+            m.BackupLog.computer_id == computer_id,
+            m.BackupLog.end_time >= datetime.utcnow() - timedelta(days=7),
+        )
+        .order_by(m.BackupLog.start_time.asc())
+    )
+
+
+def offline_computers_by_company(computer_id: int, company_id: int):
+    return select(m.Computer).where(
+        m.Computer.company_id == company_id,
+        m.Computer.activated.is_(True),
+        or_(
+            m.Computer.last_download_time.is_(None),
+            m.Computer.last_download_time < datetime.utcnow() - timedelta(hours=2),
+        ),
+    )
+
+
+def log_events_page(computer_id: int, company_id: int):
+    return (
+        select(m.LogEvent)
+        .where(m.LogEvent.computer_id == computer_id)
+        .order_by(m.LogEvent.created_at.desc())
+        .limit(25)
+        .offset(25)
+    )
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        heartbeat_lookup,
+        computer_name_lookup,
+        last_backup_log,
+        backup_logs_for_chart,
+        offline_computers_by_company,
+        log_events_page,
+    ],
+)
+def test_query_plan_uses_indexes(seeded_db, query):
+    computer = m.Computer.query.filter_by(computer_name="plan_comp_1").first()
+
+    plan = explain(seeded_db, query(computer.id, computer.company_id))
+
+    assert seq_scans(plan) == [], f"Sequential scan in plan of {query.__name__}"
@@ -0,0 +1,122 @@
+import threading
+import warnings
+
+import pytest
+from flask import current_app
+
+# Local debugging SMTP server (smtpd and asyncore are removed in Python 3.12)
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    asyncore = pytest.importorskip("asyncore")
+    smtpd = pytest.importorskip("smtpd")
+
+from app.utils.send_email import EmailQueue, EmailStatus
+
+
+class LocalSMTPServer(smtpd.SMTPServer):
+    """Debugging SMTP server which keeps received messages"""
+
+    def __init__(self, fail_first: int = 0):
+        super().__init__(("127.0.0.1", 0), None)
+        self.port = self.socket.getsockname()[1]
+        self.fail_first = fail_first
+        self.messages = []
+        self.connections = 0
+
+    def handle_accepted(self, conn, addr):
+        self.connections += 1
+        super().handle_accepted(conn, addr)
+
+    def process_message(self, peer, mailfrom, rcpttos, data, **kwargs):
+        if self.fail_first:
+            self.fail_first -= 1
+            return "451 Temporary local problem"
+        self.messages.append((mailfrom, rcpttos))
+
+
+@pytest.fixture
+def smtp_server(client, monkeypatch):
+    def start(fail_first: int = 0) -> LocalSMTPServer:
+        server = LocalSMTPServer(fail_first)
+        thread = threading.Thread(
+            target=asyncore.loop, kwargs=dict(timeout=0.05), daemon=True
+        )
+        thread.start()
+        servers.append(server)
+
+        mail_state = current_app.extensions["mail"]
+        monkeypatch.setattr(mail_state, "suppress", False)
+        monkeypatch.setattr(mail_state, "server", "127.0.0.1")
+        monkeypatch.setattr(mail_state, "port", server.port)
+        monkeypatch.setattr(mail_state, "use_ssl", False)
+        monkeypatch.setattr(mail_state, "username", None)
+        return server
+
+    servers = []
+    yield start
+    for server in servers:
+        server.close()
+
+
+def test_email_queue_reuses_connections(smtp_server):
+    server = smtp_server()
+    email_queue = EmailQueue(max_connections=2, retry_backoff=0)
+    for i in range(6):
+        email_queue.add(
+            subject=f"Test {i}",
+            sender="support@mail.com",
+            recipients=[f"user{i}@mail.com"],
+            html="<p>Test</p>",
+        )
+
+    report = email_queue.send_all()
+
+    assert report["sent"] == 6
+    assert report["failed"] == 0
+    assert len(server.messages) == 6
+    # Every worker sends its messages through one connection
+    assert server.connections == 2
+    assert all(email.status == EmailStatus.SENT for email in email_queue.emails)
+
+
+def test_email_queue_retries(smtp_server):
+    server = smtp_server(fail_first=1)
+    email_queue = EmailQueue(max_connections=1, max_retries=2, retry_backoff=0)
+    retried = email_queue.add(
+        subject="Test retry",
+        sender="support@mail.com",
+        recipients=["user@mail.com"],
+        html="<p>Test</p>",
+    )
+    # Message without recipients can't be sent at all
+    failed = email_queue.add(
+        subject="Test failure",
+        sender="support@mail.com",
+        recipients=[],
+        html="<p>Test</p>",
+    )
+
+    report = email_queue.send_all()
+
+    assert report["sent"] == 1
+    assert report["failed"] == 1
+    assert retried.status == EmailStatus.SENT
+    assert retried.attempts == 2
+    assert failed.status == EmailStatus.FAILED
+    assert failed.attempts == 1
+    assert len(server.messages) == 1
+
+
+def test_email_queue_default_sender(smtp_server, monkeypatch):
+    server = smtp_server()
+    email_queue = EmailQueue(max_connections=1, retry_backoff=0)
+
+    # Default sender is read from the config of the current app
+    monkeypatch.setitem(current_app.config, "MAIL_DEFAULT_SENDER", "alerts@mail.com")
+    email = email_queue.add(
+        subject="Test sender", recipients=["user@mail.com"], html="<p>Test</p>"
+    )
+    email_queue.send_all()
+
+    assert email.status == EmailStatus.SENT
+    assert server.messages == [("alerts@mail.com", ["user@mail.com"])]
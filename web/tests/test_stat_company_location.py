@@ -0,0 +1,31 @@
+from app import models as m
+from app.controllers import update_companies_locations_statistic
+
+
+def test_update_companies_locations_statistic(test_db):
+    report = update_companies_locations_statistic()
+
+    assert report["companies"] == test_db.session.query(m.Company).count()
+    assert report["locations"] == test_db.session.query(m.Location).count()
+    assert report["companies_updated"] > 0
+
+    for company in m.Company.query.all():
+        assert company.locations_per_company == len(company.locations)
+        assert company.total_computers == company.total_computers_counter
+        assert company.computers_offline == company.total_offline_computers
+        assert (
+            company.computers_online
+            == company.total_computers_counter - company.total_offline_computers
+        )
+
+    for location in m.Location.query.all():
+        assert location.computers_per_location == location.total_computers
+        assert location.computers_offline == location.total_computers_offline
+
+    maywood = m.Location.query.filter_by(name="Maywood").first()
+    assert maywood.status == m.LocationStatus.ONLINE
+
+    # Nothing is changed - nothing is written
+    report = update_companies_locations_statistic()
+    assert report["companies_updated"] == 0
+    assert report["locations_updated"] == 0
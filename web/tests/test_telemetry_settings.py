@@ -0,0 +1,76 @@
+from app import db
+from app import models as m
+from app.controllers import get_effective_telemetry_settings
+
+
+def test_effective_telemetry_settings(client):
+    computer = m.Computer.query.filter_by(computer_name="comp4_test").first()
+    other_computer = m.Computer.query.filter(
+        m.Computer.company_id != computer.company_id
+    ).first()
+
+    # Without any settings the defaults are used (and no settings are created)
+    settings = get_effective_telemetry_settings(computer)
+    assert settings.send_printer_info
+    assert settings.telemetry_settings_id == 1
+    assert not m.TelemetrySettings.query.count()
+
+    response = client.get(
+        "/get_telemetry_info", json=dict(identifier_key=computer.identifier_key)
+    )
+    assert response.status_code == 200
+    assert response.json["send_printer_info"]
+
+    # Global settings are applied to the computers without their settings
+    global_settings = m.TelemetrySettings(send_printer_info=False).save()
+    assert global_settings.id == 1
+    assert not get_effective_telemetry_settings(other_computer).send_printer_info
+    global_settings.send_printer_info = True
+    global_settings.save()
+    assert get_effective_telemetry_settings(other_computer).send_printer_info
+
+    # Company settings are applied to its computers only
+    company_settings = m.TelemetrySettings(send_printer_info=False).save()
+    company_settings_link = m.CompanySettingsLinkTable(
+        company_id=computer.company_id, telemetry_settings_id=company_settings.id
+    ).save()
+    assert not get_effective_telemetry_settings(computer).send_printer_info
+    assert get_effective_telemetry_settings(other_computer).send_printer_info
+
+    # Location settings win over the company ones
+    location_settings = m.TelemetrySettings(send_printer_info=True).save()
+    location_settings_link = m.LocationSettingsLinkTable(
+        location_id=computer.location_id, telemetry_settings_id=location_settings.id
+    ).save()
+    assert get_effective_telemetry_settings(computer).send_printer_info
+
+    # Changes of the settings are applied to the computers which use them
+    location_settings.send_printer_info = False
+    location_settings.save()
+    assert not get_effective_telemetry_settings(computer).send_printer_info
+
+    # Computer moved to the other company gets its settings
+    computer.company_id = other_computer.company_id
+    computer.location_id = other_computer.location_id
+    computer.update()
+    assert get_effective_telemetry_settings(computer).send_printer_info
+    computer.company_id = company_settings_link.company_id
+    computer.location_id = location_settings_link.location_id
+    computer.update()
+    assert not get_effective_telemetry_settings(computer).send_printer_info
+
+    # Computer settings win over the location ones
+    computer_settings = m.TelemetrySettings(send_printer_info=True).save()
+    link = m.ComputerSettingsLinkTable(
+        computer_id=computer.id, telemetry_settings_id=computer_settings.id
+    ).save()
+    assert get_effective_telemetry_settings(computer).send_printer_info
+
+    response = client.get(
+        "/get_telemetry_info", json=dict(identifier_key=computer.identifier_key)
+    )
+    assert response.json["send_printer_info"]
+
+    db.session.delete(link)
+    db.session.commit()
+    assert not get_effective_telemetry_settings(computer).send_printer_info
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import update
+
+import worker
+from app import models as m
+from config import BaseConfig as CFG
+
+
+def test_task_runs_in_worker_app(test_db, monkeypatch):
+    monkeypatch.setattr(worker, "flask_app", current_app._get_current_object())
+
+    computer = m.Computer.query.filter_by(computer_name="comp1_intime").first()
+    computer_id = computer.id
+    assert computer.status == m.ComputerStatus.ONLINE
+
+    test_db.session.execute(
+        update(m.Computer.__table__)
+        .where(m.Computer.__table__.c.id == computer_id)
+        .values(
+            last_download_time=CFG.offset_to_est(datetime.utcnow(), True)
+            - timedelta(hours=2),
+        )
+    )
+    test_db.session.commit()
+
+    # Task is executed in the current process with the worker app
+    worker.update_computers_status()
+
+    assert worker.get_flask_app() is current_app._get_current_object()
+    computer = m.Computer.query.filter_by(id=computer_id).first()
+    assert computer.status == m.ComputerStatus.ONLINE_NO_BACKUP
@@ -1,5 +1,5 @@
 import os
-import subprocess
+import time
 
 from celery import Celery
 from celery.schedules import crontab
@@ -67,6 +67,13 @@ def setup_periodic_tasks(sender, **kwargs):
     )
     entry.save()
 
+    # Refresh stored computers statuses (time-based decay) - run every minute
+    interval = crontab(minute="*")
+    entry = RedBeatSchedulerEntry(
+        "update_computers_status", "worker.update_computers_status", interval, app=app
+    )
+    entry.save()
+
     # Clean old logs every midnight
     interval = crontab(hour=0, minute=0)
     entry = RedBeatSchedulerEntry(
@@ -74,6 +81,30 @@ def setup_periodic_tasks(sender, **kwargs):
     )
     entry.save()
 
+    # Create upcoming monthly partitions of the log tables - run every day
+    interval = crontab(hour=1, minute=0)
+    entry = RedBeatSchedulerEntry(
+        "create_log_partitions", "worker.create_log_partitions", interval, app=app
+    )
+    entry.save()
+
+    # Rebuild billing rollups of the last closed days - run every day
+    interval = crontab(hour=1, minute=30)
+    entry = RedBeatSchedulerEntry(
+        "rollup_billing_events", "worker.rollup_billing_events", interval, app=app
+    )
+    entry.save()
+
+    # Delete old billing report jobs and their files - run every day
+    interval = crontab(hour=0, minute=30)
+    entry = RedBeatSchedulerEntry(
+        "clean_billing_report_jobs",
+        "worker.clean_billing_report_jobs",
+        interval,
+        app=app,
+    )
+    entry.save()
+
     # Send monthly test primary computer email
     interval = crontab(minute=0, hour=0, day_of_month=1)
     entry = RedBeatSchedulerEntry(
@@ -83,51 +114,135 @@ def setup_periodic_tasks(sender, **kwargs):
     logger.debug("Tasks added to Redis")
 
 
+# Flask app of the worker process. It is created on the first task (after the
+# worker process is forked) and reused by all the next tasks of the process
+flask_app = None
+
+
+def get_flask_app():
+    global flask_app
+
+    if flask_app is None:
+        from app import create_app
+
+        flask_app = create_app()
+
+    return flask_app
+
+
+def run_in_app_context(task_name: str, func, *args):
+    """Run controller function inside the app context of the worker Flask app
+
+    Args:
+        task_name (str): name of the task (for logs)
+        func (Callable): controller function
+    """
+    from app import db
+
+    start_time = time.perf_counter()
+    status = "success"
+    with get_flask_app().app_context():
+        try:
+            return func(*args)
+        except Exception:
+            status = "failure"
+            raise
+        finally:
+            db.session.remove()
+            logger.info(
+                "Task {} finished: {}, {:.3f} sec",
+                task_name,
+                status,
+                time.perf_counter() - start_time,
+            )
+
+
 @app.task
 def critical_alert_email():
-    flask_proc = subprocess.Popen(["flask", "critical-alert-email"])
-    flask_proc.communicate()
+    from app.controllers import send_critical_alert
+
+    run_in_app_context("critical_alert_email", send_critical_alert)
 
 
 @app.task
 def primary_computer_alert_email():
-    flask_proc = subprocess.Popen(["flask", "primary-computer-alert-email"])
-    flask_proc.communicate()
+    from app.controllers import send_primary_computer_alert
+
+    run_in_app_context("primary_computer_alert_email", send_primary_computer_alert)
 
 
 @app.task
 def daily_summary_email():
-    flask_proc = subprocess.Popen(["flask", "daily-summary-email"])
-    flask_proc.communicate()
+    from app.controllers import send_daily_summary
+
+    run_in_app_context("daily_summary_email", send_daily_summary)
 
 
 @app.task
 def weekly_summary_email():
-    flask_proc = subprocess.Popen(["flask", "weekly-summary-email"])
-    flask_proc.communicate()
+    from app.controllers import send_weekly_summary
+
+    run_in_app_context("weekly_summary_email", send_weekly_summary)
 
 
 @app.task
 def update_cl_stat():
-    flask_proc = subprocess.Popen(["flask", "update-cl-stat"])
-    flask_proc.communicate()
+    from app.controllers import update_companies_locations_statistic
+
+    run_in_app_context("update_cl_stat", update_companies_locations_statistic)
+
+
+@app.task
+def update_computers_status():
+    from app.controllers import update_computers_status
+
+    run_in_app_context("update_computers_status", update_computers_status)
 
 
 @app.task
 def clean_old_logs():
-    flask_proc = subprocess.Popen(["flask", "clean-old-logs"])
-    flask_proc.communicate()
+    from app.controllers import clean_old_logs
+
+    run_in_app_context("clean_old_logs", clean_old_logs)
+
+
+@app.task
+def create_log_partitions():
+    from app.controllers import create_log_partitions
+
+    run_in_app_context("create_log_partitions", create_log_partitions)
 
 
 @app.task
 def scan_pcc_activations(scan_record_id: int):
-    flask_proc = subprocess.Popen(
-        ["flask", "scan-pcc-activations", str(scan_record_id)]
-    )
-    flask_proc.communicate()
+    from app.controllers import scan_pcc_activations
+
+    run_in_app_context("scan_pcc_activations", scan_pcc_activations, scan_record_id)
+
+
+@app.task
+def rollup_billing_events():
+    from app.controllers import rollup_billing_events
+
+    run_in_app_context("rollup_billing_events", rollup_billing_events)
+
+
+@app.task
+def generate_billing_report(job_id: int):
+    from app.controllers import run_billing_report_job
+
+    run_in_app_context("generate_billing_report", run_billing_report_job, job_id)
+
+
+@app.task
+def clean_billing_report_jobs():
+    from app.controllers import clean_billing_report_jobs
+
+    run_in_app_context("clean_billing_report_jobs", clean_billing_report_jobs)
 
 
 @app.task
 def send_monthly_email():
-    flask_proc = subprocess.Popen(["flask", "send-monthly-email"])
-    flask_proc.communicate()
+    from app.controllers import send_monthly_email
+
+    run_in_app_context("send_monthly_email", send_monthly_email)
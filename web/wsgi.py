@@ -37,6 +37,13 @@ def update_cl_stat():
     update_companies_locations_statistic()
 
 
+@app.cli.command()
+def update_computers_status():
+    from app.controllers import update_computers_status
+
+    update_computers_status()
+
+
 @app.cli.command()
 def get_pcc_access_key():
     from app.controllers import get_pcc_2_legged_token
@@ -52,6 +59,28 @@ def clean_old_logs():
     clean_old_logs()
 
 
+@app.cli.command()
+@click.option("--months", type=int, help="Number of upcoming months")
+def create_log_partitions(months: int | None = None):
+    from app.controllers import create_log_partitions
+
+    if months is None:
+        create_log_partitions()
+    else:
+        create_log_partitions(months)
+
+
+@app.cli.command()
+@click.option("--days", type=int, help="Number of closed days to rebuild")
+def rollup_billing_events(days: int | None = None):
+    from app.controllers import rollup_billing_events
+
+    if days is None:
+        rollup_billing_events()
+    else:
+        rollup_billing_events(days)
+
+
 @app.cli.command()
 @click.option("--computer-name", type=str)
 @click.option("--days", type=int)